@@ -0,0 +1,217 @@
+import numpy as np
+
+# ==========================================
+# 🔭 Project Sediment: Adaptive Cooling-Factor Scan
+#    粗扫一遍找到势井 -> 在最优点两侧并行加点细化 -> 抛物线拟合给出最优点和误差棒
+#    同一个接口既能跑本地 MPS，也能跑硬件 (每轮一个参数化 PUB = 一个排队的 job)
+#    总点数不超过固定扫描 (COOLING_SWEEP 7 个点)，轮数越少越好
+# ==========================================
+
+DEFAULT_RANGE = (0.15, 0.35)
+COARSE_POINTS = 5
+POINTS_PER_ROUND = 2           # 每轮最优点两侧各 1 个点，括号缩小一半
+MAX_POINTS = 7                 # = len(COOLING_SWEEP)
+FIT_POINTS = 5                 # 二次拟合用最优点附近的 5 个点 (少于 5 个点没有协方差)
+DEFAULT_TOL = 0.002
+NOISE_Z = 1.0  # 括号两端与最优点之差都小于 1σ 就分不出谁低了，继续细化只是在追噪声
+OBSERVABLES = ("p_horizon", "p_vacuum")
+
+
+# ==========================================
+# 1. Evaluators: cfs (数组) -> (values, stderrs)
+# ==========================================
+def mps_evaluator(length, observable="p_horizon", shots=None, seed=None):
+    """本地 MPS：shots=None 给精确值 (stderr=0)；给 shots 就按二项分布加上硬件那样的统计噪声。"""
+    from mps_simulator import sediment_marginals
+    if observable not in OBSERVABLES:
+        raise ValueError(f"observable must be one of {OBSERVABLES}")
+    rng = np.random.default_rng(seed)
+
+    def evaluate(cfs):
+        exact = np.array([sediment_marginals(length, cf)[observable] for cf in cfs])
+        if shots is None:
+            return exact, np.zeros_like(exact)
+        values = rng.binomial(shots, exact) / shots
+        return values, np.sqrt(np.maximum(values * (1 - values), 1 / shots) / shots)
+    return evaluate
+
+
+def sampler_evaluator(sampler, isa_template, length, observable="p_horizon", shots=8192):
+    """硬件 / fake backend：这一轮所有新点塞进一个参数化 PUB (sediment_circuits.sweep_pub)。"""
+    from sediment_circuits import sweep_pub
+    from packed_counts import as_packed
+    from instrumentation import submit, wait
+    if observable not in OBSERVABLES:
+        raise ValueError(f"observable must be one of {OBSERVABLES}")
+
+    def evaluate(cfs):
+        result = wait(submit(sampler, [sweep_pub(isa_template, cfs, shots)]))
+        meas = result[0].data.meas
+        values = []
+        for j in range(len(cfs)):
+            counts = as_packed(meas, loc=j)
+            if observable == "p_horizon":
+                values.append(counts.excitation_rates([length - 1])[0])
+            else:
+                values.append(counts.probability(0))
+        values = np.asarray(values, dtype=float)
+        return values, np.sqrt(np.maximum(values * (1 - values), 1 / shots) / shots)
+    return evaluate
+
+
+# ==========================================
+# 2. 扫描
+# ==========================================
+def fit_parabola(x, y, sigma=None):
+    """加权二次拟合 y = a x^2 + b x + c，返回 (x*, σ_x*)；开口方向不对时返回 None。"""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if len(x) < 3:
+        return None
+    if len(x) < 5:
+        coeffs, cov = np.polyfit(x, y, 2), np.zeros((3, 3))
+    elif sigma is None or not np.any(sigma):
+        coeffs, cov = np.polyfit(x, y, 2, cov=True)  # 精确值：协方差来自残差 (模型误差)
+    else:
+        coeffs, cov = np.polyfit(x, y, 2, w=1 / np.maximum(np.asarray(sigma), 1e-12), cov="unscaled")
+    a, b, _ = coeffs
+    if a <= 0:
+        return None
+    x_star = -b / (2 * a)
+    jac = np.array([b / (2 * a ** 2), -1 / (2 * a), 0.0])
+    return x_star, float(np.sqrt(max(jac @ cov @ jac, 0.0)))
+
+
+def estimate_optimum(cfs, objective, stderrs, center, half_width, fit_points=FIT_POINTS):
+    """
+    对 center 附近 fit_points 个点做二次拟合，顶点落在 center ± half_width 内才采用；
+    否则 (或拟合不出误差) 退回 center ± half_width。返回 (optimum, error, method)。
+    势井不是严格的抛物线：误差 = 拟合误差 ⊕ 与最近 3 点插值顶点之差 (拟合窗口带来的模型误差)。
+    """
+    cfs, objective, stderrs = (np.asarray(v, dtype=float) for v in (cfs, objective, stderrs))
+    order = np.argsort(np.abs(cfs - center))
+    fit = fit_parabola(cfs[order[:fit_points]], objective[order[:fit_points]], stderrs[order[:fit_points]])
+    if fit is None or abs(fit[0] - center) > half_width or fit[1] <= 0:
+        return float(center), float(half_width), "bracket"
+    local = fit_parabola(cfs[order[:3]], objective[order[:3]])
+    model = abs(fit[0] - local[0]) if local is not None else half_width
+    return float(fit[0]), float(np.hypot(fit[1], model)), "parabola"
+
+
+class ScanLog:
+    """所有已测点 (去重)；evaluate 每次只收到还没测过的 cf。"""
+
+    def __init__(self, evaluate, sign):
+        self.evaluate = evaluate
+        self.sign = sign
+        self.cfs, self.values, self.stderrs = [], [], []
+        self.batches = 0
+
+    def measure(self, cfs):
+        new = [float(cf) for cf in cfs if not np.any(np.isclose(self.cfs, cf, rtol=0, atol=1e-9))]
+        if new:
+            values, stderrs = self.evaluate(np.asarray(new))
+            self.cfs += new
+            self.values += list(np.asarray(values, dtype=float))
+            self.stderrs += list(np.asarray(stderrs, dtype=float))
+            self.batches += 1
+        return np.array([self.objective(cf) for cf in cfs])
+
+    def _index(self, cf):
+        return int(np.argmin(np.abs(np.asarray(self.cfs) - cf)))
+
+    def has(self, cf):
+        return bool(np.any(np.isclose(self.cfs, cf, rtol=0, atol=1e-9)))
+
+    def objective(self, cf):
+        return self.sign * self.values[self._index(cf)]
+
+    def stderr(self, cf):
+        return self.stderrs[self._index(cf)]
+
+
+def adaptive_scan(evaluate, cf_range=DEFAULT_RANGE, coarse_points=COARSE_POINTS, per_round=POINTS_PER_ROUND,
+                  max_points=MAX_POINTS, tol=DEFAULT_TOL, maximize=False, on_round=None):
+    """
+    P(1) 找最小 (maximize=False)，P(0…0) 找最大 (maximize=True)。
+    1) 粗扫 coarse_points 个点 (一批)；
+    2) 每轮在当前最优点两侧各加 per_round/2 个等距点，同一批提交，括号缩小 per_round/2+1 倍；
+       总点数会超过 max_points、括号窄于 tol，或括号两端与最优点在误差内分不开 (noise_limited) 就停；
+    3) 对最优点附近的点做 (加权) 二次拟合给出最优点和误差，拟合不可用时退回括号中点 ± 半宽。
+    """
+    if per_round < 2 or per_round % 2:
+        raise ValueError("per_round must be a positive even number")
+    if coarse_points < 3 or coarse_points > max_points:
+        raise ValueError(f"coarse_points must be between 3 and max_points ({max_points})")
+    log = ScanLog(evaluate, -1.0 if maximize else 1.0)
+    lo, hi = cf_range
+    coarse = np.linspace(lo, hi, coarse_points)
+    best = int(np.argmin(log.measure(coarse)))
+    x, h = float(coarse[best]), float(coarse[1] - coarse[0])
+    side = per_round // 2
+
+    def noise_limited():
+        edges = [c for c in (x - h, x + h) if log.has(c)]
+        return bool(edges) and all(abs(log.objective(c) - log.objective(x)) < NOISE_Z * np.hypot(log.stderr(c), log.stderr(x))
+                                   for c in edges)
+
+    rounds = 0
+    while True:
+        if 2 * h <= tol:
+            stop = "tol"
+            break
+        if len(log.cfs) + per_round > max_points:
+            stop = "max_points"
+            break
+        if noise_limited():
+            stop = "noise_limited"
+            break
+        step = h / (side + 1)
+        log.measure([x + j * step for j in range(-side, side + 1) if j != 0 and lo <= x + j * step <= hi])
+        bracket = [c for c in log.cfs if abs(c - x) <= h + 1e-12]
+        x, h = min(bracket, key=log.objective), step
+        rounds += 1
+        if on_round is not None:
+            on_round(rounds, x - h, x + h, len(log.cfs))
+
+    cfs = np.array(log.cfs)
+    values = np.array(log.values)
+    stderrs = np.array(log.stderrs)
+    order = np.argsort(cfs)
+    cfs, values, stderrs = cfs[order], values[order], stderrs[order]
+    optimum, error, method = estimate_optimum(cfs, log.sign * values, stderrs, x, h)
+
+    # 粗扫最低点落在区间端点：真正的最优点可能在区间外，误差棒不可信
+    at_edge = best in (0, coarse_points - 1)
+    return {"optimum": optimum, "error": error, "method": method, "stop_reason": stop, "at_edge": at_edge,
+            "bracket": (x - h, x + h), "cfs": cfs, "values": values, "stderrs": stderrs,
+            "n_points": len(cfs), "n_batches": log.batches, "rounds": rounds}
+
+
+def fixed_scan(evaluate, cfs, maximize=False):
+    """对照组：一批测完固定网格，用同样的二次拟合估计最优点 (半宽 = 网格间距)。"""
+    cfs = np.asarray(cfs, dtype=float)
+    values, stderrs = evaluate(cfs)
+    sign = -1.0 if maximize else 1.0
+    best = int(np.argmin(sign * np.asarray(values)))
+    spacing = float(np.min(np.diff(np.sort(cfs))))
+    optimum, error, method = estimate_optimum(cfs, sign * np.asarray(values), stderrs, cfs[best], spacing)
+    return {"optimum": optimum, "error": error, "method": method, "n_points": len(cfs), "n_batches": 1}
+
+
+if __name__ == "__main__":
+    import time
+
+    scan_range = (0.0, 0.5)  # 理想模拟的势井底在 cf≈0.13
+    uniform = np.linspace(*scan_range, MAX_POINTS)
+    for L in (16, 20):
+        for shots in (None, 8192):
+            t0 = time.perf_counter()
+            out = adaptive_scan(mps_evaluator(L, shots=shots, seed=L), cf_range=scan_range)
+            ref = fixed_scan(mps_evaluator(L, shots=shots, seed=L), uniform)
+            dt = time.perf_counter() - t0
+            tag = "exact" if shots is None else f"{shots} shots"
+            tag += " (edge!)" if out["at_edge"] else ""
+            print(f"L={L:<3} {tag:<11} | adaptive cf* = {out['optimum']:.4f} ± {out['error']:.4f} ({out['method']}, "
+                  f"{out['stop_reason']}, {out['n_points']} pts / {out['n_batches']} jobs) | "
+                  f"fixed cf* = {ref['optimum']:.4f} ± {ref['error']:.4f} ({ref['method']}, {ref['n_points']} pts / 1 job) | "
+                  f"{dt:.1f}s")
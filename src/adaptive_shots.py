@@ -0,0 +1,284 @@
+import functools
+import numpy as np
+from packed_counts import CountsAccumulator, PackedCounts, as_packed
+
+# ==========================================
+# 🎯 0.25 Protocol: Adaptive Shot Allocation
+#    QPU 秒数最贵 -> 分批提交，边跑边更新 p 和误差
+#    达到目标 sigma / 置信区间宽度就停；扫描网格只给"势井底部"附近的点加 shots
+#    每批都看一次 sigma = 多次检验 -> 用 Pocock 组序贯边界，而不是名义 sigma
+# ==========================================
+
+Z_95 = 1.959963984540054
+DEFAULT_INCREMENT = 2000
+DEFAULT_MAX_SHOTS = 48000
+
+
+def wilson_interval(successes, shots, z=Z_95):
+    """向量化 Wilson 区间 (小 p / 少 shots 时比 p ± z·stderr 靠谱)。"""
+    k = np.asarray(successes, dtype=float)
+    n = np.maximum(np.asarray(shots, dtype=float), 1.0)
+    p = k / n
+    denom = 1 + z ** 2 / n
+    center = (p + z ** 2 / (2 * n)) / denom
+    half = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denom
+    return center - half, center + half
+
+
+class BinomialEstimate:
+    """单个概率的增量估计：每批只加两个整数，不重扫历史数据。"""
+
+    def __init__(self, successes=0, shots=0):
+        self.successes = int(successes)
+        self.shots = int(shots)
+
+    def update(self, successes, shots):
+        self.successes += int(successes)
+        self.shots += int(shots)
+        return self
+
+    @property
+    def p(self):
+        return self.successes / self.shots if self.shots else 0.0
+
+    @property
+    def stderr(self):
+        return float(np.sqrt(self.p * (1 - self.p) / self.shots)) if self.shots else float("inf")
+
+    def sigma_above(self, floor):
+        # 与 final_48k_verdict 相同的定义: (p0 - chaos_floor) / stderr
+        return (self.p - floor) / self.stderr if self.stderr > 0 else float("inf")
+
+    def interval(self, z=Z_95):
+        lo, hi = wilson_interval(self.successes, self.shots, z)
+        return float(lo), float(hi)
+
+
+def _simpson_weights(x):
+    n = len(x)
+    if n % 2 == 0:
+        raise ValueError("Simpson grid needs an odd number of points")
+    w = np.ones(n)
+    w[1:-1:2], w[2:-1:2] = 4.0, 2.0
+    return w * (x[1] - x[0]) / 3.0
+
+
+@functools.lru_cache(maxsize=None)
+def pocock_boundary(sigma, info_times, grid=201):
+    """
+    Pocock 组序贯边界 (单侧)：在 info_times (累计 shots) 处各看一次，每次用同一个 z 门槛 c，
+    使 H0 (p = floor) 下任意一次越界的总概率等于单次 sigma 检验的 alpha = P(Z >= sigma)。
+    越界概率用 Armitage-McPherson-Rowe 递推数值积分 (布朗运动 W_t，门槛 c·sqrt(t))，c 用二分。
+    """
+    from scipy.stats import norm
+    t = np.asarray(info_times, dtype=float) / info_times[-1]
+    if len(t) == 1:
+        return float(sigma)
+    alpha = norm.sf(sigma)
+
+    def crossing(c):
+        b = c * np.sqrt(t)
+        x = np.linspace(-8 * np.sqrt(t[0]), b[0], grid)
+        f = norm.pdf(x, scale=np.sqrt(t[0]))
+        total = norm.sf(c)
+        for k in range(1, len(t)):
+            sd = np.sqrt(t[k] - t[k - 1])
+            wf = _simpson_weights(x) * f
+            total += wf @ norm.sf((b[k] - x) / sd)
+            x_next = np.linspace(min(x[0], -8 * np.sqrt(t[k])), b[k], grid)
+            kernel = np.exp(-0.5 * ((x_next[:, None] - x[None, :]) / sd) ** 2) / (sd * np.sqrt(2 * np.pi))
+            f = kernel @ wf
+            x = x_next
+        return total
+
+    lo, hi = float(sigma), float(sigma) + 3.0
+    while hi - lo > 1e-6:
+        mid = 0.5 * (lo + hi)
+        lo, hi = (mid, hi) if crossing(mid) > alpha else (lo, mid)
+    return hi
+
+
+class StopRule:
+    """
+    sigma: 相对 floor 的显著性目标；ci_width: 置信区间总宽度目标；两者任一达到即停。
+    sigma 不直接和每批的名义 z 比：按 increment 在 max_shots 内最多看几次，换算成 Pocock 边界。
+    """
+
+    def __init__(self, sigma=None, ci_width=None, floor=0.0, z=Z_95, max_shots=DEFAULT_MAX_SHOTS):
+        if sigma is None and ci_width is None:
+            raise ValueError("StopRule needs a sigma target, a ci_width target, or both")
+        self.sigma = sigma
+        self.ci_width = ci_width
+        self.floor = floor
+        self.z = z
+        self.max_shots = max_shots
+
+    def looks(self, increment):
+        n = -(-self.max_shots // increment)
+        return tuple(min((k + 1) * increment, self.max_shots) for k in range(n))
+
+    def boundary(self, increment=DEFAULT_INCREMENT):
+        """名义 z 要达到的门槛 (看的次数越多越高；只看一次时就等于 sigma)。"""
+        if self.sigma is None:
+            return float("inf")
+        return pocock_boundary(float(self.sigma), self.looks(increment))
+
+    def reason(self, est, increment=DEFAULT_INCREMENT):
+        if self.sigma is not None and est.sigma_above(self.floor) >= self.boundary(increment):
+            return f"sigma>={self.sigma} (Pocock z>={self.boundary(increment):.2f}, {len(self.looks(increment))} looks)"
+        if self.ci_width is not None:
+            lo, hi = est.interval(self.z)
+            if hi - lo <= self.ci_width:
+                return f"ci_width<={self.ci_width}"
+        if est.shots >= self.max_shots:
+            return "budget"
+        return None
+
+
+# ==========================================
+# 1. 单点：final_48k_verdict 的 P(000)
+# ==========================================
+def adaptive_survival(run_increment, rule, increment=DEFAULT_INCREMENT, target=0, num_bits=None, on_update=None):
+    """
+    run_increment(shots) -> PackedCounts (一次提交的结果)。
+    每批结果并入同一个 CountsAccumulator，返回完整直方图 + 逐批历史，方便画收敛曲线。
+    history 里的 sigma 是名义值 (未做序贯校正)；停不停看 boundary。
+    """
+    accumulator = CountsAccumulator(num_bits=num_bits)
+    est = BinomialEstimate()
+    history = []
+    boundary = rule.boundary(increment)
+    reason = None
+    while reason is None:
+        shots = min(increment, rule.max_shots - est.shots)
+        counts = run_increment(shots)
+        accumulator.add(counts)
+        est.update(counts.get(target), counts.shots)
+
+        lo, hi = est.interval(rule.z)
+        step = {"shots": est.shots, "p": est.p, "stderr": est.stderr,
+                "sigma": est.sigma_above(rule.floor), "boundary": boundary, "ci": [lo, hi]}
+        history.append(step)
+        if on_update is not None:
+            on_update(step)
+        reason = rule.reason(est, increment)
+
+    return {"counts": accumulator.result(), "estimate": est, "history": history, "stop_reason": reason}
+
+
+def sampler_increment(sampler, isa_circuit, register="meas"):
+    """把 SamplerV2 包装成 run_increment：每批一个 (circuit, None, shots) PUB，阻塞等结果。"""
+    from instrumentation import submit, wait
+
+    def run(shots):
+        result = wait(submit(sampler, [(isa_circuit, None, int(shots))]))
+        return as_packed(getattr(result[0].data, register))
+    return run
+
+
+# ==========================================
+# 2. 扫描网格：COOLING_SWEEP 的势井底部
+# ==========================================
+def dip_contenders(successes, shots, z=Z_95, neighbours=1):
+    """
+    可能是最低点的扫描点：区间下界 <= 当前最低点的区间上界。
+    再向两侧扩 neighbours 个点，势井的形状 (不只是最低点) 也能分辨。
+    """
+    lo, hi = wilson_interval(successes, shots, z)
+    p = np.asarray(successes, dtype=float) / np.maximum(shots, 1)
+    best = int(np.argmin(p))
+    contenders = np.flatnonzero(lo <= hi[best])
+    if neighbours:
+        offsets = np.arange(-neighbours, neighbours + 1)
+        contenders = np.unique(np.clip(contenders[:, None] + offsets[None, :], 0, len(p) - 1))
+    return contenders, best
+
+
+def adaptive_sweep(run_points, n_points, initial_shots=1024, increment=1024, max_total_shots=None,
+                   ci_width=None, z=Z_95, neighbours=1, on_round=None):
+    """
+    run_points(indices, shots) -> 每个索引的"成功"次数 (例如末端比特激发数)。
+    第 0 轮所有点各 initial_shots；之后每轮只给 dip_contenders 加 increment。
+    停止条件：最低点已与其他点分开 (只剩它和邻居) / 候选点区间都窄于 ci_width / 总预算用完。
+    """
+    max_total_shots = max_total_shots or n_points * initial_shots * 4
+    successes = np.zeros(n_points, dtype=np.int64)
+    shots = np.zeros(n_points, dtype=np.int64)
+
+    indices = np.arange(n_points)
+    rounds = 0
+    reason = None
+    while True:
+        successes[indices] += np.asarray(run_points(indices, initial_shots if rounds == 0 else increment), dtype=np.int64)
+        shots[indices] += initial_shots if rounds == 0 else increment
+        rounds += 1
+
+        contenders, best = dip_contenders(successes, shots, z, neighbours)
+        lo, hi = wilson_interval(successes, shots, z)
+        if on_round is not None:
+            on_round(rounds, contenders, best, int(shots.sum()))
+
+        resolved = np.flatnonzero(lo <= hi[best])
+        if len(resolved) == 1:
+            reason = "dip_resolved"
+        elif ci_width is not None and np.all(hi[contenders] - lo[contenders] <= ci_width):
+            reason = f"ci_width<={ci_width}"
+        elif shots.sum() + increment * len(contenders) > max_total_shots:
+            reason = "budget"
+        if reason:
+            break
+        indices = contenders
+
+    p = successes / np.maximum(shots, 1)
+    return {"successes": successes, "shots": shots, "p": p, "ci": np.stack([lo, hi], axis=1),
+            "best_index": best, "rounds": rounds, "total_shots": int(shots.sum()), "stop_reason": reason}
+
+
+def sweep_increment(sampler, isa_template, cooling_sweep, qubit):
+    """沉积链的 run_points：候选点一起塞进一个参数化 PUB，一轮只提交一个 job。"""
+    from sediment_circuits import sweep_pub
+    from instrumentation import submit, wait
+    cooling_sweep = np.asarray(cooling_sweep, dtype=float)
+
+    def run(indices, shots):
+        result = wait(submit(sampler, [sweep_pub(isa_template, cooling_sweep[indices], int(shots))]))
+        meas = result[0].data.meas
+        return np.array([as_packed(meas, loc=j).excitation_counts([qubit])[0] for j in range(len(indices))],
+                        dtype=np.int64)
+    return run
+
+
+def binomial_increment(probabilities, seed=None):
+    """离线替身：已知真实概率 (例如 MPS 算出来的 P_horizon)，按二项分布模拟 shot 噪声。"""
+    rng = np.random.default_rng(seed)
+    probabilities = np.asarray(probabilities, dtype=float)
+
+    def run(indices, shots):
+        return rng.binomial(int(shots), probabilities[indices])
+    return run
+
+
+if __name__ == "__main__":
+    from finite_size_scaling import LENGTHS
+    from mps_simulator import sediment_marginals
+
+    fine_sweep = np.round(np.linspace(0.0, 0.5, 21), 3)  # 理想模拟的势井底在 cf≈0.13
+    for L in LENGTHS:
+        truth = [sediment_marginals(L, cf)["p_horizon"] for cf in fine_sweep]
+        out = adaptive_sweep(binomial_increment(truth, seed=L), len(fine_sweep), initial_shots=1024,
+                             increment=4096, ci_width=0.015, max_total_shots=2_000_000)
+        # 同样的区间宽度如果每个点都打满，需要的总 shots
+        uniform = len(fine_sweep) * int(out["shots"].max())
+        print(f"L={L:<3} | dip @ cf={fine_sweep[out['best_index']]} (true {fine_sweep[int(np.argmin(truth))]}) | "
+              f"{out['total_shots']} shots vs {uniform} uniform ({out['total_shots'] / uniform:.0%}) | "
+              f"{out['rounds']} rounds, {out['stop_reason']}")
+
+    rule = StopRule(sigma=5.0, floor=0.125)
+    rng = np.random.default_rng(0)
+    probs = np.array([0.16] + [0.12] * 7)
+
+    def fake_increment(n):
+        return PackedCounts.from_shots(rng.choice(8, n, p=probs), 3)
+    out = adaptive_survival(fake_increment, rule, increment=2000)
+    print(f"P(000) = {out['estimate'].p:.4f} ± {out['estimate'].stderr:.4f} after {out['estimate'].shots} shots "
+          f"(nominal {out['history'][-1]['sigma']:.2f} sigma, uncorrected) | {out['stop_reason']}, budget {rule.max_shots}")
@@ -0,0 +1,116 @@
+import os
+
+# ==========================================
+# 🔌 0.25 Protocol: Backend Provider
+#    所有实验脚本统一从这里拿 backend
+#    QRP_BACKEND_MODE = ibm | fake | statevector | density_matrix
+# ==========================================
+
+BACKEND_MODE_ENV = "QRP_BACKEND_MODE"
+FAKE_BACKEND_ENV = "QRP_FAKE_BACKEND"
+
+MODE_IBM = "ibm"
+MODE_FAKE = "fake"
+MODE_STATEVECTOR = "statevector"
+MODE_DENSITY_MATRIX = "density_matrix"
+LOCAL_MODES = (MODE_FAKE, MODE_STATEVECTOR, MODE_DENSITY_MATRIX)
+
+# 真机名 -> 本地噪声模型 (fake backend 类名)
+FAKE_BACKENDS = {
+    "ibm_torino": "FakeTorino",
+    "ibm_fez": "FakeFez",
+    "ibm_marrakesh": "FakeMarrakesh",
+    "ibm_kingston": "FakeKingston",
+    "ibm_brisbane": "FakeBrisbane",
+}
+DEFAULT_FAKE_BACKEND = "ibm_torino"
+
+_service = None
+
+
+def get_mode(mode=None):
+    """Resolve the execution mode (explicit argument > env var > 'ibm')."""
+    mode = (mode or os.environ.get(BACKEND_MODE_ENV) or MODE_IBM).lower()
+    if mode not in (MODE_IBM,) + LOCAL_MODES:
+        raise ValueError(f"Unknown backend mode '{mode}' (expected ibm/fake/statevector/density_matrix)")
+    return mode
+
+
+def is_local(mode=None):
+    return get_mode(mode) in LOCAL_MODES
+
+
+def get_service():
+    """QiskitRuntimeService with the channel fallbacks the scripts used to copy around."""
+    global _service
+    if _service is not None:
+        return _service
+
+    from qiskit_ibm_runtime import QiskitRuntimeService
+    try:
+        _service = QiskitRuntimeService()
+    except Exception:
+        try:
+            _service = QiskitRuntimeService(channel="ibm_quantum")
+        except Exception:
+            _service = QiskitRuntimeService(channel="ibm_quantum_platform")
+    return _service
+
+
+def get_fake_backend(name=None):
+    name = name or os.environ.get(FAKE_BACKEND_ENV) or DEFAULT_FAKE_BACKEND
+    if name not in FAKE_BACKENDS:
+        raise ValueError(f"No local noise model for '{name}' (known: {sorted(FAKE_BACKENDS)})")
+
+    from qiskit_ibm_runtime import fake_provider
+    return getattr(fake_provider, FAKE_BACKENDS[name])()
+
+
+def get_simulator(method=MODE_STATEVECTOR):
+    """Noise-free local engine (Aer if installed, otherwise Qiskit's BasicSimulator)."""
+    try:
+        from qiskit_aer import AerSimulator
+    except ImportError:
+        if method != MODE_STATEVECTOR:
+            raise ImportError("density_matrix mode requires qiskit-aer (pip install qiskit-aer)")
+        from qiskit.providers.basic_provider import BasicSimulator
+        return BasicSimulator()
+    return AerSimulator(method=method)
+
+
+def get_backend(name=None, mode=None, **least_busy_filters):
+    """
+    统一入口:
+      get_backend("ibm_torino")                      -> 指定机器
+      get_backend(dynamic_circuits=True, ...)        -> least_busy(...)
+    本地模式下同样的调用返回 fake backend / 模拟器，脚本其余部分不用改。
+    """
+    mode = get_mode(mode)
+
+    if mode == MODE_FAKE:
+        # 脚本里写死了 BACKEND_NAME='ibm_torino'，所以本地模式下 QRP_FAKE_BACKEND 优先
+        return get_fake_backend(os.environ.get(FAKE_BACKEND_ENV) or name)
+    if mode in (MODE_STATEVECTOR, MODE_DENSITY_MATRIX):
+        return get_simulator(mode)
+
+    service = get_service()
+    if name is not None:
+        return service.backend(name)
+    least_busy_filters.setdefault("operational", True)
+    least_busy_filters.setdefault("simulator", False)
+    return service.least_busy(**least_busy_filters)
+
+
+def describe(backend):
+    mode = get_mode()
+    if mode == MODE_IBM:
+        return backend.name
+    return f"{backend.name} [local: {mode}]"
+
+
+def two_qubit_gate_name(target):
+    """target 里的原生 2q 门 (Heron: cz, Eagle: ecr)；没有就是 None。"""
+    for name in ("cz", "ecr", "cx"):
+        if name in target.operation_names:
+            return name
+    return None
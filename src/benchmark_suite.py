@@ -0,0 +1,312 @@
+import contextlib
+import datetime
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+# ==========================================
+# ⏱️ 0.25 Protocol: Benchmark Suite
+#    asv 风格：每个阶段 (构建 / 布局 / 转译 / 提交 / 取回 / 解析 / 画图) 一个基准，参数网格展开
+#    全部跑在本地 fake backend 上；每次结果追加到 JSONL 历史，和同一台机器最近几次的中位数比较
+# ==========================================
+
+BENCH_DIR_ENV = "QRP_BENCH_DIR"
+DEFAULT_BENCH_DIR = os.path.join(os.path.expanduser("~"), ".cache", "qrp", "benchmarks")
+HISTORY_FILE = "history.jsonl"
+HISTORY_WINDOW = 5          # 基线 = 同一台机器最近 5 次最快耗时的中位数
+REGRESSION_FACTOR = 1.25    # 最快耗时慢 25% 以上算回退 (min 比 median 抗干扰)
+REGRESSION_MIN_DELTA = 0.005  # 毫秒级的抖动不算
+BENCH_BACKEND = "ibm_torino"
+
+BENCHMARKS = {}
+_fake_backend = None
+_samplers = {}
+
+
+def benchmark(name, repeat=5, **params):
+    """
+    注册一个基准。被装饰的函数按参数做准备工作 (不计时)，返回要计时的零参数函数，
+    或者 (函数, cleanup)。每次 repeat 都重新准备一次。
+    """
+    def register(fn):
+        BENCHMARKS[name] = {"fn": fn, "repeat": repeat, "params": params}
+        return fn
+    return register
+
+
+def fake_backend():
+    global _fake_backend
+    if _fake_backend is None:
+        from backend_provider import get_fake_backend
+        _fake_backend = get_fake_backend(BENCH_BACKEND)
+    return _fake_backend
+
+
+def local_sampler(isa):
+    """
+    Aer SamplerV2，噪声模型只含 isa 实际用到的比特 (由 fake backend 的 target 生成)，按比特集合缓存。
+    runtime 本地模式每次 run 都要深拷贝并上传整台机器的噪声模型 (十几秒，和 shots 无关)，那不是提交 / 取回的开销。
+    """
+    from qiskit_aer.noise import NoiseModel
+    from qiskit_aer.noise.device import basic_device_gate_errors, basic_device_readout_errors
+    from qiskit_aer.primitives import SamplerV2 as AerSampler
+    active = frozenset(isa.find_bit(q).index for inst in isa.data for q in inst.qubits)
+    if active not in _samplers:
+        target = fake_backend().target
+        noise = NoiseModel(basis_gates=fake_backend().operation_names)
+        for qubits, error in basic_device_readout_errors(target=target):
+            if set(qubits) <= active:
+                noise.add_readout_error(error, qubits)
+        for name, qubits, error in basic_device_gate_errors(target=target):
+            if set(qubits) <= active:
+                noise.add_quantum_error(error, name, qubits)
+        _samplers[active] = AerSampler(options={"backend_options": {"noise_model": noise}})
+    return _samplers[active]
+
+
+def synthetic_result(num_bits, width, shots, seed=0):
+    """和 SamplerV2 结果同形状的随机数据：一个 PUB，meas 寄存器 (width, shots)。"""
+    from qiskit.primitives.containers import BitArray, DataBin, SamplerPubResult
+    rng = np.random.default_rng(seed)
+    packed = rng.integers(0, 256, size=(width, shots, (num_bits + 7) // 8), dtype=np.uint8)
+    packed[..., 0] &= (1 << (num_bits % 8 or 8)) - 1  # 高位字节只保留有效比特
+    return SamplerPubResult(DataBin(meas=BitArray(packed, num_bits), shape=(width,)))
+
+
+# ==========================================
+# 1. 各阶段基准
+# ==========================================
+@benchmark("build.sediment", length=[16, 28, 64, 156])
+def bench_build_sediment(length):
+    from sediment_circuits import create_parametric_sediment_circuit
+    return lambda: create_parametric_sediment_circuit(length)
+
+
+@benchmark("build.butterfly", layers=[150, 1000, 10000])
+def bench_build_butterfly(layers):
+    from butterfly_engine import build_butterfly_circuit
+    return lambda: build_butterfly_circuit(layers)
+
+
+@benchmark("layout.chain", repeat=3, length=[16, 28])
+def bench_layout(length):
+    from layout_search import rank_chains
+    from sediment_circuits import create_sediment_circuit
+    backend, qc = fake_backend(), create_sediment_circuit(length, 0.25)
+    return lambda: rank_chains(backend, circuit=qc, top=1)
+
+
+@benchmark("transpile.sediment", repeat=2, length=[8, 16, 28])
+def bench_transpile_sediment(length):
+    """finite_size_scaling 的 level-3 转译 (不走缓存，布局预先选好)。"""
+    from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+    from layout_search import best_chain
+    from sediment_circuits import create_parametric_sediment_circuit
+    backend = fake_backend()
+    qc, _ = create_parametric_sediment_circuit(length)
+    pm = generate_preset_pass_manager(backend=backend, optimization_level=3, initial_layout=best_chain(backend, circuit=qc))
+    return lambda: pm.run(qc)
+
+
+@benchmark("transpile.butterfly", repeat=2, layers=[150, 1000])
+def bench_transpile_butterfly(layers):
+    from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+    from butterfly_engine import build_butterfly_circuit
+    pm = generate_preset_pass_manager(backend=fake_backend(), optimization_level=1)
+    qc = build_butterfly_circuit(layers)
+    return lambda: pm.run(qc)
+
+
+def _butterfly_pubs(width, shots, layers=10):
+    """sampler 在准备阶段建好 (不计时)，计时部分只剩执行 + 结果解析。"""
+    from qiskit.circuit import Parameter
+    from butterfly_engine import build_butterfly_circuit
+    from transpile_cache import cached_transpile
+    isa = cached_transpile(build_butterfly_circuit(layers, Parameter("γ")), fake_backend(), optimization_level=1)
+    return local_sampler(isa), [(isa, np.linspace(0.1, 0.5, width).reshape(-1, 1), shots)]
+
+
+@benchmark("run.submit", repeat=3, width=[1, 8])
+def bench_submit(width):
+    sampler, pubs = _butterfly_pubs(width, 1024)
+    jobs = []
+    return (lambda: jobs.append(sampler.run(pubs))), (lambda: jobs[-1].result())
+
+
+@benchmark("run.fetch", repeat=3, width=[1, 8], shots=[1024, 8192])
+def bench_fetch(width, shots):
+    """本地 result() = 噪声模拟 + 结果解析 (云端对应排队 + QPU + 下载)；模拟器不在计时范围内构建。"""
+    sampler, pubs = _butterfly_pubs(width, shots)
+    job = sampler.run(pubs)
+    return job.result
+
+
+@benchmark("fetch.pack", shots=[4096, 65536], width=[8])
+def bench_pack(shots, width):
+    """下载后打包成 StoredResult (result_store._pack_result)。"""
+    from result_store import _pack_result
+    result = [synthetic_result(20, width, shots)]
+    return lambda: _pack_result("bench", result, BENCH_BACKEND)
+
+
+@benchmark("analysis.horizon", shots=[8192, 65536])
+def bench_horizon(shots):
+    """finite_size_scaling.extract_horizon_probs：LENGTHS 个 PUB × COOLING_SWEEP 个点。"""
+    from finite_size_scaling import COOLING_SWEEP, LENGTHS, extract_horizon_probs
+    result = [synthetic_result(L, len(COOLING_SWEEP), shots, seed=L) for L in LENGTHS]
+    return lambda: extract_horizon_probs(result)
+
+
+@benchmark("analysis.survival", repeat=3, pubs=[5, 50])
+def bench_survival(pubs):
+    from survival_stats import survival_report
+    counts = np.random.default_rng(0).multinomial(12000, [0.16] + [0.12] * 7, size=pubs)
+    return lambda: survival_report(counts, target=0, floor=0.125, n_resamples=2000, seed=1)
+
+
+@benchmark("plot.fss", repeat=3)
+def bench_plot_fss():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from finite_size_scaling import COOLING_SWEEP, LENGTHS, analyze_and_plot
+    probs = np.random.default_rng(0).uniform(0.05, 0.3, size=(len(LENGTHS), len(COOLING_SWEEP))).tolist()
+    workdir = tempfile.mkdtemp(prefix="qrp-bench-")
+
+    def run():
+        cwd = os.getcwd()
+        os.chdir(workdir)  # analyze_and_plot 把 PDF/JSON 写到当前目录
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                analyze_and_plot(probs, "bench")
+        finally:
+            os.chdir(cwd)
+            plt.close("all")
+    return run
+
+
+# ==========================================
+# 2. 运行 & 历史
+# ==========================================
+def expand(selected=None, quick=False):
+    """(name, params) 列表；quick 只取每个参数的第一个值。"""
+    cases = []
+    for name, spec in BENCHMARKS.items():
+        if selected and not any(s in name for s in selected):
+            continue
+        keys = list(spec["params"])
+        values = [spec["params"][k][:1] if quick else spec["params"][k] for k in keys]
+        for combo in itertools.product(*values):
+            cases.append((name, dict(zip(keys, combo))))
+    return cases
+
+
+def time_case(name, params, repeat=None):
+    spec = BENCHMARKS[name]
+    wall, cpu = [], []
+    for _ in range(repeat or spec["repeat"]):
+        prepared = spec["fn"](**params)
+        fn, cleanup = prepared if isinstance(prepared, tuple) else (prepared, None)
+        t0, c0 = time.perf_counter(), time.process_time()
+        fn()
+        wall.append(time.perf_counter() - t0)
+        cpu.append(time.process_time() - c0)
+        if cleanup is not None:
+            cleanup()
+    return {"median": statistics.median(wall), "min": min(wall), "max": max(wall),
+            "cpu_median": statistics.median(cpu), "repeat": len(wall)}
+
+
+def environment():
+    import qiskit
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(["git", "-C", repo, "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"commit": commit, "machine": platform.node(), "cpus": os.cpu_count(),
+            "python": platform.python_version(), "numpy": np.__version__, "qiskit": qiskit.__version__}
+
+
+class BenchmarkHistory:
+    def __init__(self, bench_dir=None):
+        self.bench_dir = bench_dir or os.environ.get(BENCH_DIR_ENV) or DEFAULT_BENCH_DIR
+        os.makedirs(self.bench_dir, exist_ok=True)
+        self.path = os.path.join(self.bench_dir, HISTORY_FILE)
+
+    def records(self):
+        if not os.path.exists(self.path):
+            return []
+        out = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    out.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return out
+
+    def append(self, records):
+        with open(self.path, "a") as f:
+            for rec in records:
+                f.write(json.dumps(rec) + "\n")
+
+    def baselines(self, machine, window=HISTORY_WINDOW):
+        """{(name, params_json): 最近 window 次最快耗时的中位数}，只看同一台机器。"""
+        runs = {}
+        for rec in self.records():
+            if rec.get("machine") == machine:
+                runs.setdefault((rec["name"], json.dumps(rec["params"], sort_keys=True)), []).append(rec["min"])
+        return {key: statistics.median(values[-window:]) for key, values in runs.items()}
+
+
+def run_suite(selected=None, quick=False, record=True, history=None, on_case=None):
+    history = history or BenchmarkHistory()
+    env = environment()
+    baselines = history.baselines(env["machine"])
+    stamp = datetime.datetime.now().isoformat(timespec="seconds")
+    records = []
+    for name, params in expand(selected, quick):
+        rec = {"name": name, "params": params, "timestamp": stamp, **env, **time_case(name, params)}
+        base = baselines.get((name, json.dumps(params, sort_keys=True)))
+        rec["baseline"] = base
+        rec["regression"] = (base is not None and rec["min"] > REGRESSION_FACTOR * base
+                             and rec["min"] - base > REGRESSION_MIN_DELTA)
+        records.append(rec)
+        if on_case is not None:
+            on_case(rec)
+    if record:
+        history.append(records)
+    return records
+
+
+def format_row(rec):
+    params = ", ".join(f"{k}={v}" for k, v in rec["params"].items())
+    change = "" if rec["baseline"] is None else f"{(rec['min'] / rec['baseline'] - 1) * 100:+.0f}%"
+    flag = "⚠️ regression" if rec["regression"] else ""
+    return (f"{rec['name']:<20} {params:<22} {rec['median'] * 1e3:>10.2f} {rec['cpu_median'] * 1e3:>10.2f} "
+            f"{rec['repeat']:>3} {change:>7} {flag}")
+
+
+if __name__ == "__main__":
+    # 例: python benchmark_suite.py build transpile --quick --check
+    args = sys.argv[1:]
+    selected = [a for a in args if not a.startswith("--")]
+    print(f"⏱️ Benchmarks on local {BENCH_BACKEND} (fake) | history: {BenchmarkHistory().path}")
+    print(f"{'benchmark':<20} {'params':<22} {'wall (ms)':>10} {'cpu (ms)':>10} {'n':>3} {'Δ':>7}")
+    records = run_suite(selected, quick="--quick" in args, record="--no-record" not in args,
+                        on_case=lambda rec: print(format_row(rec), flush=True))
+    regressions = [r for r in records if r["regression"]]
+    print(f"\n{'⚠️' if regressions else '✅'} {len(records)} cases, {len(regressions)} regressions "
+          f"(best time > {REGRESSION_FACTOR:.2f}x the last {HISTORY_WINDOW} runs)")
+    if "--check" in args and regressions:
+        sys.exit(1)
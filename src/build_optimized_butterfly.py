@@ -1,8 +1,13 @@
+import sys
 import numpy as np
 import datetime
-import time
-from qiskit import QuantumCircuit, transpile
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2, SamplerOptions
+from qiskit import transpile
+from qiskit_ibm_runtime import SamplerV2, SamplerOptions
+from backend_provider import get_backend, describe
+from butterfly_engine import build_butterfly_circuit
+from campaign import Campaign, run_campaign
+from result_store import ResultStore
+from packed_counts import as_packed
 
 # ==========================================
 # ⚔️ 0.25 协议：饱和轰炸模式 (War Room)
@@ -11,34 +16,14 @@ from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2, SamplerOptions
 
 # 1. 极速连接 (不做多余检查，抢时间)
 print(f"🚀 [00:00] 正在连接 IBM Quantum...")
-try:
-    service = QiskitRuntimeService()
-except:
-    # 备用方案
-    service = QiskitRuntimeService(channel="ibm_quantum")
+backend = get_backend("ibm_torino")
+print(f"✅ [00:02] 锁定目标: {describe(backend)}")
 
-backend = service.backend("ibm_torino")
-print(f"✅ [00:02] 锁定目标: {backend.name}")
-
-# 2. 构建核心电路 (150层蝴蝶算符 + 逆向)
-def build_optimized_butterfly(layers=150, gamma=0.25):
-    qc = QuantumCircuit(3)
-    # 正向演化
-    for _ in range(layers):
-        qc.rx(gamma * np.pi, [0, 1, 2])
-        qc.cz(0, 1)
-        qc.cz(1, 2)
-        qc.rz(0.25 * np.pi, [0, 1, 2])
-    
-    # 逆向回溯 (Time Reversal)
-    qc.barrier()
-    qc.append(qc.inverse(), [0, 1, 2])
-    qc.measure_all()
-    return qc
+# 2. 核心电路 (150层蝴蝶算符 + 逆向) 定义在 butterfly_engine.build_butterfly_circuit，和本地模拟共用
 
 # 3. 本地编译 (省去排队时的编译时间)
 print(f"🔨 [00:05] 正在构建 300 层深度电路...")
-raw_qc = build_optimized_butterfly()
+raw_qc = build_butterfly_circuit()
 optimized_qc = transpile(raw_qc, backend, optimization_level=1)
 print(f"✅ [00:08] 电路编译完成 (Depth: {optimized_qc.depth()})")
 
@@ -55,29 +40,46 @@ options.default_shots = SHOTS_PER_JOB  # V2 标准写法
 
 sampler = SamplerV2(backend, options=options)
 
-# 5. 发射序列
-print(f"\n🔥🔥🔥 正在发射 {TOTAL_SHOTS} 次实验请求 🔥🔥🔥")
-job_ids = []
-
-for i in range(BATCH_COUNT):
-    print(f"   >>> 正在装填第 {i+1}/{BATCH_COUNT} 波...")
-    
-    # 提交任务
-    job = sampler.run([optimized_qc])
-    job_ids.append(job.job_id())
-    
-    print(f"   🚀 第 {i+1} 波已升空! ID: {job.job_id()}")
-    # 稍微停顿0.5秒防止接口拥堵
-    time.sleep(0.5)
-
-# 6. 写入总账本 (防止浏览器崩溃丢失ID)
+# 5. 发射序列 (并发提交，每个 ID 一拿到就写账本，防止浏览器崩溃丢失ID)
+#    加 --watch 则留在线上：指数退避轮询，哪一波先落地就先分析哪一波
+WATCH = "--watch" in sys.argv
 log_filename = "final_war_ids.txt"
+
+print(f"\n🔥🔥🔥 正在发射 {TOTAL_SHOTS} 次实验请求 🔥🔥🔥")
 with open(log_filename, "a") as f:
     f.write(f"\n=== BATCH ASSAULT {datetime.datetime.now().isoformat()} ===\n")
     f.write(f"Backend: {backend.name} | Total Shots: {TOTAL_SHOTS}\n")
-    for jid in job_ids:
-        f.write(f"{jid}\n")
+
+def record_launch(cjob):
+    print(f"   🚀 第 {cjob.tag + 1}/{BATCH_COUNT} 波已升空! ID: {cjob.job_id}")
+    with open(log_filename, "a") as f:
+        f.write(f"{cjob.job_id}\n")
+
+def analyze_wave(cjob):
+    # 回到 |000> 的概率 = 因果逆转的存活率
+    p0 = as_packed(cjob.result[0].data.meas).probability(0)
+    print(f"   📊 第 {cjob.tag + 1} 波落地 ({cjob.job_id}) | P(000) = {p0:.4f}")
+    return p0
+
+batches = [[optimized_qc]] * BATCH_COUNT
+if WATCH:
+    jobs = run_campaign(sampler, batches, on_submit=record_launch, on_done=analyze_wave, store=ResultStore())
+    survived = [cjob.analysis for cjob in jobs if cjob.analysis is not None]
+    for cjob in jobs:
+        if cjob.analysis is None:
+            print(f"   ⚠️ {cjob.job_id}: {cjob.status} {cjob.error or ''}")
+    if survived:
+        print(f"\n🌌 {len(survived)}/{BATCH_COUNT} 波完成 | 平均 P(000) = {np.mean(survived):.4f}")
+else:
+    import asyncio
+
+    async def launch():
+        campaign = Campaign(sampler, on_submit=record_launch)
+        return await asyncio.gather(*(campaign.submit(pubs, tag) for tag, pubs in enumerate(batches)))
+    jobs = asyncio.run(launch())
+job_ids = [cjob.job_id for cjob in jobs]
 
 print(f"\n✅ 全部发射完毕！ID 已保存至 {log_filename}")
-print("☕ 你的任务已经进入云端排队，现在可以安全关机或断网了。")
+if not WATCH:
+    print("☕ 你的任务已经进入云端排队，现在可以安全关机或断网了。")
 print(f"👀 监视链接: https://quantum.ibm.com/jobs/{job_ids[0]}")
@@ -0,0 +1,193 @@
+import json
+import os
+import time
+import numpy as np
+
+# ==========================================
+# 🦋 0.25 Protocol: Butterfly Fast Engine
+#    build_optimized_butterfly 的专用 NumPy 模拟器
+#    一层 = rx(γπ)^⊗3 · CZ(0,1) · CZ(1,2) · rz(φ)^⊗3  -> 8x8 矩阵
+#    L 层 = 矩阵快速幂 (repeated squaring)，整张 γ×depth 网格一次算完
+# ==========================================
+
+N_QUBITS = 3
+DIM = 2 ** N_QUBITS
+DEFAULT_RZ_ANGLE = 0.25 * np.pi
+STRESS_TEST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "evidence", "stress_test_data.json")
+
+# Qiskit little-endian: index = b0 + 2*b1 + 4*b2
+_BITS = (np.arange(DIM)[:, None] >> np.arange(N_QUBITS)) & 1
+_CZ_CHAIN = np.where((_BITS[:, 0] & _BITS[:, 1]) ^ (_BITS[:, 1] & _BITS[:, 2]), -1.0, 1.0).astype(complex)
+
+_PAULIS = np.array([
+    [[1, 0], [0, 1]],
+    [[0, 1], [1, 0]],
+    [[0, -1j], [1j, 0]],
+    [[1, 0], [0, -1]],
+], dtype=complex)
+
+
+def butterfly_layer(gamma=0.25, rz_angle=DEFAULT_RZ_ANGLE):
+    """单层：rx(γπ)^⊗3 · CZ(0,1) · CZ(1,2) · rz(φ)^⊗3 (γ 可以是 Parameter)。"""
+    from qiskit import QuantumCircuit
+    qc = QuantumCircuit(N_QUBITS)
+    qc.rx(gamma * np.pi, [0, 1, 2])
+    qc.cz(0, 1)
+    qc.cz(1, 2)
+    qc.rz(rz_angle, [0, 1, 2])
+    return qc
+
+
+def build_butterfly_circuit(layers=150, gamma=0.25, layer_barriers=False):
+    """硬件上跑的那条电路：正向 layers 层 + barrier + 整体逆向 + measure_all (引擎模拟的就是它)。"""
+    from circuit_builder import mirror
+    # 正向演化 + 逆向回溯 (Time Reversal)：一层模板倍增铺设，逆向是单层的结构逆
+    return mirror(butterfly_layer(gamma), layers, barriers=layer_barriers)
+
+
+def _kron3(single):
+    """(N,2,2) -> (N,8,8), 同一个单比特门作用在三个比特上。"""
+    n = single.shape[0]
+    return np.einsum('nab,ncd,nef->nacebdf', single, single, single).reshape(n, DIM, DIM)
+
+
+def layer_unitaries(gammas, rz_angles=DEFAULT_RZ_ANGLE):
+    """Fused 8x8 unitary of one butterfly layer for every gamma, shape (N, 8, 8)."""
+    gammas = np.atleast_1d(np.asarray(gammas, dtype=float))
+    rz_angles = np.broadcast_to(np.asarray(rz_angles, dtype=float), gammas.shape)
+
+    half = gammas * np.pi / 2
+    rx = np.empty((gammas.size, 2, 2), dtype=complex)
+    rx[:, 0, 0] = rx[:, 1, 1] = np.cos(half)
+    rx[:, 0, 1] = rx[:, 1, 0] = -1j * np.sin(half)
+
+    rz = np.zeros((gammas.size, 2, 2), dtype=complex)
+    rz[:, 0, 0] = np.exp(-0.5j * rz_angles)
+    rz[:, 1, 1] = np.exp(0.5j * rz_angles)
+
+    # 先 rx，再 CZ 链，最后 rz
+    return _kron3(rz) @ (_CZ_CHAIN[None, :, None] * _kron3(rx))
+
+
+def apply_matrix_power(mats, exponents, vecs, index=None):
+    """
+    vecs[i] <- mats[index[i]] ** exponents[i] @ vecs[i]，矩阵快速幂。
+    平方只对不同的层矩阵做一次 (O(log L) 次矩阵乘)，每个实验点只做矩阵-向量乘。
+    """
+    index = np.arange(len(vecs)) if index is None else np.asarray(index)
+    exponents = np.array(np.broadcast_to(exponents, index.shape), dtype=np.int64)
+    if (exponents < 0).any():
+        raise ValueError("Layer counts must be non-negative")
+
+    out = np.array(vecs, dtype=np.result_type(mats, vecs))
+    base = mats.copy()
+    while exponents.any():
+        odd = (exponents & 1).astype(bool)
+        out[odd] = np.einsum('nij,nj->ni', base[index[odd]], out[odd])
+        exponents >>= 1
+        if exponents.any():
+            base = base @ base
+    return out
+
+
+# 64 个三比特 Pauli 串 P_(abc) = P_a(q2) ⊗ P_b(q1) ⊗ P_c(q0)
+_PAULI_STRINGS = np.einsum('aij,bkl,cmn->abcikmjln', _PAULIS, _PAULIS, _PAULIS).reshape(DIM * DIM, DIM, DIM)
+_PAULI_STRINGS_T = np.swapaxes(_PAULI_STRINGS, 1, 2).reshape(DIM * DIM, DIM * DIM)
+_PAULI_DIAG = _PAULI_STRINGS.diagonal(axis1=1, axis2=2).real
+_NON_IDENTITY = (np.indices((4, 4, 4)).reshape(3, -1) > 0).sum(axis=0)
+
+
+def depolarizing_ptm_diag(p):
+    """Pauli transfer matrix of independent single-qubit depolarizing noise (diagonal), shape (N, 64)."""
+    p = np.atleast_1d(np.asarray(p, dtype=float))
+    return (1 - 4 * p[:, None] / 3) ** _NON_IDENTITY[None, :]
+
+
+def unitary_ptms(U):
+    """Real Pauli transfer matrices R[k, l] = Tr(P_k U P_l U†) / 8, shape (N, 64, 64)."""
+    U_dag = np.conj(np.swapaxes(U, 1, 2))
+    conj = (U[:, None] @ _PAULI_STRINGS[None] @ U_dag[:, None]).reshape(-1, DIM * DIM, DIM * DIM)
+    return (_PAULI_STRINGS_T @ np.swapaxes(conj, 1, 2)).real / DIM
+
+
+def outcome_probabilities(gammas, layers, rz_angles=DEFAULT_RZ_ANGLE, initial_state=0,
+                          depolarizing=0.0, include_inverse=True):
+    """
+    计算 build_optimized_butterfly(layers, gamma) 的测量分布，shape (N, 8)。
+      gammas / layers / rz_angles / depolarizing: 可广播的数组，每个元素是一个实验点
+      initial_state: 初始比特串 (整数, 例如 0b111 对应 scaling law 的 |111>)
+      depolarizing: 每层每比特的去极化概率 (全 0 = 纯态矢量引擎)
+      include_inverse: True 时附加 qc.inverse() 的时间反演
+    """
+    gammas, layers, rz_angles, depolarizing = np.broadcast_arrays(
+        np.asarray(gammas, dtype=float), np.asarray(layers, dtype=np.int64),
+        np.asarray(rz_angles, dtype=float), np.asarray(depolarizing, dtype=float))
+    shape = gammas.shape
+    layers = layers.ravel()
+
+    # 同一个 (γ, φ, p) 的层矩阵只构建/平方一次
+    keys, index = np.unique(np.stack([gammas.ravel(), rz_angles.ravel(), depolarizing.ravel()], axis=1),
+                            axis=0, return_inverse=True)
+    index = index.ravel()
+    U = layer_unitaries(keys[:, 0], keys[:, 1])
+    U_dag = np.conj(np.swapaxes(U, 1, 2))
+
+    if not keys[:, 2].any():
+        psi = np.zeros((layers.size, DIM), dtype=complex)
+        psi[:, initial_state] = 1.0
+        psi = apply_matrix_power(U, layers, psi, index)
+        if include_inverse:
+            psi = apply_matrix_power(U_dag, layers, psi, index)
+        probs = np.abs(psi) ** 2
+        return probs.reshape(shape + (DIM,))
+
+    # 密度矩阵路径: Pauli transfer matrix (64x64 实矩阵)，噪声 = 每层之后的对角缩放
+    noise = depolarizing_ptm_diag(keys[:, 2])[:, :, None]
+    r = np.broadcast_to(_PAULI_DIAG[:, initial_state], (layers.size, DIM * DIM))
+    r = apply_matrix_power(noise * unitary_ptms(U), layers, r, index)
+    if include_inverse:
+        r = apply_matrix_power(noise * unitary_ptms(U_dag), layers, r, index)
+    probs = r @ _PAULI_DIAG / DIM
+    return np.clip(probs, 0.0, 1.0).reshape(shape + (DIM,))
+
+
+def survival_grid(gammas, depths, target_state=0, **kwargs):
+    """P(target) 在 depth×gamma 网格上的值，shape (len(depths), len(gammas))。"""
+    G, D = np.meshgrid(np.asarray(gammas, dtype=float), np.asarray(depths, dtype=np.int64))
+    return outcome_probabilities(G, D, **kwargs)[..., target_state]
+
+
+def fit_depolarizing(records, p_grid=np.linspace(0.0, 0.02, 201)):
+    """在 p_grid 上扫描去极化强度，找到最贴合硬件 survival_rate 的那一个。"""
+    gammas = np.array([r["gamma"] for r in records], dtype=float)
+    depths = np.array([r["depth"] for r in records], dtype=np.int64)
+    observed = np.array([r["survival_rate"] for r in records], dtype=float)
+
+    # (len(p_grid), len(records)) 一次性堆叠计算
+    predicted = outcome_probabilities(gammas[None, :], depths[None, :], depolarizing=np.asarray(p_grid)[:, None])[..., 0]
+    residuals = np.sum((predicted - observed[None, :]) ** 2, axis=1)
+    best = int(np.argmin(residuals))
+    return p_grid[best], residuals[best]
+
+
+if __name__ == "__main__":
+    with open(STRESS_TEST_FILE) as f:
+        records = json.load(f)
+
+    gammas = sorted({r["gamma"] for r in records})
+    depths = sorted({r["depth"] for r in records})
+
+    t0 = time.perf_counter()
+    ideal = survival_grid(gammas, depths)
+    t1 = time.perf_counter()
+    print(f"🦋 Ideal grid {len(depths)}x{len(gammas)} in {(t1 - t0) * 1e3:.2f} ms (P000 min = {ideal.min():.6f})")
+
+    t0 = time.perf_counter()
+    p_best, sse = fit_depolarizing(records)
+    t1 = time.perf_counter()
+    print(f"🔧 Best-fit depolarizing p = {p_best:.4f}/layer/qubit (SSE={sse:.5f}, {(t1 - t0) * 1e3:.1f} ms)")
+
+    noisy = survival_grid(gammas, depths, depolarizing=p_best)
+    for r in records:
+        model = noisy[depths.index(r["depth"]), gammas.index(r["gamma"])]
+        print(f"   γ={r['gamma']:<6} depth={r['depth']:<3} | hardware={r['survival_rate']:.4f} | model={model:.4f}")
@@ -0,0 +1,239 @@
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace
+from result_store import FINAL_OK, ResultStore, status_name
+
+# ==========================================
+# 🛰️ 0.25 Protocol: Async Campaign Manager
+#    并发提交多波 job -> 指数退避轮询 (QUEUED / RUNNING / DONE)
+#    哪个 job 先完成就先触发分析，不再逐个阻塞在 job.result()
+# ==========================================
+
+POLL_INITIAL = 2.0      # 秒
+POLL_MAX = 60.0
+POLL_BACKOFF = 1.6
+MAX_CONCURRENT_SUBMITS = 4  # 代替原来的 time.sleep(0.5)：限制同时在途的提交请求
+FAILED_STATES = ("ERROR", "CANCELLED")
+
+
+class CampaignJob:
+    def __init__(self, tag, job):
+        self.tag = tag
+        self.job = job
+        self.job_id = job.job_id()
+        self.status = "QUEUED"
+        self.history = []       # [(秒, 状态)]，状态变化才记录
+        self.result = None
+        self.analysis = None
+        self.error = None
+
+    @property
+    def finished(self):
+        return self.status == FINAL_OK or self.status in FAILED_STATES or self.error is not None
+
+    def __repr__(self):
+        return f"CampaignJob({self.tag!r}, {self.job_id}, {self.status})"
+
+
+class Campaign:
+    """
+    sampler: 任何有 .run(pubs) 的 SamplerV2 (IBM / 本地 fake / FakeRuntime)。
+    on_done(cjob): 每个 job 完成时立即调用；普通函数放到线程里跑，async 函数直接 await。
+    store: 传入 ResultStore 就把结果落盘，后续分析脚本离线可读。
+    """
+
+    def __init__(self, sampler, on_done=None, on_submit=None, store=None, poll_initial=POLL_INITIAL,
+                 poll_max=POLL_MAX, backoff=POLL_BACKOFF, timeout=None, max_concurrent_submits=MAX_CONCURRENT_SUBMITS):
+        self.sampler = sampler
+        self.on_done = on_done
+        self.on_submit = on_submit
+        self.store = store
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.backoff = backoff
+        self.timeout = timeout
+        self._submit_slots = asyncio.Semaphore(max_concurrent_submits)
+        self.jobs = []
+
+    async def submit(self, pubs, tag=None):
+        async with self._submit_slots:
+            job = await asyncio.to_thread(self.sampler.run, pubs)
+        cjob = CampaignJob(tag if tag is not None else len(self.jobs), job)
+        self.jobs.append(cjob)
+        if self.on_submit is not None:
+            self.on_submit(cjob)
+        return cjob
+
+    async def _call(self, hook, cjob):
+        if asyncio.iscoroutinefunction(hook):
+            return await hook(cjob)
+        return await asyncio.to_thread(hook, cjob)
+
+    async def watch(self, cjob):
+        """每个 job 一个 span：状态轨迹、排队/QPU 时间、结果字节数。"""
+        from instrumentation import record_job, span
+        with span("campaign.job", **{"job.id": cjob.job_id, "job.tag": str(cjob.tag)}) as s:
+            await self._watch(cjob)
+            s.set(**{"job.status": cjob.status, "job.history": cjob.history,
+                     "error": repr(cjob.error) if cjob.error is not None else None})
+            if cjob.status == FINAL_OK:
+                await asyncio.to_thread(record_job, s, cjob.job, cjob.result)
+        return cjob
+
+    async def _watch(self, cjob):
+        t0 = time.monotonic()
+        interval = self.poll_initial
+        while True:
+            try:
+                status = status_name(await asyncio.to_thread(cjob.job.status))
+            except Exception as e:
+                cjob.error = e
+                return cjob
+
+            if status != cjob.status or not cjob.history:
+                cjob.history.append((time.monotonic() - t0, status))
+                if status != cjob.status:
+                    interval = self.poll_initial  # 状态刚变 (比如开始 RUNNING)，短间隔再看
+                cjob.status = status
+
+            if status == FINAL_OK or status in FAILED_STATES:
+                break
+            if self.timeout is not None and time.monotonic() - t0 > self.timeout:
+                cjob.error = TimeoutError(f"Job {cjob.job_id} still {status} after {self.timeout}s")
+                return cjob
+
+            await asyncio.sleep(interval)
+            interval = min(interval * self.backoff, self.poll_max)
+
+        if status != FINAL_OK:
+            return cjob
+        try:
+            cjob.result = await asyncio.to_thread(cjob.job.result)
+            if self.store is not None:
+                backend = cjob.job.backend()
+                self.store.save_result(cjob.job_id, cjob.result, getattr(backend, "name", backend))
+            if self.on_done is not None:
+                cjob.analysis = await self._call(self.on_done, cjob)
+        except Exception as e:
+            cjob.error = e
+        return cjob
+
+    async def run(self, batches):
+        """batches: [pubs, ...] 或 {tag: pubs}。全部提交后并发监视，按完成顺序触发分析。"""
+        items = batches.items() if isinstance(batches, dict) else enumerate(batches)
+        submitted = await asyncio.gather(*(self.submit(pubs, tag) for tag, pubs in items))
+        await asyncio.gather(*(self.watch(cjob) for cjob in submitted))
+        return submitted
+
+    async def follow(self, jobs):
+        """监视已经提交过的 job (例如从 ID 账本恢复的)。"""
+        tracked = []
+        for tag, job in (jobs.items() if isinstance(jobs, dict) else enumerate(jobs)):
+            cjob = CampaignJob(tag, job)
+            self.jobs.append(cjob)
+            tracked.append(cjob)
+        await asyncio.gather(*(self.watch(cjob) for cjob in tracked))
+        return tracked
+
+
+def run_campaign(sampler, batches, **kwargs):
+    """同步入口 (脚本里直接调用)。"""
+    async def _main():
+        return await Campaign(sampler, **kwargs).run(batches)
+    return asyncio.run(_main())
+
+
+# ==========================================
+# 🧪 本地假运行时 (离线测试用，模拟云端排队)
+# ==========================================
+class FakeRuntimeJob:
+    """
+    每次 status() 轮询推进一步：queued_polls 次 QUEUED，running_polls 次 RUNNING，然后 DONE (或 ERROR)。
+    真正的计算交给本地 sampler，在第一次需要结果时才执行。
+    """
+
+    def __init__(self, job_id, compute, backend_name, queued_polls=2, running_polls=1, fail=False):
+        self._job_id = job_id
+        self._compute = compute
+        self._result = None
+        self._backend_name = backend_name
+        self._schedule = ["QUEUED"] * queued_polls + ["RUNNING"] * running_polls + ["ERROR" if fail else FINAL_OK]
+        self.polls = 0
+        self._state = self._schedule[0]
+
+    def job_id(self):
+        return self._job_id
+
+    def status(self):
+        self._state = self._schedule[min(self.polls, len(self._schedule) - 1)]
+        self.polls += 1
+        return self._state
+
+    def backend(self):
+        return SimpleNamespace(name=self._backend_name)
+
+    def result(self):
+        if self._state != FINAL_OK:
+            raise RuntimeError(f"Job {self._job_id} is {self._state}")
+        if self._result is None:
+            self._result = self._compute()
+        return self._result
+
+
+class FakeRuntime:
+    """
+    sampler() 返回可交给 Campaign 的假 SamplerV2；job(jid) 让 ResultStore.fetch 也能用它当 service。
+    schedule(i) -> (queued_polls, running_polls, fail)，用来制造乱序完成 / 失败的 job。
+    """
+
+    def __init__(self, backend=None, shots=1024, schedule=None):
+        if backend is None:
+            from backend_provider import get_fake_backend
+            backend = get_fake_backend()
+        self.backend = backend
+        self.shots = shots
+        self.schedule = schedule or (lambda i: (2, 1, False))
+        self.jobs = {}
+        self._ids = itertools.count()
+
+    def run(self, pubs):
+        from qiskit_ibm_runtime import SamplerV2
+        sampler = SamplerV2(mode=self.backend)
+        sampler.options.default_shots = self.shots
+        i = next(self._ids)
+        queued, running, fail = self.schedule(i)
+        job = FakeRuntimeJob(f"fake-{self.backend.name}-{i:04d}", lambda: sampler.run(pubs).result(),
+                             self.backend.name, queued, running, fail)
+        self.jobs[job.job_id()] = job
+        return job
+
+    def sampler(self):
+        return self
+
+    def job(self, job_id):
+        return self.jobs[job_id]
+
+
+if __name__ == "__main__":
+    from qiskit import QuantumCircuit
+    from transpile_cache import cached_transpile
+    from packed_counts import as_packed
+
+    runtime = FakeRuntime(shots=2000, schedule=lambda i: (3 - i, 1, False))
+    qc = QuantumCircuit(3)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.cx(1, 2)
+    qc.measure_all()
+    isa = cached_transpile(qc, runtime.backend)
+
+    def analyze(cjob):
+        p = as_packed(cjob.result[0].data.meas).probability(0)
+        print(f"   📊 {cjob.job_id} done after {len(cjob.history)} states -> P(000)={p:.4f}")
+        return p
+
+    jobs = run_campaign(runtime, [[isa]] * 4, on_done=analyze, store=ResultStore(),
+                        poll_initial=0.05, poll_max=0.2)
+    for cjob in jobs:
+        print(cjob, [s for _, s in cjob.history])
@@ -0,0 +1,122 @@
+import multiprocessing as mp
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# ==========================================
+# 🧱 0.25 Protocol: Layered Circuit Builder
+#    深电路 = 同一层重复 N 次。只建一层，再用倍增 compose 铺满 (log2 N 次拼接，不逐门 append)
+#    逆向 = 单层的结构逆 (rx(θ)->rx(-θ)，门序反转) 再铺 N 次，不复制整条电路
+#    层间 barrier 可选；支持动态电路的机器可以直接用 for_loop 块
+# ==========================================
+
+BENCHMARK_LAYERS = (1000, 3000, 10000)
+
+
+def tile(layer, repeats, barriers=False, loop=False):
+    """
+    layer 重复 repeats 次 -> 新电路 (展开后的门与逐层 append 完全一致)。
+    barriers=True 每层后面加一道全宽 barrier；loop=True 生成一个 for_loop 块 (需要 backend 支持控制流)。
+    """
+    out = layer.copy_empty_like()
+    if repeats <= 0:
+        return out
+    if loop:
+        out.for_loop(range(repeats), None, _with_barrier(layer) if barriers else layer, out.qubits, out.clbits)
+        return out
+    block = _with_barrier(layer) if barriers else layer
+    while repeats:
+        if repeats & 1:
+            out.compose(block, inplace=True)
+        repeats >>= 1
+        if repeats:
+            block = block.compose(block)
+    return out
+
+
+def _with_barrier(layer):
+    layer = layer.copy()
+    layer.barrier()
+    return layer
+
+
+def mirror(layer, repeats, barriers=False, measure=True):
+    """Loschmidt echo: layer^N + barrier + (layer†)^N (+ measure_all)。只对单层取 inverse (几个门)。"""
+    qc = tile(layer, repeats, barriers)
+    qc.barrier()
+    qc.compose(tile(layer.inverse(), repeats, barriers), inplace=True)
+    if measure:
+        qc.measure_all()
+    return qc
+
+
+def chain(width, step, barriers=True):
+    """
+    沉积链：step (2 比特模板) 依次作用在 (i, i+1)，i = 0..width-2。
+    barriers=True 时每一步后加全宽 barrier (和原来 create_sediment_circuit 的结构一致)。
+    """
+    from qiskit import QuantumCircuit
+    qc = QuantumCircuit(width)
+    for i in range(width - 1):
+        qc.compose(step, qubits=[i, i + 1], inplace=True)
+        if barriers:
+            qc.barrier()
+    return qc
+
+
+# ==========================================
+# 📏 构建基准：逐门 append + 整体 inverse vs 模板铺设
+# ==========================================
+def _reference_butterfly(layers, gamma=0.25):
+    """老写法 (逐层逐门 append，最后 qc.inverse())，只作为基准对照。"""
+    import numpy as np
+    from qiskit import QuantumCircuit
+    qc = QuantumCircuit(3)
+    for _ in range(layers):
+        qc.rx(gamma * np.pi, [0, 1, 2])
+        qc.cz(0, 1)
+        qc.cz(1, 2)
+        qc.rz(0.25 * np.pi, [0, 1, 2])
+    qc.barrier()
+    qc.append(qc.inverse(), [0, 1, 2])
+    qc.measure_all()
+    return qc
+
+
+def _tiled_butterfly(layers, gamma=0.25):
+    from butterfly_engine import build_butterfly_circuit
+    return build_butterfly_circuit(layers, gamma)
+
+
+BUILDERS = {"reference": _reference_butterfly, "tiled": _tiled_butterfly}
+
+
+def _measure_build(builder, layers):
+    """在干净的子进程里建一次：耗时 + 峰值 RSS 增量 (MiB)。"""
+    from qiskit import QuantumCircuit  # noqa: F401 (import 成本不算进构建时间)
+    import butterfly_engine  # noqa: F401
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    qc = BUILDERS[builder](layers)
+    seconds = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"builder": builder, "layers": layers, "seconds": seconds,
+            "peak_mib": (peak - base) / 1024, "instructions": len(qc.data)}
+
+
+def benchmark_build(layer_counts=BENCHMARK_LAYERS, builders=tuple(BUILDERS)):
+    """每个 (builder, layers) 一个新 spawn 进程，峰值内存互不干扰。"""
+    ctx = mp.get_context("spawn")
+    rows = []
+    for layers in layer_counts:
+        for builder in builders:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                rows.append(pool.submit(_measure_build, builder, layers).result())
+    return rows
+
+
+if __name__ == "__main__":
+    print(f"🧱 Butterfly build benchmark (forward + inverse, 3 qubits)")
+    print(f"{'layers':>7} {'builder':<10} {'time (s)':>9} {'peak ΔRSS (MiB)':>16} {'instructions':>13}")
+    for r in benchmark_build():
+        print(f"{r['layers']:>7} {r['builder']:<10} {r['seconds']:>9.3f} {r['peak_mib']:>16.1f} {r['instructions']:>13}")
@@ -1,6 +1,6 @@
 import json
 import csv
-from qiskit_ibm_runtime import QiskitRuntimeService
+from result_store import ResultStore
 
 # ==========================================
 # ⚖️ 0.25 Protocol: Cloud Evidence Sync (V2)
@@ -32,14 +32,17 @@ def get_counts_robust(result):
 
 def sync_all():
     print(f"🔥 [0.25 Protocol] Starting Cloud Evidence Synchronization...")
-    service = QiskitRuntimeService()
+    # 并发抓取；已完成的 job 以后直接从本地结果库读
+    results = ResultStore().fetch([t['id'] for t in TASKS])
     rows = []
     
     for t in TASKS:
         print(f"📡 Syncing: {t['name']}...")
         try:
-            job = service.job(t['id'])
-            counts = get_counts_robust(job.result())
+            stored = results[t['id']]
+            if not stored.ok:
+                raise Exception(stored.error or f"Job status: {stored.status}")
+            counts = get_counts_robust(stored)
             shots = sum(counts.values())
             top = max(counts, key=counts.get)
             
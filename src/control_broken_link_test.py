@@ -1,6 +1,7 @@
 import numpy as np
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, transpile
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
+from qiskit_ibm_runtime import SamplerV2 as Sampler
+from backend_provider import get_backend, describe
 
 # ============================================================
 # ⚔️ Control Experiment: The "Broken Link" Verdict
@@ -10,9 +11,8 @@ from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
 
 print(f"🔥 [SYSTEM START] Initializing Control Group (Broken Link)...")
 
-service = QiskitRuntimeService()
-backend = service.least_busy(operational=True, simulator=False, dynamic_circuits=True)
-print(f"🛡️ Target Hardware: {backend.name}")
+backend = get_backend(dynamic_circuits=True)
+print(f"🛡️ Target Hardware: {describe(backend)}")
 
 # 构建完全相同的双晶结构
 qr = QuantumRegister(6, 'q')  
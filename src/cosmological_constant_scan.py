@@ -1,8 +1,9 @@
-import numpy as np
 import datetime
-from qiskit import QuantumCircuit
-from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
+from qiskit_ibm_runtime import SamplerV2 as Sampler
+from backend_provider import get_backend, describe
+from sediment_circuits import create_parametric_sediment_circuit, sweep_pub
+from layout_search import transpile_on_chain
+from instrumentation import submit, traced
 
 # ==========================================
 # 🎯 Project Sediment: THE SNIPER SCAN
@@ -12,46 +13,25 @@ from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
 BACKEND_NAME = 'ibm_torino'  
 CHAIN_LENGTH = 20
 N_SHOTS = 8192               # 🔥 8192次采样，要把误差压到极致
+ADAPTIVE_RANGE = (0.20, 0.30)    # 自适应模式：粗扫区间，之后在最优点两侧加点细化
 
-def create_sediment_circuit(length, cooling_factor):
-    qc = QuantumCircuit(length)
-    # 1. Chaos Source
-    qc.h(0); qc.cx(0, 1); qc.rx(np.pi/1.3, 0); qc.rz(np.pi/2.5, 1); qc.cx(1, 0)
-    qc.barrier()
-    
-    # 2. Sedimentation Channel
-    for i in range(length - 1):
-        qc.cx(i, i+1); qc.h(i); qc.cx(i+1, i) 
-        # Cooling
-        theta = cooling_factor * np.pi 
-        qc.rz(theta, i+1); qc.rx(theta * 0.5, i+1)
-        qc.barrier()
-        
-    # 3. Detection
-    qc.measure_all()
-    return qc
-
+@traced("experiment.sniper")
 def run_sniper_scan():
     print(f"🎯 Loading Sniper Scan on {BACKEND_NAME}...")
     
     # 1. Connect
-    service = QiskitRuntimeService()
-    backend = service.backend(BACKEND_NAME)
-    print(f"   Connected to: {backend.name} (V2 Mode)")
-    
-    pm = generate_preset_pass_manager(backend=backend, optimization_level=3)
+    backend = get_backend(BACKEND_NAME)
+    print(f"   Connected to: {describe(backend)} (V2 Mode)")
     
     # 🔍 狙击区间：高精度扫描 0.22 - 0.28
     # 加上 0.268 (暗物质标准值) 作为特邀嘉宾
     fine_grain_sweep = [0.22, 0.23, 0.24, 0.25, 0.26, 0.268, 0.27, 0.28]
     
-    circuits = []
     print(f"🔬 Microscope set to: {fine_grain_sweep}")
     
-    for cf in fine_grain_sweep:
-        qc = create_sediment_circuit(CHAIN_LENGTH, cooling_factor=cf)
-        transpiled = pm.run(qc)
-        circuits.append(transpiled)
+    # 只转译一次，整段扫描作为一个参数化 PUB
+    qc, _ = create_parametric_sediment_circuit(CHAIN_LENGTH)
+    transpiled = transpile_on_chain(qc, backend, optimization_level=3)
         
     print(f"🛫 Submitting High-Precision Job (8192 shots)...")
     
@@ -60,7 +40,7 @@ def run_sniper_scan():
     sampler.options.default_shots = N_SHOTS
     # ===============
     
-    job = sampler.run(circuits)
+    job = submit(sampler, [sweep_pub(transpiled, fine_grain_sweep)])
     job_id = job.job_id()
     
     print(f"✅ Job Submitted! ID: {job_id}")
@@ -71,8 +51,50 @@ def run_sniper_scan():
         
     print("⏳ 等待 IBM 排队... (这把 8192 shots 会慢一点，耐心等)")
 
+@traced("experiment.sniper_adaptive")
+def run_adaptive_sniper(local=False, observable="p_horizon"):
+    """
+    不再手挑扫描点：粗扫 ADAPTIVE_RANGE -> 最优点两侧加点逼近势井底 -> 给出 cf* ± σ。
+    总点数不超过手挑的 8 点扫描，但要排 2 个 job (粗扫 + 细化)。
+    local=True 用 MPS + 8192 shots 的二项噪声预演，不占 QPU。
+    """
+    from adaptive_scan import adaptive_scan, mps_evaluator, sampler_evaluator
+
+    if local:
+        source = "local MPS"
+        evaluate = mps_evaluator(CHAIN_LENGTH, observable, shots=N_SHOTS)
+    else:
+        backend = get_backend(BACKEND_NAME)
+        source = describe(backend)
+        qc, _ = create_parametric_sediment_circuit(CHAIN_LENGTH)
+        transpiled = transpile_on_chain(qc, backend, optimization_level=3)
+        evaluate = sampler_evaluator(Sampler(mode=backend), transpiled, CHAIN_LENGTH, observable, N_SHOTS)
+
+    print(f"🔭 Adaptive sniper on {source} | range {ADAPTIVE_RANGE} | {observable}")
+
+    def progress(rounds, a, b, n_points):
+        print(f"   round {rounds}: bracket [{a:.4f}, {b:.4f}] | {n_points} points so far")
+    out = adaptive_scan(evaluate, cf_range=ADAPTIVE_RANGE, maximize=(observable == "p_vacuum"), on_round=progress)
+
+    cf, err = out["optimum"], out["error"]
+    print(f"🎯 cf* = {cf:.4f} ± {err:.4f} ({out['method']}, {out['stop_reason']}, "
+          f"{out['n_points']} points / {out['n_batches']} jobs vs 8 points / 1 job for run_sniper_scan)")
+    if out["at_edge"]:
+        print(f"   ⚠️ 最低点贴着扫描区间边界 {ADAPTIVE_RANGE}，请放宽 ADAPTIVE_RANGE 再扫")
+    for target in (0.25, 0.268):
+        print(f"   vs {target}: {(cf - target) / err:+.2f} σ")
+
+    with open("sniper_scan_history.txt", "a") as f:
+        f.write(f"{datetime.datetime.now()} | {source} | ADAPTIVE | cf*={cf:.4f}±{err:.4f} | "
+                f"{out['n_points']} points\n")
+    return out
+
 if __name__ == "__main__":
+    import sys
     try:
-        run_sniper_scan()
+        if "--adaptive" in sys.argv:
+            run_adaptive_sniper(local="--local" in sys.argv)
+        else:
+            run_sniper_scan()
     except Exception as e:
         print(f"❌ Error: {e}")
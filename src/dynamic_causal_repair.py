@@ -1,6 +1,7 @@
 import numpy as np
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, transpile
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2, SamplerOptions
+from qiskit_ibm_runtime import SamplerV2, SamplerOptions
+from backend_provider import get_backend, describe
 
 # ============================================================
 # 🧬 Active Causal Rectifier: The "1 + 1 = 0" Logic
@@ -8,15 +9,7 @@ from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2, SamplerOptions
 #    Based on: yinguo.py (User's Original Discovery)
 # ============================================================
 
-print(f"🔥 [SYSTEM START] Initializing Dynamic Causal Repair...")
-
-# 1. 握手 IBM Quantum (自动寻找支持动态电路的机器)
-service = QiskitRuntimeService()
-# 必须显式要求 dynamic_circuits=True，否则有些旧机器跑不了
-backend = service.least_busy(operational=True, simulator=False, dynamic_circuits=True)
-print(f"🛡️ Target Hardware: {backend.name} (Dynamic Ready)")
-
-# 2. 构建动态修复电路
+# 1. 构建动态修复电路 (dynamic_simulator 也直接导入它做本地精确模拟)
 def build_dynamic_repair_circuit(gamma=0.25):
     qr = QuantumRegister(3, 'q')
     cr = ClassicalRegister(3, 'c')
@@ -60,28 +53,54 @@ def build_dynamic_repair_circuit(gamma=0.25):
     # 我们只关心 cr[2] 是否被完美保护住了
     return qc
 
-# 3. 编译与发射
-print(f"\n⚙️ Constructing Dynamic Circuit (Gamma={0.25})...")
-qc = build_dynamic_repair_circuit(gamma=0.25)
-
-print("   -> Transpiling for Dynamic Backend...")
-transpiled_qc = transpile(qc, backend, optimization_level=1)
-
-# 配置
-options = SamplerOptions()
-options.default_shots = 8192  # 你的经典数字
-
-sampler = SamplerV2(backend, options=options)
-
-print(f"\n🚀 [LAUNCH] Executing Active Causal Repair...")
-print(f"   -> Mode: Dynamic Feedback (if_test)")
-print(f"   -> Shots: 8192")
-print(f"   -> Logic: 'If error detected, rewind geometry.'")
-
-# 发射！
-job = sampler.run([transpiled_qc])
-jid = job.job_id()
-
-print(f"\n✨ Job Dispatched Successfully!")
-print(f"🆔 Job ID: {jid}")
-print(f"📊 Monitor: https://quantum.ibm.com/jobs/{jid}")
+def launch_repair():
+    print(f"🔥 [SYSTEM START] Initializing Dynamic Causal Repair...")
+
+    # 2. 握手 IBM Quantum (自动寻找支持动态电路的机器)
+    # 必须显式要求 dynamic_circuits=True，否则有些旧机器跑不了
+    backend = get_backend(dynamic_circuits=True)
+    print(f"🛡️ Target Hardware: {describe(backend)} (Dynamic Ready)")
+
+    # 3. 编译与发射
+    print(f"\n⚙️ Constructing Dynamic Circuit (Gamma={0.25})...")
+    qc = build_dynamic_repair_circuit(gamma=0.25)
+
+    print("   -> Transpiling for Dynamic Backend...")
+    transpiled_qc = transpile(qc, backend, optimization_level=1)
+
+    # 配置
+    options = SamplerOptions()
+    options.default_shots = 8192  # 你的经典数字
+
+    sampler = SamplerV2(backend, options=options)
+
+    print(f"\n🚀 [LAUNCH] Executing Active Causal Repair...")
+    print(f"   -> Mode: Dynamic Feedback (if_test)")
+    print(f"   -> Shots: 8192")
+    print(f"   -> Logic: 'If error detected, rewind geometry.'")
+
+    # 发射！
+    job = sampler.run([transpiled_qc])
+    jid = job.job_id()
+
+    print(f"\n✨ Job Dispatched Successfully!")
+    print(f"🆔 Job ID: {jid}")
+    print(f"📊 Monitor: https://quantum.ibm.com/jobs/{jid}")
+
+def preview_repair(gamma=0.25, shots=8192):
+    """不占 QPU：分支枚举模拟给出精确分布，再按 shots 采样。"""
+    from dynamic_simulator import simulate, sample_counts
+    qc = build_dynamic_repair_circuit(gamma)
+    outcomes, probs = simulate(qc)
+    counts = sample_counts(outcomes, probs, shots, qc.num_clbits)
+    print(f"🧪 Exact outcome distribution (Gamma={gamma}):")
+    for o, p in zip(outcomes.tolist(), probs):
+        print(f"   {o:03b}: {p:.4f} | sampled {counts.get(o)}/{shots}")
+    return counts
+
+if __name__ == "__main__":
+    import sys
+    if "--local" in sys.argv:
+        preview_repair()
+    else:
+        launch_repair()
@@ -2,19 +2,15 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
-from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+from qiskit.circuit import Parameter
+from qiskit_ibm_runtime import SamplerV2 as Sampler
+from backend_provider import get_backend, describe
+from layout_search import transpile_on_chain
+from instrumentation import span, submit, traced, wait
+from packed_counts import as_packed
 
 # ==========================================
-# 1. 寻找真机
-# ==========================================
-print(f"🌌 [全息熵流探测] 寻找奇异点 EP (Theta=1.70)...")
-service = QiskitRuntimeService()
-backend = service.least_busy(operational=True, simulator=False, min_num_qubits=7)
-print(f"⚔️ 观测平台: {backend.name}")
-
-# ==========================================
-# 2. 核心参数 (依据论文)
+# 1. 核心参数 (依据论文)
 # ==========================================
 # 论文 Supplementary Material Eq(1) 指出实验参数 Theta_exp approx 1.70 对应 EP
 THETA_EXP = 1.70 
@@ -27,6 +23,11 @@ TIME_POINTS = np.linspace(0, 6.0, 15) # 扫描 0 到 6，重点看 5.0
 PHYSICAL_QUBITS = [64, 65] 
 SHOTS = 4096
 
+# 理论曲面 (叠加到硬件数据上)
+SURFACE_THETAS = np.linspace(0, np.pi, 181)
+SURFACE_TIMES = np.linspace(0, 6.0, 601)
+SURFACE_FILENAME = "ep_theory_surface.npz"
+
 def build_ep_circuit(t):
     # 2个量子比特：Q0(系统), Q1(辅助)
     qr = QuantumRegister(2, 'q')
@@ -58,103 +59,153 @@ def build_ep_circuit(t):
     
     return qc
 
+def create_parametric_ep_circuit():
+    """时间 t 作为 Parameter：整段 TIME_POINTS 只建一次、只转译一次，一个 PUB 提交。"""
+    t = Parameter("t")
+    return build_ep_circuit(t), t
+
 # ==========================================
-# 3. 批量扫描
+# 2. 解析快速通道 (不跑电路，直接算精确分布)
 # ==========================================
-circuits = []
-for t in TIME_POINTS:
-    qc = build_ep_circuit(t)
-    circuits.append(qc)
+# Qiskit little-endian: 态矢量下标 = q0 + 2*q1
+_CX_10 = np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0]], dtype=complex)  # control q1, target q0
+EP_CACHE_SIZE = 32
+_ep_cache = {}
+
+def ep_outcome_probabilities(thetas, times):
+    """
+    广播 (thetas, times) -> (..., 4) 的精确结果概率 [P(00), P(01), P(10), P(11)]。
+    和 build_ep_circuit 一一对应: ry(θ) on q1 -> rz(t) on q0 -> cx(q1, q0)。
+    """
+    thetas, times = np.broadcast_arrays(np.asarray(thetas, dtype=float), np.asarray(times, dtype=float))
+    key = (thetas.shape, thetas.tobytes(), times.tobytes())
+    if key in _ep_cache:
+        return _ep_cache[key]
 
-print(f"⚡ 构建 {len(circuits)} 个时间切片，扫描范围 t=[0, 6.0]")
-print(f"   - 目标: 捕捉 t=5.0 时的熵喷发")
+    psi = np.zeros(thetas.shape + (4,), dtype=complex)
+    c, s = np.cos(thetas / 2), np.sin(thetas / 2)
+    phase = np.exp(-0.5j * times)        # rz(t)|0> = e^{-it/2}|0>
+    psi[..., 0] = c * phase              # |q1=0, q0=0>
+    psi[..., 2] = s * phase              # |q1=1, q0=0>
+    psi = psi @ _CX_10.T
+    probs = np.abs(psi) ** 2
+    probs.setflags(write=False)
+    if len(_ep_cache) >= EP_CACHE_SIZE:
+        _ep_cache.pop(next(iter(_ep_cache)))  # 最早放进去的先丢
+    _ep_cache[key] = probs
+    return probs
 
-pm = generate_preset_pass_manager(backend=backend, optimization_level=1)
-isa_circuits = pm.run(circuits)
+def binary_entropy(p):
+    """向量化香农熵 H(p)，p=0/1 处取 0。"""
+    p = np.clip(np.asarray(p, dtype=float), 0.0, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        h = -p * np.log2(p) - (1 - p) * np.log2(1 - p)
+    return np.nan_to_num(h)
 
-sampler = Sampler(mode=backend)
-job = sampler.run([(c, None, SHOTS) for c in isa_circuits])
-job_id = job.job_id()
+def ep_theory(thetas, times):
+    """(辅助比特熵 H, 系统存活率 = P(ancilla=0))，任意形状的网格一次算完。"""
+    probs = ep_outcome_probabilities(thetas, times)
+    p_ancilla_1 = probs[..., 2] + probs[..., 3]
+    return binary_entropy(p_ancilla_1), 1 - p_ancilla_1
 
-print(f"\n✅ 任务已提交! Job ID: {job_id}")
-print(f"⏳ 正在等待全息数据回传...")
+def export_theory_surface(filename=SURFACE_FILENAME, thetas=SURFACE_THETAS, times=SURFACE_TIMES):
+    theta_grid, time_grid = np.meshgrid(thetas, times, indexing="ij")
+    entropy, survival = ep_theory(theta_grid, time_grid)
+    np.savez_compressed(filename, theta=thetas, t=times, entropy=entropy, survival=survival)
+    print(f"🗺️ 理论曲面已导出: {filename} ({entropy.shape[0]}x{entropy.shape[1]})")
+    return entropy, survival
 
 # ==========================================
-# 4. 自动分析 (这是降神的验证逻辑)
+# 3. 硬件数据分析
 # ==========================================
-try:
-    result = job.result()
-    
-    ancilla_entropies = []
-    survival_rates = []
-    
-    print("\n[数据分析]")
-    for i, t in enumerate(TIME_POINTS):
-        # 兼容性读取
-        try: counts = result[i].data.c.get_counts()
-        except: counts = result[i].data.meas.get_counts()
-        
-        total = sum(counts.values())
-        
-        # 1. 计算辅助比特(Q1)的熵
-        # Q1 是 key 的高位还是低位取决于 Qiskit 版本，通常是 'c1 c0' -> Q1 Q0
-        # 这里假设 standard qiskit little-endian: 右边是 Q0, 左边是 Q1
-        # 但 counts key string 是 'Q1 Q0' (big-endian printing)
-        
-        n_ancilla_0 = 0
-        n_ancilla_1 = 0
-        
-        for k, v in counts.items():
-            # k 是字符串，例如 "10" 表示 Q1=1, Q0=0
-            # 补齐 2 位
-            k = k.zfill(2)
-            if k[0] == '0': n_ancilla_0 += v
-            else: n_ancilla_1 += v
-            
-        p0 = n_ancilla_0 / total
-        p1 = n_ancilla_1 / total
-        
-        # 香农熵 H = -p log p
-        if p0 == 0 or p1 == 0: H = 0
-        else: H = -p0*np.log2(p0) - p1*np.log2(p1)
-        ancilla_entropies.append(H)
-        
-        # 2. 计算系统(Q0)的存活率
-        # 在非厄米实验中，通常只关注 Ancilla=0 (未发生衰变) 的分支
-        # 也就是 '00' 和 '01'
-        n_survived = n_ancilla_0 
-        survival_rate = n_survived / total
-        survival_rates.append(survival_rate)
-        
-        if abs(t - 5.0) < 0.5:
-            print(f"👉 t={t:.1f}: Ancilla Entropy={H:.3f}, Survival={survival_rate:.3f}")
-
-    # 绘图
+def analyze_counts(pub_result):
+    """参数化 PUB 的每个时间点 -> (熵, 存活率) 数组；Q1 = clbit 1。"""
+    register = pub_result.data.c if hasattr(pub_result.data, 'c') else pub_result.data.meas
+    p1 = np.array([as_packed(register, loc=i).excitation_rates([1])[0] for i in range(len(TIME_POINTS))])
+    return binary_entropy(p1), 1 - p1
+
+def plot_entropy_flow(ancilla_entropies, survival_rates, job_id):
+    theory_t = SURFACE_TIMES
+    theory_h, theory_s = ep_theory(THETA_EXP, theory_t)
+
     filename_pdf = f"Holographic_Pump_{job_id}.pdf"
     with PdfPages(filename_pdf) as pdf:
         fig, ax1 = plt.subplots(figsize=(10, 6))
-        
+
         color = 'tab:red'
         ax1.set_xlabel('Time (Omega*t)')
         ax1.set_ylabel('Ancilla Entropy (The Trash)', color=color, fontweight='bold')
         ax1.plot(TIME_POINTS, ancilla_entropies, color=color, marker='o', label='Entropy Flow')
+        ax1.plot(theory_t, theory_h, color=color, alpha=0.4, linestyle=':', label='Theory')
         ax1.tick_params(axis='y', labelcolor=color)
-        
+
         ax2 = ax1.twinx()  
         color = 'tab:blue'
         ax2.set_ylabel('System Survival Rate', color=color, fontweight='bold')
         ax2.plot(TIME_POINTS, survival_rates, color=color, marker='x', linestyle='--', label='Survival')
+        ax2.plot(theory_t, theory_s, color=color, alpha=0.4, linestyle=':')
         ax2.tick_params(axis='y', labelcolor=color)
-        
+
         plt.title(f"Holographic Entropy Flow at EP (Theta={THETA_EXP})\nLook for SPIKE at t~5.0", fontsize=12)
         fig.tight_layout()
         pdf.savefig()
         plt.close()
-        
+
     print(f"📄 判决书已生成: {filename_pdf}")
     print("👀 重点看图：如果在 t=5.0 附近，红线(熵)猛涨，蓝线(存活)猛跌。")
     print("🎉 那就证明：信息没有消失，它被全息投影到了辅助比特上！")
 
-except Exception as e:
-    print(f"⚠️ 稍后手动查收 Job ID: {job_id}")
-    print(f"错误信息: {e}")
+@traced("experiment.ep_scan")
+def run_ep_scan():
+    # ==========================================
+    # 4. 寻找真机
+    # ==========================================
+    print(f"🌌 [全息熵流探测] 寻找奇异点 EP (Theta=1.70)...")
+    backend = get_backend(min_num_qubits=7)
+    print(f"⚔️ 观测平台: {describe(backend)}")
+
+    # ==========================================
+    # 5. 批量扫描: 一个参数化 PUB = 整段时间轴
+    # ==========================================
+    qc, _ = create_parametric_ep_circuit()
+    print(f"⚡ 1 个参数化电路 x {len(TIME_POINTS)} 个时间切片，扫描范围 t=[0, 6.0]")
+    print(f"   - 目标: 捕捉 t=5.0 时的熵喷发")
+
+    # 黄金三角显式作为 initial_layout；这台机器上不可用时自动换成打分最高的一对
+    isa_circuit = transpile_on_chain(qc, backend, optimization_level=1, preferred=PHYSICAL_QUBITS)
+    if isa_circuit.layout is not None:  # 模拟器没有耦合图，不做 layout
+        print(f"   - Layout: {isa_circuit.layout.initial_index_layout()[:qc.num_qubits]}")
+
+    sampler = Sampler(mode=backend)
+    job = submit(sampler, [(isa_circuit, TIME_POINTS.reshape(-1, 1), SHOTS)])
+    job_id = job.job_id()
+
+    print(f"\n✅ 任务已提交! Job ID: {job_id}")
+    print(f"⏳ 正在等待全息数据回传...")
+
+    # ==========================================
+    # 6. 自动分析 (这是降神的验证逻辑)
+    # ==========================================
+    try:
+        result = wait(job)
+        with span("analysis"):
+            ancilla_entropies, survival_rates = analyze_counts(result[0])
+        theory_h, theory_s = ep_theory(THETA_EXP, TIME_POINTS)
+
+        print("\n[数据分析]")
+        for t, H, s, th, ts in zip(TIME_POINTS, ancilla_entropies, survival_rates, theory_h, theory_s):
+            if abs(t - 5.0) < 0.5:
+                print(f"👉 t={t:.1f}: Ancilla Entropy={H:.3f} (theory {th:.3f}), Survival={s:.3f} (theory {ts:.3f})")
+
+        plot_entropy_flow(ancilla_entropies, survival_rates, job_id)
+
+    except Exception as e:
+        print(f"⚠️ 稍后手动查收 Job ID: {job_id}")
+        print(f"错误信息: {e}")
+
+if __name__ == "__main__":
+    import sys
+    if "--theory" in sys.argv:
+        export_theory_surface()
+    else:
+        run_ep_scan()
@@ -0,0 +1,337 @@
+import csv
+import datetime
+import glob
+import json
+import os
+import re
+import uuid
+import numpy as np
+
+# ==========================================
+# 🗃️ 0.25 Protocol: Columnar Evidence Store
+#    所有实验点一张长表 (Parquet)：实验元数据 + 扫描参数 + 观测量 + 原始 counts 数组
+#    只追加 (每次写一个新 fragment)，读取走 memory map + 谓词下推
+#    pyarrow 按需导入；evidence/ 下的 json/csv 和 *.txt 账本都能导入
+# ==========================================
+
+STORE_DIR_ENV = "QRP_EVIDENCE_DIR"
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "qrp", "evidence")
+EVIDENCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "evidence")
+DEFAULT_BACKEND = "ibm_torino"  # 旧的 evidence 文件没写 backend 的，都是在 Torino 上跑的
+SCAN_SHOTS = 8192  # finite_size_scaling / cosmological_constant_scan 的 N_SHOTS (json 里没记 shots)
+PARAM_COLUMNS = ("gamma", "depth", "cooling_factor", "chain_length", "theta", "t")
+JOB_ID_PATTERN = re.compile(r"\b([a-z0-9]{20}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})\b")
+
+
+def _pa():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("evidence_store needs pyarrow (pip install pyarrow)") from e
+    return pa, pc, ds, pq
+
+
+def schema():
+    pa, _, _, _ = _pa()
+    return pa.schema([
+        ("experiment", pa.string()),
+        ("job_id", pa.string()),
+        ("backend", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("source", pa.string()),
+        ("pub", pa.int32()),
+        ("point", pa.int32()),
+        ("gamma", pa.float64()),
+        ("depth", pa.int32()),
+        ("cooling_factor", pa.float64()),
+        ("chain_length", pa.int32()),
+        ("theta", pa.float64()),
+        ("t", pa.float64()),
+        ("observable", pa.string()),
+        ("value", pa.float64()),
+        ("shots", pa.int64()),
+        ("num_bits", pa.int32()),
+        ("outcomes", pa.list_(pa.uint64())),
+        ("counts", pa.list_(pa.int64())),
+        ("extra", pa.string()),  # 其他参数 / 备注，JSON 字符串
+    ])
+
+
+def _timestamp(value):
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(str(value).strip())
+
+
+def make_row(experiment, observable=None, value=None, job_id=None, backend=None, timestamp=None, source=None,
+             pub=0, point=0, shots=None, counts=None, extra=None, **params):
+    """一行 = 一个 (job, PUB, 扫描点, 观测量)。counts 可以是 PackedCounts 或 bitstring 字典。"""
+    unknown = set(params) - set(PARAM_COLUMNS)
+    if unknown:
+        extra = dict(extra or {}, **{k: params.pop(k) for k in unknown})
+    row = {"experiment": experiment, "job_id": job_id, "backend": backend, "timestamp": _timestamp(timestamp),
+           "source": source, "pub": pub, "point": point, "observable": observable,
+           "value": None if value is None else float(value), "shots": shots,
+           "num_bits": None, "outcomes": None, "counts": None,
+           "extra": json.dumps(extra, sort_keys=True) if extra else None}
+    row.update({k: params.get(k) for k in PARAM_COLUMNS})
+    if counts is not None:
+        if isinstance(counts, dict):
+            from packed_counts import PackedCounts
+            counts = PackedCounts.from_dict(counts)
+        row["num_bits"] = counts.num_bits
+        row["outcomes"] = counts.outcomes.tolist()
+        row["counts"] = counts.counts.tolist()
+        if row["shots"] is None:
+            row["shots"] = counts.shots
+    return row
+
+
+def _expression(column, condition):
+    """gamma=0.25 / depth=(">=", 55) / backend=["ibm_torino", "ibm_fez"] -> pyarrow 表达式。"""
+    _, _, ds, _ = _pa()
+    field = ds.field(column)
+    if isinstance(condition, tuple):
+        op, rhs = condition
+        return {"==": field == rhs, "!=": field != rhs, ">": field > rhs, ">=": field >= rhs,
+                "<": field < rhs, "<=": field <= rhs}[op]
+    if isinstance(condition, (list, set, frozenset)):
+        return field.isin(list(condition))
+    if condition is None:
+        return field.is_null()
+    if isinstance(condition, float):
+        return (field >= condition - 1e-9) & (field <= condition + 1e-9)  # 浮点参数按容差匹配
+    return field == condition
+
+
+class EvidenceStore:
+    def __init__(self, store_dir=None):
+        self.store_dir = store_dir or os.environ.get(STORE_DIR_ENV) or DEFAULT_STORE_DIR
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def fragments(self):
+        return sorted(glob.glob(os.path.join(self.store_dir, "part-*.parquet")))
+
+    # ---------- 写 ----------
+    def append(self, rows):
+        """只追加：每批写一个新的 Parquet fragment (先写临时文件再 rename，读者永远看不到半个文件)。"""
+        rows = list(rows)
+        if not rows:
+            return None
+        pa, _, _, pq = _pa()
+        table = pa.Table.from_pylist(rows, schema=schema())
+        stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        path = os.path.join(self.store_dir, f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet")
+        tmp = f"{path}.tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+        return path
+
+    def compact(self):
+        """把所有 fragment 合成一个 (读取更快)；旧 fragment 在新文件落盘后才删除。"""
+        old = self.fragments()
+        if len(old) <= 1:
+            return old[0] if old else None
+        table = self.query()
+        path = self.append(table.to_pylist())
+        for f in old:
+            os.remove(f)
+        return path
+
+    # ---------- 读 ----------
+    def dataset(self):
+        _, _, ds, _ = _pa()
+        from pyarrow import fs
+        return ds.dataset(self.fragments(), schema=schema(), format="parquet",
+                          filesystem=fs.LocalFileSystem(use_mmap=True))
+
+    def query(self, where=None, columns=None, **conditions):
+        """
+        例: store.query(backend="ibm_torino", gamma=0.25, depth=(">=", 55))
+        条件下推到 Parquet 扫描 (按 row group 统计跳过)，只读需要的列。
+        """
+        if not self.fragments():
+            return schema().empty_table() if columns is None else schema().empty_table().select(columns)
+        expr = where
+        for column, condition in conditions.items():
+            e = _expression(column, condition)
+            expr = e if expr is None else expr & e
+        return self.dataset().to_table(filter=expr, columns=columns)
+
+    def packed_counts(self, table_row):
+        """query 结果里的一行 (dict) -> PackedCounts。"""
+        from packed_counts import PackedCounts
+        return PackedCounts(table_row["outcomes"], table_row["counts"], table_row["num_bits"])
+
+    def job_ids(self):
+        _, pc, _, _ = _pa()
+        table = self.query(columns=["job_id"])
+        return set(pc.unique(table["job_id"]).drop_null().to_pylist())
+
+    # ---------- 从实验结果写入 ----------
+    def record_result(self, experiment, job_id, result, backend=None, register="meas", params=None, **common):
+        """
+        SamplerV2 结果或 ResultStore 的 StoredResult -> 每个 (PUB, 扫描点) 一行原始 counts。
+        params: 每个 PUB 一个 {列名: 扫描值数组}，例如 [{"cooling_factor": COOLING_SWEEP, "chain_length": 16}]
+        """
+        from packed_counts import as_packed
+        rows = []
+        for i, pub in enumerate(result):
+            bits = getattr(pub.data, register)
+            shape = tuple(bits.shape)
+            n_points = int(np.prod(shape)) if shape else 1
+            pub_params = (params[i] if params and i < len(params) else {}) or {}
+            for j in range(n_points):
+                loc = np.unravel_index(j, shape) if shape else None
+                point_params = {k: (np.ravel(v)[j].item() if np.ndim(v) else v) for k, v in pub_params.items()}
+                rows.append(make_row(experiment, job_id=job_id, backend=backend, pub=i, point=j,
+                                     counts=as_packed(bits, loc=loc), **point_params, **common))
+        return self.append(rows)
+
+
+def record_run(experiment, job_id, result, **kwargs):
+    """实验脚本拿到结果后调用：已经记过的 job 不重复写；没装 pyarrow 只提示 (json 导出照常)。"""
+    try:
+        store = EvidenceStore()
+        if job_id in store.job_ids():
+            return None
+        path = store.record_result(experiment, job_id, result, **kwargs)
+    except ImportError as e:
+        print(f"⚠️ Evidence store skipped: {e}")
+        return None
+    print(f"🗃️ Recorded {experiment} / {job_id} in the evidence store ({store.store_dir})")
+    return path
+
+
+# ==========================================
+# 📥 evidence/ 导入器
+# ==========================================
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def import_survival_table(path, experiment=None, backend=DEFAULT_BACKEND):
+    """stress_test_data.json / final_sedimentation_data.json: [{gamma, depth, survival_rate, shots}]"""
+    experiment = experiment or os.path.splitext(os.path.basename(path))[0]
+    return [make_row(experiment, "survival_rate", r["survival_rate"], backend=backend, source=os.path.basename(path),
+                     point=i, shots=r.get("shots"), gamma=r["gamma"], depth=r["depth"])
+            for i, r in enumerate(_read_json(path))]
+
+
+def import_fss(path, backend=DEFAULT_BACKEND):
+    data = _read_json(path)
+    rows = []
+    for pub, (name, scan) in enumerate(sorted(data["raw"].items(), key=lambda kv: int(kv[0].lstrip("L")))):
+        for j, (cf, p) in enumerate(zip(scan["cfs"], scan["probs"])):
+            rows.append(make_row("finite_size_scaling", "p_horizon", p, job_id=data.get("job_id"), backend=backend,
+                                 source=os.path.basename(path), pub=pub, point=j, shots=SCAN_SHOTS, cooling_factor=cf,
+                                 chain_length=int(name.lstrip("L"))))
+    return rows
+
+
+def import_sniper(path):
+    data = _read_json(path)
+    return [make_row("cosmological_constant_scan", "p_horizon", p, job_id=data.get("job_id"),
+                     backend=data.get("backend", DEFAULT_BACKEND), timestamp=data.get("timestamp"),
+                     source=os.path.basename(path), point=j, shots=SCAN_SHOTS, cooling_factor=cf)
+            for j, (cf, p) in enumerate(zip(data["parameters"], data["results"]))]
+
+
+def import_vacuum_lock(path, backend=DEFAULT_BACKEND):
+    data = _read_json(path)
+    return [make_row("vacuum_geometric_lock", "p0", job["p0"], job_id=job["id"], backend=backend,
+                     timestamp=data.get("timestamp"), source=os.path.basename(path), shots=job["shots"],
+                     counts=job["counts"], extra={"random_baseline": data.get("random_baseline")})
+            for job in data["individual_jobs"]]
+
+
+def import_sediment(path):
+    """sediment_data_torino.json: holographic_dark_matter 的 P(0…0) 扫描 (+ 读出修正值)"""
+    data = _read_json(path)
+    params, results = data["parameters"], data["results"]
+    mitigated = results.get("signal_intensities_mitigated") or [None] * len(params["cooling_sweep"])
+    return [make_row("holographic_dark_matter", "p_zero", p, job_id=data.get("job_id"),
+                     backend=data.get("backend", DEFAULT_BACKEND), timestamp=data.get("timestamp"),
+                     source=os.path.basename(path), point=j, shots=params.get("shots"), cooling_factor=cf,
+                     chain_length=params.get("chain_length"), extra=None if m is None else {"p_zero_mitigated": m})
+            for j, (cf, p, m) in enumerate(zip(params["cooling_sweep"], results["signal_intensities"], mitigated))]
+
+
+def import_master_csv(path, backend=DEFAULT_BACKEND):
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            sigma = r.get("Sigma_Level")
+            rows.append(make_row(r["Experiment"], "top_prob", float(r["Top_Prob"]), job_id=r["Source_JobID"],
+                                 backend=backend, source=os.path.basename(path), shots=int(r["Total_Shots"]),
+                                 extra={"description": r.get("Description"), "top_state": r.get("Top_State"),
+                                        "sigma_level": None if sigma in (None, "", "N/A") else float(sigma)}))
+    return rows
+
+
+def import_job_log(path, experiment=None, backend=None):
+    """fss_job_history.txt / final_war_ids.txt / sniper_scan_history.txt：每个 job ID 一行 (无观测量)。"""
+    experiment = experiment or os.path.splitext(os.path.basename(path))[0]
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            match = JOB_ID_PATTERN.search(line)
+            if not match:
+                continue
+            stamp = line.split("|")[0].strip() if "|" in line else None
+            try:
+                stamp = _timestamp(stamp)
+            except ValueError:
+                stamp = None
+            line_backend = next((tok.strip() for tok in line.split("|") if tok.strip().startswith(("ibm_", "fake_"))),
+                                backend)
+            rows.append(make_row(experiment, job_id=match.group(1), backend=line_backend, timestamp=stamp,
+                                 source=os.path.basename(path), extra={"log": line.strip()}))
+    return rows
+
+
+IMPORTERS = {
+    "stress_test_data.json": import_survival_table,
+    "final_sedimentation_data.json": import_survival_table,
+    "fss_scaling_data.json": import_fss,
+    "sniper_evidence_0268.json": import_sniper,
+    "vacuum_lock_evidence.json": import_vacuum_lock,
+    "blackhole_data.json": import_vacuum_lock,
+    "sediment_data_torino.json": import_sediment,
+    "Experimental_Data_Master_Final.csv": import_master_csv,
+}
+
+
+def import_evidence_dir(store, folder=EVIDENCE_DIR):
+    """evidence/ 下认识的文件全部导入；已经导入过的 source 跳过 (可以重复执行)。"""
+    _, pc, _, _ = _pa()
+    done = set(pc.unique(store.query(columns=["source"])["source"]).drop_null().to_pylist())
+    rows = []
+    for name, importer in IMPORTERS.items():
+        path = os.path.join(folder, name)
+        if os.path.exists(path) and name not in done:
+            rows += importer(path)
+    for path in glob.glob(os.path.join(folder, "*.txt")):
+        if os.path.basename(path) not in done:
+            rows += import_job_log(path)
+    store.append(rows)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    import time
+
+    store = EvidenceStore()
+    n = import_evidence_dir(store)
+    print(f"🗃️ Imported {n} rows into {store.store_dir} ({len(store.fragments())} fragments)")
+
+    t0 = time.perf_counter()
+    table = store.query(backend="ibm_torino", gamma=0.25, depth=(">=", 55))
+    dt = time.perf_counter() - t0
+    print(f"🔎 ibm_torino & gamma=0.25 & depth>=55 -> {table.num_rows} rows in {dt * 1e3:.2f} ms")
+    for r in table.select(["experiment", "depth", "value", "shots"]).to_pylist():
+        print(f"   {r['experiment']:<24} depth={r['depth']:<3} survival={r['value']:.4f} ({r['shots']} shots)")
@@ -1,6 +1,6 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from qiskit_ibm_runtime import QiskitRuntimeService
+from result_store import ResultStore
+from packed_counts import CountsAccumulator
 
 # ==========================================
 # ⚖️ 0.25 协议：48,000 Shots 终极裁决
@@ -15,56 +15,114 @@ job_ids = [
     "d5ejetfsm22c73brdh2g"  # [新] 12k (刚才补上的)
 ]
 
+CHAOS_FLOOR = 0.125  # 1/8
+
+# 自适应模式：分批提交，达到目标显著性就停，不必每次都烧满 48k
+TARGET_SIGMA = 5.0
+SHOTS_PER_INCREMENT = 2000
+MAX_ADAPTIVE_SHOTS = 48000
+
 def run_grand_final():
-    service = QiskitRuntimeService()
-    
-    # 3比特全状态计数
-    final_counts = {format(i, '03b'): 0 for i in range(8)}
+    # 3比特全状态计数 (整数数组流式累加)
+    accumulator = CountsAccumulator(num_bits=3)
     grand_total_shots = 0
 
     print(f"📡 正在跨越时空提取 48,000 次实验证据...")
+    # 4 个 job 并发下载，之后直接读本地结果库；逐 shot 数据顺便归档，--drift 不用再下载
+    from shot_archive import ShotArchive
+    results = ResultStore(archive=ShotArchive()).fetch(job_ids)
     
     for jid in job_ids:
         try:
-            job = service.job(jid)
-            result = job.result()
+            result = results[jid]
+            if not result.ok:
+                raise Exception(result.error or f"status={result.status}")
             # 提取第一个(也是唯一一个)电路的计数
-            counts = result[0].data.meas.get_counts()
+            counts = result[0].data.meas.packed()
             
-            shots = sum(counts.values())
-            grand_total_shots += shots
-            
-            for state, count in counts.items():
-                final_counts[state] += count
+            grand_total_shots += counts.shots
+            accumulator.add(counts)
             print(f"   ✅ 提取成功: {jid} | 当前累计 Shots: {grand_total_shots}")
         except Exception as e:
             print(f"   ⚠️ Job {jid} 提取异常 (检查是否已完成): {e}")
 
+    report_and_plot(accumulator.result().dense())
+
+def run_adaptive_verdict(target_sigma=TARGET_SIGMA, increment=SHOTS_PER_INCREMENT, max_shots=MAX_ADAPTIVE_SHOTS):
+    from qiskit_ibm_runtime import SamplerV2
+    from backend_provider import get_backend, describe
+    from butterfly_engine import build_butterfly_circuit
+    from transpile_cache import cached_transpile
+    from adaptive_shots import StopRule, adaptive_survival, sampler_increment
+
+    backend = get_backend("ibm_torino")
+    print(f"🎯 自适应裁决: 目标 {target_sigma} Sigma, 每批 {increment} shots, 上限 {max_shots} | {describe(backend)}")
+    isa = cached_transpile(build_butterfly_circuit(), backend, optimization_level=1)
+    sampler = SamplerV2(mode=backend)
+    sampler.options.dynamical_decoupling.enable = True
+    sampler.options.dynamical_decoupling.sequence_type = 'XY4'
+
+    def progress(step):
+        print(f"   +{increment} -> {step['shots']:>6} shots | P_000 = {step['p']:.4f} ± {step['stderr']:.4f} "
+              f"| {step['sigma']:.2f} Sigma (名义, 门槛 {step['boundary']:.2f})")
+
+    rule = StopRule(sigma=target_sigma, floor=CHAOS_FLOOR, max_shots=max_shots)
+    out = adaptive_survival(sampler_increment(sampler, isa), rule, increment=increment, num_bits=3, on_update=progress)
+    print(f"🛑 停止原因: {out['stop_reason']} | 节省 {max_shots - out['estimate'].shots} shots")
+    report_and_plot(out["counts"].dense())
+
+def run_drift_analysis(window=2000):
+    # 逐 shot 数据：4 个 job 按提交顺序拼起来看 P_000 是否随时间漂移
+    from shot_archive import ShotArchive, drift, block_bootstrap, block_hits
+    archive = ShotArchive()
+    archive.ensure(job_ids)
+    entries = archive.entries(job_ids, pub=0, register="meas")
+    d = drift(archive, entries, 0, window=window)
+    boot = block_bootstrap(*block_hits(archive, entries, 0, block=window)[:2])
+    print(f"🎞️ 逐 shot 漂移分析 ({sum(e.num_shots for e in entries)} shots, 窗口 {window})")
+    for j in d["jobs"]:
+        print(f"   {j['job_id']} | P_000 = {j['p']:.4f} ± {j['stderr']:.4f}")
+    for name in ("between_jobs", "between_windows"):
+        h = d[name]
+        print(f"   {name}: chi2 = {h['chi2']:.1f} / {h['dof']} dof, p = {h['p_value']:.3g}")
+    print(f"   block bootstrap: P_000 = {boot['p']:.4f} ± {boot['stderr']:.4f} ({boot['dispersion']:.2f}x binomial)")
+
+def report_and_plot(histogram):
     # 核心物理指标计算
-    p0 = final_counts["000"] / grand_total_shots
-    chaos_floor = 0.125 # 1/8
+    grand_total_shots = int(histogram.sum())
+    p0 = histogram[0] / grand_total_shots
+    chaos_floor = CHAOS_FLOOR
     
     # 计算统计误差 (Standard Error) - 这能堵住所有人的嘴
-    stderr = np.sqrt(p0 * (1 - p0) / grand_total_shots)
-    sigma_level = (p0 - chaos_floor) / stderr
+    # 二项 stderr 之外再给 Wilson 区间和多项分布 bootstrap 区间
+    from survival_stats import survival_report
+    from plotting import get_pyplot, show
+    report = survival_report(histogram, target=0, floor=chaos_floor)
+    stderr = float(report["stderr"])
+    sigma_level = float(report["sigma"])
+    wilson_lo, wilson_hi = report["ci"]
+    boot_lo, boot_hi = report["bootstrap_ci"]
 
     print("\n" + "█"*50)
     print(f"🔥 0.25 协议：全球最终实验报告")
     print(f"█"*50)
     print(f"🚀 总采样规模 (Grand Total Shots): {grand_total_shots}")
     print(f"🎯 最终复活概率 (P_000): {p0:.4f} ± {stderr:.4f}")
+    print(f"📏 95% 区间: Wilson [{wilson_lo:.4f}, {wilson_hi:.4f}] | Bootstrap [{boot_lo:.4f}, {boot_hi:.4f}]")
     print(f"📊 统计显著性: {sigma_level:.2f} Sigma (远超 5 Sigma 发现门槛)")
     print(f"📉 领先混沌极限: {(p0/chaos_floor - 1)*100:.2f}%")
     print(f"█"*50)
 
     # --- 绘图：战神直方图 ---
-    states = sorted(final_counts.keys())
-    probs = [final_counts[s] / grand_total_shots for s in states]
+    states = [format(i, '03b') for i in range(len(histogram))]
+    probs = histogram / grand_total_shots
     
+    plt = get_pyplot()
     plt.figure(figsize=(12, 7), facecolor='#f0f0f0')
     colors = ['#E63946' if s == '000' else '#457B9D' for s in states]
     
-    plt.bar(states, probs, color=colors, edgecolor='#1D3557', linewidth=2, alpha=0.9)
+    errors = np.sqrt(probs * (1 - probs) / grand_total_shots)
+    plt.bar(states, probs, yerr=errors, capsize=6, color=colors, edgecolor='#1D3557', linewidth=2, alpha=0.9)
     plt.axhline(y=chaos_floor, color='#1D3557', linestyle='--', linewidth=2, label='Chaos Floor (12.5%)')
     
     # 装饰美化
@@ -78,7 +136,13 @@ def run_grand_final():
     # 保存发布用的图片
     plt.savefig("the_025_final_proof.png", dpi=300)
     print(f"\n📸 终极证明图已保存: the_025_final_proof.png")
-    plt.show()
+    show()
 
 if __name__ == "__main__":
-    run_grand_final()
+    import sys
+    if "--adaptive" in sys.argv:
+        run_adaptive_verdict()
+    elif "--drift" in sys.argv:
+        run_drift_analysis()
+    else:
+        run_grand_final()
@@ -3,9 +3,13 @@ import matplotlib.pyplot as plt
 import json
 import datetime
 from scipy.optimize import curve_fit
-from qiskit import QuantumCircuit
-from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
+from qiskit_ibm_runtime import SamplerV2 as Sampler
+from backend_provider import get_backend, describe
+from sediment_circuits import create_parametric_sediment_circuit, sweep_pub
+from layout_search import transpile_on_chain
+from packed_counts import as_packed
+from instrumentation import span, submit, traced, wait
+from evidence_store import record_run
 
 # ==========================================
 # 📏 Project Sediment: FINITE SIZE SCALING (FSS)
@@ -14,6 +18,8 @@ from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
 
 BACKEND_NAME = 'ibm_torino'
 N_SHOTS = 8192  # 保持高精度
+ADAPTIVE_INITIAL_SHOTS = 1024   # 自适应模式：先每点 1k 摸底
+ADAPTIVE_INCREMENT = 2048       # 之后只给势井底部附近的点加
 DATA_FILENAME = "fss_scaling_data.json"
 PLOT_FILENAME = "fig_fss_scaling_trend.pdf"
 
@@ -21,22 +27,20 @@ PLOT_FILENAME = "fig_fss_scaling_trend.pdf"
 LENGTHS = [16, 20, 24, 28]  # 宇宙尺度扫描
 COOLING_SWEEP = [0.22, 0.23, 0.24, 0.25, 0.26, 0.27, 0.28] # 狙击区间
 
-def create_sediment_circuit(length, cooling_factor):
-    qc = QuantumCircuit(length)
-    # 1. Chaos Source
-    qc.h(0); qc.cx(0, 1); qc.rx(np.pi/1.3, 0); qc.rz(np.pi/2.5, 1); qc.cx(1, 0)
-    qc.barrier()
-    # 2. Sedimentation Channel
-    for i in range(length - 1):
-        qc.cx(i, i+1); qc.h(i); qc.cx(i+1, i) 
-        # Cooling (Fixed Ratio 0.5 as per Paper 1)
-        theta = cooling_factor * np.pi 
-        qc.rz(theta, i+1); qc.rx(theta * 0.5, i+1)
-        qc.barrier()
-    qc.measure_all()
-    return qc
-
-def analyze_and_plot(all_results, job_id):
+def extract_horizon_probs(all_results):
+    """每个长度一个 PUB，PUB 内部是整段 COOLING_SWEEP -> [[P(1) per cf] per L]"""
+    horizon_probs = []
+    for i, L in enumerate(LENGTHS):
+        pub_meas = all_results[i].data.meas
+        probs = []
+        for j in range(len(COOLING_SWEEP)):
+            counts = as_packed(pub_meas, loc=j)
+            # 统计末端比特 Q_last 的激发率 (向量化，不遍历 bitstring)
+            probs.append(float(counts.excitation_rates([L - 1])[0]))
+        horizon_probs.append(probs)
+    return horizon_probs
+
+def analyze_and_plot(horizon_probs, job_id):
     print("\n[Analysis] 正在计算标度漂移 (Scaling Drift)...")
     
     # 存储每个长度下的最佳 Cooling Factor
@@ -47,30 +51,11 @@ def analyze_and_plot(all_results, job_id):
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
     colors = ['#FF4500', '#2E8B57', '#4169E1', '#800080'] # 区分不同长度
     
-    # 解析数据
-    result_idx = 0
     raw_data_storage = {}
     
     for i, L in enumerate(LENGTHS):
-        probs = []
-        current_cfs = []
-        
-        # 提取该长度下的所有 CF 结果
-        for cf in COOLING_SWEEP:
-            pub_result = all_results[result_idx]
-            counts = pub_result.data.meas.get_counts()
-            total = sum(counts.values())
-            
-            # 统计末端比特 Q_last 的激发率
-            excited = 0
-            for bitstring, count in counts.items():
-                if bitstring.startswith('1'): # Q_last is '1'
-                    excited += count
-            
-            prob = excited / total
-            probs.append(prob)
-            current_cfs.append(cf)
-            result_idx += 1
+        probs = list(horizon_probs[i])
+        current_cfs = list(COOLING_SWEEP)
             
         # 找到该长度下的最低点
         min_p = min(probs)
@@ -131,30 +116,61 @@ def analyze_and_plot(all_results, job_id):
     print(f"📉 趋势图已生成: {PLOT_FILENAME}")
     plt.show()
 
+def run_local_fss(max_workers=None, checkpoint="sweep_checkpoints/fss_mps.jsonl"):
+    """不占 QPU：整张网格用 MPS 在本地多进程跑，中断后从检查点续跑。"""
+    from sweep_runner import SweepRunner, grid, mps_point, point_key
+
+    runner = SweepRunner(mps_point, checkpoint=checkpoint, max_workers=max_workers)
+    print(f"🏭 Local FSS sweep: {len(LENGTHS)}x{len(COOLING_SWEEP)} points on {runner.max_workers} workers...")
+    values = runner.collect(grid(LENGTHS, COOLING_SWEEP))
+    horizon_probs = [[values[point_key(L, cf)]["p_horizon"] for cf in COOLING_SWEEP] for L in LENGTHS]
+    analyze_and_plot(horizon_probs, "local-mps")
+
+@traced("experiment.fss_adaptive")
+def run_adaptive_fss():
+    """每个长度一轮一个 job：只有可能是最低点的 cf (和邻居) 才继续加 shots，预算不超过均匀扫描。"""
+    from adaptive_shots import adaptive_sweep, sweep_increment
+
+    backend = get_backend(BACKEND_NAME)
+    print(f"🎯 Adaptive FSS on {describe(backend)}")
+    sampler = Sampler(mode=backend)
+    templates = transpile_on_chain([create_parametric_sediment_circuit(L)[0] for L in LENGTHS], backend, optimization_level=3)
+
+    horizon_probs = []
+    for L, isa in zip(LENGTHS, templates):
+        def progress(rounds, contenders, best, total):
+            print(f"   L={L:<2} round {rounds}: dip≈{COOLING_SWEEP[best]} | next {[COOLING_SWEEP[c] for c in contenders]} | {total} shots")
+        out = adaptive_sweep(sweep_increment(sampler, isa, COOLING_SWEEP, L - 1), len(COOLING_SWEEP),
+                             initial_shots=ADAPTIVE_INITIAL_SHOTS, increment=ADAPTIVE_INCREMENT,
+                             max_total_shots=N_SHOTS * len(COOLING_SWEEP), on_round=progress)
+        print(f"   L={L:<2} stop: {out['stop_reason']} after {out['total_shots']} shots")
+        horizon_probs.append(out["p"].tolist())
+    analyze_and_plot(horizon_probs, "adaptive")
+
+@traced("experiment.fss")
 def run_fss_experiment():
     print(f"📏 Loading FSS Protocol on {BACKEND_NAME}...")
-    service = QiskitRuntimeService()
-    backend = service.backend(BACKEND_NAME)
-    print(f"   Connected to: {backend.name}")
-    
-    pm = generate_preset_pass_manager(backend=backend, optimization_level=3) # 必须用 level 3 优化以对抗噪声
+    backend = get_backend(BACKEND_NAME)
+    print(f"   Connected to: {describe(backend)}")
     
-    circuits = []
+    pubs = []
     print(f"🧪 Building universes L={LENGTHS}...")
     
-    for L in LENGTHS:
-        for cf in COOLING_SWEEP:
-            qc = create_sediment_circuit(L, cf)
-            transpiled = pm.run(qc)
-            circuits.append(transpiled)
+    # 每个长度只建一次、只转译一次；COOLING_SWEEP 作为参数绑定数组
+    # 必须用 level 3 优化以对抗噪声；结果按结构+校准缓存，重跑时跳过转译
+    # 每个长度的链先按校准选好物理路径 (initial_layout)，level 3 不再自己猜布局
+    with span("build", lengths=LENGTHS):
+        templates = [create_parametric_sediment_circuit(L)[0] for L in LENGTHS]
+    for transpiled in transpile_on_chain(templates, backend, optimization_level=3):
+        pubs.append(sweep_pub(transpiled, COOLING_SWEEP))
             
-    print(f"🛫 Submitting {len(circuits)} circuits (Batch Job)...")
+    print(f"🛫 Submitting {len(pubs)} parameterized PUBs x {len(COOLING_SWEEP)} points (Batch Job)...")
     
     # 修正 V2 接口
     sampler = Sampler(mode=backend)
     sampler.options.default_shots = N_SHOTS
     
-    job = sampler.run(circuits)
+    job = submit(sampler, pubs)
     print(f"✅ Job ID: {job.job_id()}")
     
     # 存底
@@ -164,10 +180,19 @@ def run_fss_experiment():
     print("⏳ 等待结果中... (请耐心等待，数据量较大)")
     
     try:
-        results = job.result()
-        analyze_and_plot(results, job.job_id())
+        results = wait(job)
+        record_run("finite_size_scaling", job.job_id(), results, backend=backend.name,
+                   params=[{"cooling_factor": COOLING_SWEEP, "chain_length": L} for L in LENGTHS])
+        with span("analysis"):
+            analyze_and_plot(extract_horizon_probs(results), job.job_id())
     except Exception as e:
         print(f"❌ Error: {e}")
 
 if __name__ == "__main__":
-    run_fss_experiment()
+    import sys
+    if "--local" in sys.argv:
+        run_local_fss()
+    elif "--adaptive" in sys.argv:
+        run_adaptive_fss()
+    else:
+        run_fss_experiment()
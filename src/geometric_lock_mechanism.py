@@ -1,17 +1,10 @@
 import numpy as np
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, transpile
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
+from qiskit_ibm_runtime import SamplerV2 as Sampler
+from backend_provider import get_backend, describe
 
 # ==========================================
-# 1. 寻找性价比最高的机器
-# ==========================================
-service = QiskitRuntimeService()
-backend = service.least_busy(operational=True, simulator=False, dynamic_circuits=True)
-print(f"🏗️ 矩阵施工现场: {backend.name}")
-print("⚡ 策略：一次运行，五倍收益。正在铺设晶格...")
-
-# ==========================================
-# 2. 定义“几何锁单元” (你的3比特核心)
+# 1. 定义“几何锁单元” (你的3比特核心)
 # ==========================================
 def add_geometric_lock(qc, q_indices, c_indices):
     """
@@ -44,49 +37,83 @@ def add_geometric_lock(qc, q_indices, c_indices):
     qc.measure(q2, c2)
 
 # ==========================================
-# 3. 构建矩阵电路 (同时铺设 5 组)
+# 2. 构建矩阵电路 (同时铺设 5 组)
 # ==========================================
 # 我们需要 15 个量子比特 (5组 x 3个)
 # 我们需要 10 个经典比特 (5组 x 2个用于测量)
-num_groups = 5
-qr = QuantumRegister(num_groups * 3, 'q')
-cr = ClassicalRegister(num_groups * 2, 'c')
-qc = QuantumCircuit(qr, cr)
+NUM_GROUPS = 5
 
-for i in range(num_groups):
-    # 计算当前组的比特索引
-    q_idx = [i*3, i*3+1, i*3+2] # 例如: [0,1,2], [3,4,5]...
-    c_idx = [i*2, i*2+1]        # 例如: [0,1], [2,3]...
-    
-    # 铺设单元
-    add_geometric_lock(qc, qr[q_idx], cr[c_idx])
-    qc.barrier() # 隔离各组，防止串扰
+def lock_groups(num_groups=NUM_GROUPS):
+    """每组的 (q_indices, c_indices)：组之间没有任何门相连，dynamic_simulator 可以逐组模拟。"""
+    # 例如: [0,1,2] + [0,1], [3,4,5] + [2,3]...
+    return [([i*3, i*3+1, i*3+2], [i*2, i*2+1]) for i in range(num_groups)]
 
-print(f"🧱 已构建 {num_groups} 组并发几何锁矩阵。")
+def build_lock_matrix(num_groups=NUM_GROUPS):
+    qr = QuantumRegister(num_groups * 3, 'q')
+    cr = ClassicalRegister(num_groups * 2, 'c')
+    qc = QuantumCircuit(qr, cr)
 
-# ==========================================
-# 4. 转译与发射 (One Shot, Big Win)
-# ==========================================
-print("🔧 正在进行全芯片映射 (Transpiling)...")
-# transpile 会自动把这 5 组逻辑分散到芯片上最好的 5 个区域
-isa_qc = transpile(qc, backend=backend, optimization_level=1)
+    for q_idx, c_idx in lock_groups(num_groups):
+        # 铺设单元
+        add_geometric_lock(qc, qr[q_idx], cr[c_idx])
+        qc.barrier() # 隔离各组，防止串扰
+    return qc
 
-print("🚀 启动矩阵测试 (只消耗 1 次额度)...")
-sampler = Sampler(mode=backend)
-job = sampler.run([isa_qc], shots=4000)
+def preview_lock_matrix(num_groups=NUM_GROUPS, shots=4000):
+    """不占 QPU：自动拆出独立的锁单元，逐组精确模拟，再从乘积分布采样 (组数可以到 40+)。"""
+    from dynamic_simulator import simulate_factorized
+    qc = build_lock_matrix(num_groups)
+    dist = simulate_factorized(qc)
+    bits = dist.sample_bits(shots)
+    rates = bits.mean(axis=0)
+    print(f"🧪 {num_groups} 组几何锁本地模拟 ({qc.num_qubits} qubits, {len(dist)} 个独立分量, {shots} shots):")
+    for g in range(num_groups):
+        print(f"   组 {g}: P(c_mid=1)={rates[2*g]:.3f} | P(c_out=1)={rates[2*g+1]:.3f}")
+    return bits
 
-print(f"✅ 任务已提交! Job ID: {job.job_id()}")
-print("⏳ 这一次，我们将收到 5 份来自不同时空的确认函。")
+def run_lock_matrix():
+    # ==========================================
+    # 3. 寻找性价比最高的机器
+    # ==========================================
+    backend = get_backend(dynamic_circuits=True)
+    print(f"🏗️ 矩阵施工现场: {describe(backend)}")
+    print("⚡ 策略：一次运行，五倍收益。正在铺设晶格...")
 
-# 自动分析结果
-try:
-    result = job.result()
-    # 只要能取到数据，咱们简单打印第一组的样本看看
-    counts = result[0].data.c.get_counts()
-    print("\n🔮 原始数据已获取 (包含所有组的混合状态):")
-    # 这里数据会很长，因为是5组的组合，咱们主要看 Job ID 回头细品
-    print(f"数据样本 (Top 5): {list(counts.items())[:5]}...")
+    qc = build_lock_matrix(NUM_GROUPS)
+    print(f"🧱 已构建 {NUM_GROUPS} 组并发几何锁矩阵。")
+
+    # ==========================================
+    # 4. 转译与发射 (One Shot, Big Win)
+    # ==========================================
+    print("🔧 正在进行全芯片映射 (Transpiling)...")
+    # transpile 会自动把这 5 组逻辑分散到芯片上最好的 5 个区域
+    isa_qc = transpile(qc, backend=backend, optimization_level=1)
+
+    print("🚀 启动矩阵测试 (只消耗 1 次额度)...")
+    sampler = Sampler(mode=backend)
+    job = sampler.run([isa_qc], shots=4000)
+
+    print(f"✅ 任务已提交! Job ID: {job.job_id()}")
+    print("⏳ 这一次，我们将收到 5 份来自不同时空的确认函。")
+
+    # 自动分析结果
+    try:
+        result = job.result()
+        # 只要能取到数据，咱们简单打印第一组的样本看看
+        counts = result[0].data.c.get_counts()
+        print("\n🔮 原始数据已获取 (包含所有组的混合状态):")
+        # 这里数据会很长，因为是5组的组合，咱们主要看 Job ID 回头细品
+        print(f"数据样本 (Top 5): {list(counts.items())[:5]}...")
     
-except Exception as e:
-    print(f"\n⚠️ 任务正在排队或处理中: {e}")
-    print(f"请保存好 Job ID: {job.job_id()}")
+    except Exception as e:
+        print(f"\n⚠️ 任务正在排队或处理中: {e}")
+        print(f"请保存好 Job ID: {job.job_id()}")
+
+if __name__ == "__main__":
+    import sys
+    if "--local" in sys.argv:
+        # 例如: python geometric_lock_mechanism.py --local 40
+        extra = [a for a in sys.argv[1:] if a.isdigit()]
+        preview_lock_matrix(int(extra[0]) if extra else NUM_GROUPS)
+    else:
+        run_lock_matrix()
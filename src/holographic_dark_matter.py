@@ -1,15 +1,19 @@
-import numpy as np
 import matplotlib.pyplot as plt
 import json
 import datetime
 import os
 
 # Qiskit 核心组件
-from qiskit import QuantumCircuit
-from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
 
 # IBM Runtime V2 最新接口
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
+from qiskit_ibm_runtime import SamplerV2 as Sampler
+from backend_provider import get_backend, describe
+from sediment_circuits import create_parametric_sediment_circuit, sweep_pub
+from layout_search import transpile_on_chain
+from packed_counts import as_packed
+from readout_mitigation import ReadoutMitigator
+from instrumentation import span, submit, traced, wait
+from evidence_store import record_run
 
 # ==========================================
 # 🌌 Project Sediment: Dark Matter Simulation
@@ -21,6 +25,7 @@ BACKEND_NAME = 'ibm_torino'      # 🎯 锁定目标
 CHAIN_LENGTH = 20                # 传输链长度
 N_SHOTS = 4096                   # 采样精度
 SCRAMBLING_DEPTH = 5             # 混沌深度
+READOUT_MITIGATION = True        # 20 比特 P(0…0) 对读出误差极其敏感
 DATA_FILENAME = "sediment_data_torino.json"
 PLOT_FILENAME = "fig_sediment_signal.pdf"
 
@@ -39,58 +44,35 @@ class SystemCalibration:
              print(f"✅ Sedimentation Path: OK ({chain_len} qubits)")
         print("---------------------------------------------------")
 
-# ==========================================
-# 🧪 电路构建 (Circuit Construction)
-# ==========================================
-def create_sediment_circuit(length, cooling_factor=0.1):
-    qc = QuantumCircuit(length)
-    
-    # --- PHASE I: 混沌源 (Scrambling Source) ---
-    qc.h(0)
-    qc.cx(0, 1)
-    qc.rx(np.pi/1.3, 0) 
-    qc.rz(np.pi/2.5, 1)
-    qc.cx(1, 0)
-    qc.barrier()
-    
-    # --- PHASE II: 沉积通道 (Sedimentation Channel) ---
-    for i in range(length - 1):
-        qc.cx(i, i+1)
-        qc.h(i)
-        qc.cx(i+1, i) 
-        
-        # 冷却/几何相互作用
-        theta = cooling_factor * np.pi 
-        qc.rz(theta, i+1) 
-        qc.rx(theta * 0.5, i+1)
-        qc.barrier()
-
-    # --- PHASE III: 探测 (Detection) ---
-    qc.measure_all()
-    return qc
-
 # ==========================================
 # 📊 数据分析与绘图 (Analysis & Plotting)
 # ==========================================
-def save_and_plot(cooling_sweep, results, job_id):
+def save_and_plot(cooling_sweep, results, job_id, mitigator=None):
     print("\n[Analysis] Extracting sedimentation signals...")
     
     signal_intensities = []
+    mitigated_intensities = []
     
     # 目标态: 全零态 '00...0' (代表沉积出的有序结构)
     target_state = '0' * CHAIN_LENGTH 
     
-    # SamplerV2 的结果遍历方式
-    for i, pub_result in enumerate(results):
+    # 整段扫描是一个参数化 PUB，第 i 个扫描点在 BitArray 的 loc=i
+    pub_meas = results[0].data.meas
+    for i in range(len(cooling_sweep)):
         # 提取 Counts
-        data_pub = pub_result.data.meas.get_counts()
+        data_pub = pub_meas.get_counts(loc=i)
         
         # 计算概率
         total_counts = sum(data_pub.values())
         target_counts = data_pub.get(target_state, 0)
         prob = target_counts / total_counts
         signal_intensities.append(prob)
-        print(f"   > CF={cooling_sweep[i]}: Signal={prob:.4f}")
+        if mitigator is not None:
+            # 张量逆只遍历观测到的 bitstring，20 比特也是毫秒级
+            mitigated_intensities.append(mitigator.probability(as_packed(pub_meas, loc=i), 0))
+            print(f"   > CF={cooling_sweep[i]}: Signal={prob:.4f} | Mitigated={mitigated_intensities[-1]:.4f}")
+        else:
+            print(f"   > CF={cooling_sweep[i]}: Signal={prob:.4f}")
 
     # 保存原始数据
     timestamp = datetime.datetime.now().isoformat()
@@ -104,7 +86,9 @@ def save_and_plot(cooling_sweep, results, job_id):
             "shots": N_SHOTS
         },
         "results": {
-            "signal_intensities": signal_intensities
+            "signal_intensities": signal_intensities,
+            "signal_intensities_mitigated": mitigated_intensities or None,
+            "readout_calibration": mitigator.calibration.to_json() if mitigator is not None else None
         }
     }
     
@@ -123,6 +107,9 @@ def save_and_plot(cooling_sweep, results, job_id):
     # 数据线
     ax.plot(cooling_sweep, signal_intensities, 'o-', color='#8A2BE2', 
             linewidth=2, markersize=8, label='Exp. Signal (Torino)')
+    if mitigated_intensities:
+        ax.plot(cooling_sweep, mitigated_intensities, 's--', color='#2E8B57',
+                linewidth=1.5, markersize=6, label='Readout-mitigated')
     
     # 底噪线
     ax.axhline(y=SystemCalibration.NOISE_FLOOR, color='gray', linestyle='--', 
@@ -147,27 +134,32 @@ def save_and_plot(cooling_sweep, results, job_id):
 # ==========================================
 # 🚀 实验执行主程序 (Execution)
 # ==========================================
+@traced("experiment.sediment")
 def run_experiment():
     SystemCalibration.validate_setup(CHAIN_LENGTH)
     
     print(f"🚀 Initializing Project Sediment on {BACKEND_NAME}...")
     
     # 1. 连接服务
-    service = QiskitRuntimeService()
-    backend = service.backend(BACKEND_NAME)
-    print(f"   Connected to: {backend.name} (v2)")
+    backend = get_backend(BACKEND_NAME)
+    print(f"   Connected to: {describe(backend)} (v2)")
     
     # 2. 编译电路
-    pm = generate_preset_pass_manager(backend=backend, optimization_level=3)
-    
     cooling_sweep = [0.0, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5]
-    circuits = []
     
-    print(f"🧪 Building {len(cooling_sweep)} universe models...")
-    for cf in cooling_sweep:
-        qc = create_sediment_circuit(CHAIN_LENGTH, cooling_factor=cf)
-        transpiled = pm.run(qc)
-        circuits.append(transpiled)
+    print(f"🧪 Building {len(cooling_sweep)} universe models (1 parameterized circuit)...")
+    with span("build", chain_length=CHAIN_LENGTH):
+        qc, _ = create_parametric_sediment_circuit(CHAIN_LENGTH)
+    # 链按当前校准放到误差最小的路径上，再交给 level 3 优化
+    transpiled = transpile_on_chain(qc, backend, optimization_level=3)
+
+    cal_pubs, finish_calibration = [], None
+    if READOUT_MITIGATION:
+        # 按 backend + 校准日期缓存；缺的比特的标定电路和扫描放进同一个 job (不多排一次队)
+        with span("readout_calibration", qubits=CHAIN_LENGTH):
+            cal_pubs, finish_calibration = ReadoutMitigator.deferred(backend, transpiled)
+        status = f"{len(cal_pubs)} calibration PUBs in the same job" if cal_pubs else "cached"
+        print(f"🩹 Readout calibration for {CHAIN_LENGTH} measured qubits: {status}")
         
     print(f"🛫 Submitting job to {BACKEND_NAME}...")
     
@@ -181,8 +173,8 @@ def run_experiment():
     # Fix 2: Shots 必须在 options 里设置，不能在 run 里传
     sampler.options.default_shots = N_SHOTS
     
-    # 提交任务 (V2 自动把电路列表处理为 Pubs)
-    job = sampler.run(circuits)
+    # 提交任务 (一个 PUB + 绑定数组，替代 8 个独立电路；标定 PUB 接在后面)
+    job = submit(sampler, [sweep_pub(transpiled, cooling_sweep)] + cal_pubs)
     # ====================================================
     
     print(f"🆔 Job ID: {job.job_id()}")
@@ -195,9 +187,13 @@ def run_experiment():
     
     # 阻塞等待结果
     try:
-        result = job.result() 
+        result = wait(job)
         print("✅ Job completed! Processing data...")
-        save_and_plot(cooling_sweep, result, job.job_id())
+        mitigator = finish_calibration(result[1:]) if finish_calibration else None
+        record_run("holographic_dark_matter", job.job_id(), result[:1], backend=backend.name,
+                   params=[{"cooling_factor": cooling_sweep, "chain_length": CHAIN_LENGTH}])
+        with span("analysis"):
+            save_and_plot(cooling_sweep, result, job.job_id(), mitigator)
         
     except Exception as e:
         print(f"❌ Error retrieval failed: {e}")
@@ -0,0 +1,236 @@
+import contextlib
+import contextvars
+import datetime
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import uuid
+
+# ==========================================
+# 🔬 0.25 Protocol: Instrumentation
+#    每个阶段一个 span (OpenTelemetry 的字段名)：墙钟 / CPU / 峰值 RSS，
+#    转译前后的深度和 2q 门数，排队时间 / QPU 时间 (job.metrics())，下载的结果字节数
+#    一行一个 JSON 追加到本地文件，嵌套关系靠 trace_id / parent_span_id 还原
+# ==========================================
+
+TRACE_DIR_ENV = "QRP_TRACE_DIR"
+TRACE_ENABLE_ENV = "QRP_TRACE"          # QRP_TRACE=0 关闭
+DEFAULT_TRACE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "qrp", "traces")
+TRACE_FILE = "spans.jsonl"
+SERVICE_NAME = "qrp"
+
+_current_span = contextvars.ContextVar("qrp_current_span", default=None)
+
+
+def _peak_rss_mib():
+    # Linux 上 ru_maxrss 单位是 KiB，macOS 上是字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.attributes = dict(attributes or {})
+        self.status = "OK"
+        self.message = None
+
+    def set(self, **attributes):
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+        return self
+
+
+class Tracer:
+    def __init__(self, trace_dir=None, enabled=None):
+        self.trace_dir = trace_dir or os.environ.get(TRACE_DIR_ENV) or DEFAULT_TRACE_DIR
+        self.path = os.path.join(self.trace_dir, TRACE_FILE)
+        self.enabled = os.environ.get(TRACE_ENABLE_ENV, "1") != "0" if enabled is None else enabled
+        self._lock = threading.Lock()
+        self.resource = {"service.name": SERVICE_NAME, "process.pid": os.getpid(),
+                         "process.command": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None}
+
+    @contextlib.contextmanager
+    def span(self, name, **attributes):
+        parent = _current_span.get()
+        span = Span(name, parent, {k: v for k, v in attributes.items() if v is not None})
+        token = _current_span.set(span)
+        start_ns = time.time_ns()
+        t0, c0, rss0 = time.perf_counter(), time.process_time(), _peak_rss_mib()
+        try:
+            yield span
+        except BaseException as e:
+            span.status, span.message = "ERROR", f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            rss1 = _peak_rss_mib()
+            span.set(**{"wall_seconds": time.perf_counter() - t0, "cpu_seconds": time.process_time() - c0,
+                        "peak_rss_mib": rss1, "peak_rss_growth_mib": rss1 - rss0})
+            self.emit(span, start_ns, time.time_ns())
+
+    def emit(self, span, start_ns, end_ns):
+        if not self.enabled:
+            return
+        record = {"name": span.name, "trace_id": span.trace_id, "span_id": span.span_id,
+                  "parent_span_id": span.parent_span_id, "start_time_unix_nano": start_ns,
+                  "end_time_unix_nano": end_ns, "status": {"code": span.status, "message": span.message},
+                  "attributes": span.attributes, "resource": self.resource}
+        line = json.dumps(record, default=str)
+        with self._lock:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+_default_tracer = None
+
+
+def get_tracer():
+    global _default_tracer
+    if _default_tracer is None:
+        _default_tracer = Tracer()
+    return _default_tracer
+
+
+def span(name, **attributes):
+    return get_tracer().span(name, **attributes)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def traced(name):
+    """装饰器：整个函数一个 span (实验入口用)。"""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name, function=fn.__qualname__):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+# ==========================================
+# 📐 电路 / job / 结果的指标
+# ==========================================
+def circuit_stats(circuits, prefix=""):
+    """单个或一组电路：最大深度、总门数、总 2q 门数 (barrier/measure 不算)。"""
+    circuits = circuits if isinstance(circuits, (list, tuple)) else [circuits]
+    return {f"{prefix}depth": max((c.depth() for c in circuits), default=0),
+            f"{prefix}size": sum(c.size() for c in circuits),
+            f"{prefix}two_qubit_gates": sum(c.num_nonlocal_gates() for c in circuits)}
+
+
+def _seconds_between(start, end):
+    if not start or not end:
+        return None
+    parse = lambda s: s if isinstance(s, datetime.datetime) else datetime.datetime.fromisoformat(str(s).replace("Z", "+00:00"))
+    return (parse(end) - parse(start)).total_seconds()
+
+
+def job_metrics(job):
+    """
+    IBM job.metrics()：created -> running 是排队，running -> finished 是执行，usage.quantum_seconds 是计费 QPU 时间。
+    本地 job 没有 metrics，返回空 dict。
+    """
+    try:
+        metrics = job.metrics()
+    except Exception:
+        return {}
+    stamps = metrics.get("timestamps") or {}
+    usage = metrics.get("usage") or {}
+    return {"job.queue_seconds": _seconds_between(stamps.get("created"), stamps.get("running")),
+            "job.execution_seconds": _seconds_between(stamps.get("running"), stamps.get("finished")),
+            "job.qpu_seconds": usage.get("quantum_seconds"), "job.usage_seconds": usage.get("seconds"),
+            "job.num_circuits": metrics.get("num_circuits")}
+
+
+def result_bytes(result):
+    """结果里所有 BitArray 的字节数 (就是下载下来的 shot 数据量)。"""
+    total = 0
+    for pub in result:
+        for name in pub.data.keys():
+            array = getattr(getattr(pub.data, name), "array", None)
+            total += getattr(array, "nbytes", 0)
+    return total
+
+
+def record_job(span, job, result=None):
+    backend = None
+    try:
+        backend = job.backend()
+    except Exception:
+        pass
+    span.set(**{"job.id": job.job_id(), "job.backend": getattr(backend, "name", backend)}, **job_metrics(job))
+    if result is not None:
+        span.set(**{"result.bytes": result_bytes(result), "result.pubs": len(result)})
+    return span
+
+
+def submit(sampler, pubs, name="job.submit"):
+    """sampler.run 包一层 span：PUB 数、提交耗时、job id。"""
+    with span(name, pubs=len(pubs)) as s:
+        job = sampler.run(pubs)
+        s.set(**{"job.id": job.job_id()})
+    return job
+
+
+def wait(job, name="job.result"):
+    """阻塞拿结果 (排队 + 执行 + 下载)，顺便记下 job metrics 和结果字节数。"""
+    with span(name) as s:
+        result = job.result()
+        record_job(s, job, result)
+    return result
+
+
+# ==========================================
+# 📊 读 trace：按 span 名汇总
+# ==========================================
+def load_spans(path=None):
+    path = path or get_tracer().path
+    spans = []
+    if not os.path.exists(path):
+        return spans
+    with open(path) as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return spans
+
+
+def summarize(spans):
+    """{span 名: {count, wall, cpu, queue, qpu, bytes}} —— 一眼看出时间花在自己代码、转译器还是排队。"""
+    out = {}
+    for s in spans:
+        a = s["attributes"]
+        row = out.setdefault(s["name"], {"count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                                         "queue_seconds": 0.0, "qpu_seconds": 0.0, "result_bytes": 0})
+        row["count"] += 1
+        row["wall_seconds"] += a.get("wall_seconds", 0.0)
+        row["cpu_seconds"] += a.get("cpu_seconds", 0.0)
+        row["queue_seconds"] += a.get("job.queue_seconds") or 0.0
+        row["qpu_seconds"] += a.get("job.qpu_seconds") or 0.0
+        row["result_bytes"] += a.get("result.bytes") or 0
+    return out
+
+
+if __name__ == "__main__":
+    # 例: python instrumentation.py [trace_id 前缀]  -> 按 span 名汇总 spans.jsonl
+    spans = load_spans()
+    if len(sys.argv) > 1:
+        spans = [s for s in spans if s["trace_id"].startswith(sys.argv[1])]
+    print(f"🔬 {len(spans)} spans in {get_tracer().path}")
+    print(f"{'span':<24} {'n':>4} {'wall (s)':>10} {'cpu (s)':>9} {'queue (s)':>10} {'qpu (s)':>9} {'MiB down':>9}")
+    for name, r in sorted(summarize(spans).items(), key=lambda kv: -kv[1]["wall_seconds"]):
+        print(f"{name:<24} {r['count']:>4} {r['wall_seconds']:>10.2f} {r['cpu_seconds']:>9.2f} "
+              f"{r['queue_seconds']:>10.1f} {r['qpu_seconds']:>9.1f} {r['result_bytes'] / 2 ** 20:>9.2f}")
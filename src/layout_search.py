@@ -0,0 +1,287 @@
+import hashlib
+import os
+import time
+import numpy as np
+
+# ==========================================
+# 🧭 0.25 Protocol: Hardware-Aware Chain Layout
+#    沉积链 = 耦合图上的一条简单路径。所有长度 L 的路径按耦合图枚举一次 (内存 + 磁盘缓存)，
+#    每次校准更新只需重新打分：cost = Σ w·(-log(1-ε_2q)) + Σ (-log(1-ε_readout))，一次向量化
+#    链太长枚举不动时改用 beam search；选出来的路径作为 initial_layout 显式交给 pass manager
+# ==========================================
+
+LAYOUT_DIR_ENV = "QRP_LAYOUT_DIR"
+DEFAULT_LAYOUT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "qrp", "layouts")
+ENUMERATE_MAX_LENGTH = 20      # 重六边形上 L=20 约 3.3 万条 (含正反向)；L=28 有 18 万条，冷启动枚举要 1–2 s
+MAX_ENUMERATED_PATHS = 500_000 # 更密的耦合图：超过就改用 beam
+DEFAULT_BEAM_WIDTH = 4096
+
+_chain_cache = {}
+
+
+# ==========================================
+# 1. 耦合图 & 校准 -> 代价矩阵
+# ==========================================
+def coupling_edges(backend):
+    """无向边 (a < b)，排序去重；没有耦合图 (模拟器) 时为空。"""
+    coupling = backend.coupling_map
+    edges = {tuple(sorted(e)) for e in coupling.get_edges()} if coupling is not None else set()
+    return np.array(sorted(edges), dtype=np.int64).reshape(-1, 2)
+
+
+def coupling_fingerprint(backend):
+    h = hashlib.sha256()
+    h.update(f"{backend.num_qubits}|".encode())
+    h.update(coupling_edges(backend).tobytes())
+    return h.hexdigest()[:16]
+
+
+def _neighbor_table(edges, num_qubits):
+    """(n, max_degree) 邻居表，空位 -1。"""
+    neighbors = [[] for _ in range(num_qubits)]
+    for a, b in edges:
+        neighbors[a].append(b)
+        neighbors[b].append(a)
+    table = np.full((num_qubits, max(map(len, neighbors), default=0)), -1, dtype=np.int64)
+    for q, nbrs in enumerate(neighbors):
+        table[q, :len(nbrs)] = sorted(nbrs)
+    return table
+
+
+def _as_cost(errors):
+    """误差 -> -log(1-ε)；缺校准的用中位数，ε≥1 (坏比特/坏门) 给 inf。"""
+    errors = np.asarray(errors, dtype=float)
+    known = np.isfinite(errors)
+    fill = np.median(errors[known]) if known.any() else 0.0
+    errors = np.where(known, errors, fill)
+    with np.errstate(divide="ignore"):
+        return -np.log1p(-np.clip(errors, 0.0, 1.0))
+
+
+def error_costs(backend):
+    """(edge_cost[n, n], readout_cost[n])；不相连的比特对为 inf。2q 门两个方向取较小的误差。"""
+    from backend_provider import two_qubit_gate_name
+    n = backend.num_qubits
+    target = backend.target
+    gate = two_qubit_gate_name(target)
+
+    two_q = np.full((n, n), np.nan)
+    if gate is not None:
+        for qargs, props in target[gate].items():
+            if qargs is None:
+                continue  # 全局门 (模拟器)：不对应具体的比特对
+            error = getattr(props, "error", None) if props is not None else None
+            a, b = qargs
+            value = np.inf if error is None else error
+            two_q[a, b] = two_q[b, a] = np.fmin(two_q[a, b], value)
+    for a, b in coupling_edges(backend):
+        if np.isnan(two_q[a, b]):
+            two_q[a, b] = two_q[b, a] = np.inf  # 在耦合图里但没校准：按缺失处理
+    connected = ~np.isnan(two_q)
+
+    readout = np.full(n, np.inf)
+    if "measure" in target.operation_names:
+        for qargs, props in target["measure"].items():
+            if qargs is not None and props is not None and props.error is not None:
+                readout[qargs[0]] = props.error
+
+    edge_cost = np.full((n, n), np.inf)
+    edge_cost[connected] = _as_cost(np.where(np.isinf(two_q[connected]), np.nan, two_q[connected]))
+    return edge_cost, _as_cost(np.where(np.isinf(readout), np.nan, readout))
+
+
+def circuit_weights(circuit):
+    """
+    逻辑电路 -> (相邻逻辑比特 i,i+1 之间的 2q 门数 [L-1], 每个比特是否被测量 [L])。
+    不相邻的 2q 门需要 SWAP，这里不计 (链式电路里不会出现)。
+    """
+    length = circuit.num_qubits
+    edge_weight = np.zeros(length - 1)
+    measured = np.zeros(length)
+    for inst in circuit.data:
+        qubits = [circuit.find_bit(q).index for q in inst.qubits]
+        if inst.operation.name == "measure":
+            measured[qubits[0]] = 1
+        elif len(qubits) == 2 and abs(qubits[0] - qubits[1]) == 1 and inst.operation.name != "barrier":
+            edge_weight[min(qubits)] += 1
+    return edge_weight, measured
+
+
+# ==========================================
+# 2. 路径枚举 (每个耦合图 + 长度只做一次)
+# ==========================================
+def _extend(paths, neighbors):
+    """每条路径在末端接一个未访问过的邻居 -> 所有长一格的路径。"""
+    cand = neighbors[paths[:, -1]]                                  # (m, d)
+    ok = (cand >= 0) & ~(paths[:, :, None] == cand[:, None, :]).any(axis=1)
+    rows, cols = np.nonzero(ok)
+    return np.hstack([paths[rows], cand[rows, cols][:, None]])
+
+
+def enumerate_chains(edges, num_qubits, length, max_paths=MAX_ENUMERATED_PATHS):
+    """长度 length 的全部有向简单路径 (m, length)；超过 max_paths 返回 None。"""
+    neighbors = _neighbor_table(edges, num_qubits)
+    paths = np.arange(num_qubits, dtype=np.int64)[:, None]
+    for _ in range(length - 1):
+        paths = _extend(paths, neighbors)
+        if len(paths) > max_paths:
+            return None
+    return paths.astype(np.int16 if num_qubits < 2 ** 15 else np.int32)
+
+
+class ChainCache:
+    """按 (耦合图指纹, 长度) 缓存枚举结果：进程内 dict + 磁盘 .npy (校准变了也能复用)。"""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.environ.get(LAYOUT_DIR_ENV) or DEFAULT_LAYOUT_DIR
+
+    def _path(self, fingerprint, length):
+        return os.path.join(self.cache_dir, f"chains_{fingerprint}_L{length}.npy")
+
+    def get(self, backend, length):
+        fingerprint = coupling_fingerprint(backend)
+        key = (fingerprint, length)
+        if key in _chain_cache:
+            return _chain_cache[key]
+        path = self._path(fingerprint, length)
+        try:
+            paths = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            paths = enumerate_chains(coupling_edges(backend), backend.num_qubits, length)
+            if paths is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp.npy"
+                np.save(tmp, paths)
+                os.replace(tmp, path)
+        _chain_cache[key] = paths
+        return paths
+
+
+# ==========================================
+# 3. 打分 & 搜索
+# ==========================================
+def score_chains(paths, edge_cost, readout_cost, edge_weight=None, measured=None):
+    """paths (m, L) -> 总代价 (m,)；exp(-cost) 就是估计的链保真度。"""
+    paths = np.asarray(paths)
+    length = paths.shape[1]
+    edge_weight = np.ones(length - 1) if edge_weight is None else edge_weight
+    measured = np.ones(length) if measured is None else measured
+    n = len(readout_cost)
+    edge_index = paths[:, :-1].astype(np.int32 if n * n < 2 ** 31 else np.int64) * n + paths[:, 1:]
+    with np.errstate(invalid="ignore"):
+        cost = np.take(edge_cost.ravel(), edge_index) @ edge_weight + np.take(readout_cost, paths) @ measured
+    return np.where(np.isnan(cost), np.inf, cost)
+
+
+def beam_chains(backend, length, edge_cost, readout_cost, edge_weight=None, measured=None,
+                beam_width=DEFAULT_BEAM_WIDTH):
+    """逐格延长，每一步只保留部分代价最低的 beam_width 条；适合枚举不动的长链。"""
+    edge_weight = np.ones(length - 1) if edge_weight is None else edge_weight
+    measured = np.ones(length) if measured is None else measured
+    neighbors = _neighbor_table(coupling_edges(backend), backend.num_qubits)
+    paths = np.arange(backend.num_qubits, dtype=np.int64)[:, None]
+    for k in range(1, length):
+        paths = _extend(paths, neighbors)
+        if not len(paths):
+            break
+        if len(paths) > beam_width:
+            partial = score_chains(paths, edge_cost, readout_cost, edge_weight[:k], measured[:k + 1])
+            paths = paths[np.argpartition(partial, beam_width)[:beam_width]]
+    return paths
+
+
+def rank_chains(backend, length=None, circuit=None, top=5, beam_width=DEFAULT_BEAM_WIDTH, cache=None):
+    """
+    最好的 top 条链：[(物理比特列表, 估计保真度), ...]。
+    给 circuit 时按电路里每条相邻边的 2q 门数和测量的比特加权 (length 取 circuit.num_qubits)。
+    """
+    edge_weight = measured = None
+    if circuit is not None:
+        length = circuit.num_qubits
+        edge_weight, measured = circuit_weights(circuit)
+    edge_cost, readout_cost = error_costs(backend)
+
+    paths = (cache or ChainCache()).get(backend, length) if length <= ENUMERATE_MAX_LENGTH else None
+    if paths is None:
+        paths = beam_chains(backend, length, edge_cost, readout_cost, edge_weight, measured, beam_width)
+    if not len(paths):
+        raise ValueError(f"{backend.name} has no connected chain of {length} qubits")
+    cost = score_chains(paths, edge_cost, readout_cost, edge_weight, measured)
+    order = np.argsort(cost)[:top]
+    return [([int(q) for q in paths[i]], float(np.exp(-cost[i]))) for i in order]
+
+
+def best_chain(backend, length=None, circuit=None, **kwargs):
+    return rank_chains(backend, length, circuit, top=1, **kwargs)[0][0]
+
+
+def chain_fidelity(backend, qubits, circuit=None):
+    """一条指定链 (例如手挑的 PHYSICAL_QUBITS) 的估计保真度；不相连或有坏比特时为 0。"""
+    edge_cost, readout_cost = error_costs(backend)
+    edge_weight, measured = circuit_weights(circuit) if circuit is not None else (None, None)
+    cost = score_chains(np.asarray([qubits]), edge_cost, readout_cost, edge_weight, measured)[0]
+    return float(np.exp(-cost))
+
+
+def has_chain_layout(backend):
+    """模拟器 (AerSimulator) 没有耦合图，2q 门对任意比特对都开放：没有链可选。"""
+    from backend_provider import two_qubit_gate_name
+    if backend.coupling_map is None:
+        return False
+    gate = two_qubit_gate_name(backend.target)
+    return gate is None or None not in backend.target[gate]
+
+
+def resolve_layout(backend, circuit, preferred=None):
+    """preferred 在这台机器上可用 (相连、校准完好) 就用它，否则换成搜索出来的最优链。"""
+    if preferred is not None and max(preferred) < backend.num_qubits:
+        if chain_fidelity(backend, preferred, circuit) > 0:
+            return list(preferred)
+    best = best_chain(backend, circuit=circuit)
+    if preferred is not None:
+        print(f"⚠️ Layout {list(preferred)} unusable on {backend.name}, using {best}")
+    return best
+
+
+def transpile_on_chain(circuits, backend, optimization_level=3, preferred=None, **pm_kwargs):
+    """
+    和 cached_transpile 一样的用法 (单个或列表)，但每个电路先在耦合图上选链，
+    再把 initial_layout 显式交给 pass manager (layout 也进缓存 key)。没有耦合图的模拟器直接 cached_transpile。
+    先选完所有链，再把整批电路和各自的链一起交给一次 cached_transpile (并行转译)。
+    """
+    from qiskit import QuantumCircuit
+    from instrumentation import span
+    from transpile_cache import cached_transpile
+    single = isinstance(circuits, QuantumCircuit)
+    if not has_chain_layout(backend):
+        return cached_transpile(circuits, backend, optimization_level=optimization_level, **pm_kwargs)
+    circuits = [circuits] if single else list(circuits)
+    layouts = []
+    for qc in circuits:
+        with span("layout", backend=backend.name, qubits=qc.num_qubits) as s:
+            layout = resolve_layout(backend, qc, preferred)
+            s.set(layout=layout, estimated_fidelity=chain_fidelity(backend, layout, qc))
+        layouts.append(layout)
+    out = cached_transpile(circuits, backend, optimization_level=optimization_level, layouts=layouts, **pm_kwargs)
+    return out[0] if single else out
+
+
+if __name__ == "__main__":
+    import sys
+    from backend_provider import get_backend, describe
+    from sediment_circuits import create_sediment_circuit
+
+    # 例: QRP_BACKEND_MODE=fake python layout_search.py 16 20 24 28
+    lengths = [int(a) for a in sys.argv[1:]] or [16, 20, 24, 28]
+    backend = get_backend("ibm_torino")
+    print(f"🧭 Chain layouts on {describe(backend)}")
+    for L in lengths:
+        qc = create_sediment_circuit(L, 0.25)
+        t0 = time.perf_counter()
+        ranked = rank_chains(backend, circuit=qc, top=3)
+        cold = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        rank_chains(backend, circuit=qc, top=3)
+        warm = time.perf_counter() - t0
+        print(f"   L={L:<3} best est. fidelity {ranked[0][1]:.4f} ({cold * 1e3:.0f} ms cold, {warm * 1e3:.0f} ms cached)")
+        print(f"          {ranked[0][0]}")
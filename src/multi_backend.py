@@ -0,0 +1,221 @@
+import asyncio
+import csv
+import datetime
+import multiprocessing as mp
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+# ==========================================
+# 🛰️ 0.25 Protocol: Multi-Backend Fan-Out
+#    同一个实验 -> 每台机器各转译一次 -> 同时提交到 N 台 backend
+#    结果 + 当时的校准快照汇成一张可比较的表 (Torino vs Fez vs ...)
+#    本地模式：每个 fake backend 一个进程 (转译 + 噪声模拟都并行)
+# ==========================================
+
+DEFAULT_BACKENDS = ("ibm_torino", "ibm_fez")
+DEFAULT_SHOTS = 8192
+TABLE_FILE = "multi_backend_comparison.csv"
+
+
+def _median(values):
+    values = [v for v in values if v is not None]
+    return float(np.median(values)) if values else None
+
+
+def calibration_snapshot(backend, isa_circuit=None):
+    """
+    提交时刻的校准快照：全芯片中位数 + 电路实际用到的比特 (测量比特的读出误差 / T1 / T2，用到的 2q 门误差)。
+    模拟器没有校准数据，对应字段为 None。
+    """
+    from backend_provider import two_qubit_gate_name
+    from readout_mitigation import calibration_date, measured_qubits
+    from transpile_cache import target_fingerprint
+    target = backend.target
+    gate = two_qubit_gate_name(target)
+    snap = {"backend": backend.name, "version": getattr(backend, "backend_version", None),
+            "calibration_date": calibration_date(backend), "num_qubits": backend.num_qubits,
+            "two_qubit_gate": gate, "target_fingerprint": target_fingerprint(backend)[:16]}
+
+    def errors(op, qargs=None):
+        if op not in target.operation_names:
+            return []
+        items = target[op].items()
+        return [p.error for q, p in items if p is not None and (qargs is None or q in qargs)]
+
+    snap["median_2q_error"] = _median(errors(gate)) if gate else None
+    snap["median_readout_error"] = _median(errors("measure"))
+    try:
+        props = backend.properties()
+        t1 = {q: props.t1(q) for q in range(backend.num_qubits)}
+        t2 = {q: props.t2(q) for q in range(backend.num_qubits)}
+    except Exception:
+        t1 = t2 = {}
+    snap["median_t1_us"] = _median([v * 1e6 for v in t1.values() if v is not None])
+
+    if isa_circuit is not None:
+        used = sorted({q for q in measured_qubits(isa_circuit) if q is not None})
+        pairs = {tuple(isa_circuit.find_bit(q).index for q in inst.qubits)
+                 for inst in isa_circuit.data if inst.operation.name == gate}
+        snap["qubits"] = used
+        snap["used_readout_error"] = _median(errors("measure", {(q,) for q in used}))
+        snap["used_2q_error"] = _median(errors(gate, pairs)) if pairs else None
+        snap["used_t1_us"] = _median([t1[q] * 1e6 for q in used if t1.get(q) is not None])
+        snap["used_t2_us"] = _median([t2[q] * 1e6 for q in used if t2.get(q) is not None])
+        ops = isa_circuit.count_ops()
+        snap["depth"] = isa_circuit.depth()
+        snap["two_qubit_gates"] = int(ops.get(gate, 0)) if gate else 0
+    return snap
+
+
+# ==========================================
+# 1. 本地：每个 fake backend 一个进程
+# ==========================================
+def _local_worker(backend_name, circuits, shots, optimization_level):
+    """spawn 子进程里：取 fake backend -> 转译 (磁盘缓存) -> 噪声模拟 -> 打包结果 + 校准快照。"""
+    from qiskit_ibm_runtime import SamplerV2
+    from backend_provider import get_fake_backend
+    from result_store import _pack_result
+    from transpile_cache import cached_transpile
+    t0 = time.perf_counter()
+    backend = get_fake_backend(backend_name)
+    isa = cached_transpile(circuits, backend, optimization_level=optimization_level)
+    result = SamplerV2(mode=backend).run([(c, None, shots) for c in isa]).result()
+    # 完整时间戳 + 随机后缀：跨天、同一秒内的多个本地 job 都不会撞 ID
+    job_id = f"local-{backend.name}-{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    return {"backend": backend_name, "job_id": job_id, "status": "DONE",
+            "result": _pack_result(job_id, result, backend.name),
+            "snapshot": calibration_snapshot(backend, isa[0]), "seconds": time.perf_counter() - t0}
+
+
+def fan_out_local(circuits, backend_names, shots=DEFAULT_SHOTS, optimization_level=1, max_workers=None):
+    """按完成顺序产出每台 fake backend 的结果 (生成器)。"""
+    from sweep_runner import single_thread_children
+    ctx = mp.get_context("spawn")
+    workers = min(max_workers or os.cpu_count() or 1, len(backend_names))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        with single_thread_children():
+            futures = {pool.submit(_local_worker, name, circuits, shots, optimization_level): name
+                       for name in backend_names}
+        for fut in as_completed(futures):
+            try:
+                yield fut.result()
+            except Exception as e:
+                yield {"backend": futures[fut], "job_id": None, "status": "ERROR", "error": e}
+
+
+# ==========================================
+# 2. 云端：每台 backend 一个 Campaign，同一个事件循环里并发监视
+# ==========================================
+def fan_out_ibm(circuits, backend_names, shots=DEFAULT_SHOTS, optimization_level=1, store=None, **campaign_kwargs):
+    from qiskit_ibm_runtime import SamplerV2
+    from backend_provider import get_backend
+    from campaign import Campaign
+    from result_store import _pack_result
+    from transpile_cache import cached_transpile
+
+    targets = []
+    for name in backend_names:
+        backend = get_backend(name)
+        isa = cached_transpile(circuits, backend, optimization_level=optimization_level)
+        sampler = SamplerV2(mode=backend)
+        sampler.options.default_shots = shots
+        # 快照在提交前取：job 排队期间校准可能会更新
+        targets.append((name, backend, isa, sampler, calibration_snapshot(backend, isa[0])))
+
+    async def _main():
+        campaigns = [Campaign(sampler, store=store, **campaign_kwargs) for _, _, _, sampler, _ in targets]
+        jobs = await asyncio.gather(*(c.run([isa]) for c, (_, _, isa, _, _) in zip(campaigns, targets)))
+        return [cjobs[0] for cjobs in jobs]
+
+    rows = []
+    for (name, backend, _, _, snapshot), cjob in zip(targets, asyncio.run(_main())):
+        row = {"backend": name, "job_id": cjob.job_id, "status": cjob.status, "snapshot": snapshot}
+        if cjob.result is not None:
+            row["result"] = _pack_result(cjob.job_id, cjob.result, backend.name)
+        if cjob.error is not None:
+            row["error"] = cjob.error
+        rows.append(row)
+    return rows
+
+
+def fan_out(circuits, backend_names=DEFAULT_BACKENDS, analyze=None, shots=DEFAULT_SHOTS, optimization_level=1,
+            local=None, store=None, on_result=None, **campaign_kwargs):
+    """
+    统一入口：circuits 是逻辑电路 (列表)；analyze(StoredResult) -> {指标名: 值}。
+    local=None 时跟随 QRP_BACKEND_MODE (fake -> 进程并行，ibm -> Campaign 并发)。
+    返回一行一台 backend 的比较表 (dict 列表)。
+    """
+    from backend_provider import MODE_FAKE, get_mode
+    circuits = list(circuits) if isinstance(circuits, (list, tuple)) else [circuits]
+    local = get_mode() == MODE_FAKE if local is None else local
+    if local:
+        raw = fan_out_local(circuits, backend_names, shots, optimization_level)
+    else:
+        raw = fan_out_ibm(circuits, backend_names, shots, optimization_level, store, **campaign_kwargs)
+
+    rows = []
+    for r in raw:
+        row = {"backend": r["backend"], "job_id": r["job_id"], "status": r["status"]}
+        if r.get("error") is not None:
+            row["error"] = str(r["error"])
+        if analyze is not None and r.get("result") is not None:
+            row.update(analyze(r["result"]))
+        row.update({f"cal_{k}": v for k, v in (r.get("snapshot") or {}).items() if k != "backend"})
+        if local and store is not None and r.get("result") is not None:
+            store.save(r["result"])
+        rows.append(row)
+        if on_result is not None:
+            on_result(row)
+    order = {name: i for i, name in enumerate(backend_names)}
+    return sorted(rows, key=lambda row: order[row["backend"]])
+
+
+def write_table(rows, path=TABLE_FILE):
+    fields = []
+    for row in rows:
+        fields += [k for k in row if k not in fields]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def print_table(rows, metrics):
+    def fmt(v, spec):
+        return "-" if v is None else format(v, spec)
+    print(f"{'backend':<15} {'status':<6} " + " ".join(f"{m:>12}" for m in metrics) +
+          f" {'depth':>6} {'2q':>5} {'2q err':>8} {'RO err':>8} {'T1 (us)':>8} {'cal date':>11}")
+    for r in rows:
+        print(f"{r['backend']:<15} {r['status']:<6} " + " ".join(f"{fmt(r.get(m), '.4f'):>12}" for m in metrics) +
+              f" {fmt(r.get('cal_depth'), 'd'):>6} {fmt(r.get('cal_two_qubit_gates'), 'd'):>5}"
+              f" {fmt(r.get('cal_used_2q_error'), '.4f'):>8} {fmt(r.get('cal_used_readout_error'), '.4f'):>8}"
+              f" {fmt(r.get('cal_used_t1_us'), '.0f'):>8} {r.get('cal_calibration_date') or '-':>11}")
+
+
+def survival_metrics(stored, target=0):
+    """默认分析：第一个 PUB 的 P(target) 和二项误差。"""
+    counts = stored[0].data.meas.packed()
+    p = counts.probability(target)
+    return {"p_target": p, "stderr": float(np.sqrt(p * (1 - p) / counts.shots)), "shots": counts.shots}
+
+
+if __name__ == "__main__":
+    import sys
+    from butterfly_engine import build_butterfly_circuit
+    from result_store import ResultStore
+
+    # 例: QRP_BACKEND_MODE=fake python multi_backend.py ibm_torino ibm_fez ibm_marrakesh
+    names = [a for a in sys.argv[1:] if not a.startswith("--")] or list(DEFAULT_BACKENDS)
+    layers = 30
+    qc = build_butterfly_circuit(layers=layers)
+    print(f"🛰️ Butterfly ({layers} layers + inverse) -> {', '.join(names)}")
+    t0 = time.perf_counter()
+    rows = fan_out(qc, names, analyze=survival_metrics, store=ResultStore(),
+                   on_result=lambda r: print(f"   ✅ {r['backend']} {r['status']} ({r['job_id']})"))
+    print(f"\n⏱️ {time.perf_counter() - t0:.1f}s for {len(names)} backends\n")
+    print_table(rows, ["p_target", "stderr"])
+    print(f"\n💾 {write_table(rows)}")
@@ -0,0 +1,171 @@
+import numpy as np
+
+# ==========================================
+# 🧮 0.25 Protocol: Packed Counts
+#    counts = (outcome 整数数组 uint64, 次数数组 int64)，不再用 bitstring 字典
+#    合并 / 边缘化 / 单比特激发率全部向量化；支持跨 job 流式累加
+# ==========================================
+
+MAX_BITS = 64
+DENSE_MAX_BITS = 20
+
+
+def bit_array_to_ints(packed):
+    """BitArray.array (..., shots, nbytes) 大端字节 -> (..., shots) uint64 outcome。"""
+    packed = np.asarray(packed, dtype=np.uint8)
+    if packed.shape[-1] > MAX_BITS // 8:
+        raise ValueError(f"Registers wider than {MAX_BITS} bits are not supported")
+    weights = np.uint64(256) ** np.arange(packed.shape[-1] - 1, -1, -1, dtype=np.uint64)
+    return (packed.astype(np.uint64) * weights).sum(axis=-1, dtype=np.uint64)
+
+
+def _reduce(outcomes, counts):
+    keys, inverse = np.unique(outcomes, return_inverse=True)
+    return keys, np.bincount(inverse.ravel(), weights=counts, minlength=len(keys)).astype(np.int64)
+
+
+class PackedCounts:
+    def __init__(self, outcomes, counts, num_bits, reduced=False):
+        outcomes = np.asarray(outcomes, dtype=np.uint64).ravel()
+        counts = np.asarray(counts, dtype=np.int64).ravel()
+        if not reduced:
+            outcomes, counts = _reduce(outcomes, counts)
+        self.outcomes = outcomes
+        self.counts = counts
+        self.num_bits = int(num_bits)
+
+    # ---------- 构造 ----------
+    @classmethod
+    def from_shots(cls, shots, num_bits):
+        keys, n = np.unique(np.asarray(shots, dtype=np.uint64).ravel(), return_counts=True)
+        return cls(keys, n, num_bits, reduced=True)
+
+    @classmethod
+    def from_bit_array(cls, bit_array, loc=None):
+        packed = bit_array.array if loc is None else bit_array.array[loc]
+        return cls.from_shots(bit_array_to_ints(packed), bit_array.num_bits)
+
+    @classmethod
+    def from_stored(cls, stored_counts, loc=None):
+        outcomes, counts = stored_counts._slice(loc)
+        return cls(outcomes, counts, stored_counts.num_bits, reduced=loc is not None)
+
+    @classmethod
+    def from_dict(cls, counts, num_bits=None):
+        if num_bits is None:
+            num_bits = max((len(k.replace(" ", "")) for k in counts), default=0)
+        keys = np.array([int(k.replace(" ", ""), 2) for k in counts], dtype=np.uint64)
+        return cls(keys, np.fromiter(counts.values(), dtype=np.int64, count=len(counts)), num_bits)
+
+    # ---------- 基本量 ----------
+    @property
+    def shots(self):
+        return int(self.counts.sum())
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    def merge(self, *others):
+        for o in others:
+            if o.num_bits != self.num_bits:
+                raise ValueError(f"Cannot merge {o.num_bits}-bit counts into {self.num_bits}-bit counts")
+        return PackedCounts(np.concatenate([self.outcomes] + [o.outcomes for o in others]),
+                            np.concatenate([self.counts] + [o.counts for o in others]), self.num_bits)
+
+    def _index(self, outcome):
+        return int(outcome, 2) if isinstance(outcome, str) else int(outcome)
+
+    def get(self, outcome, default=0):
+        key = np.uint64(self._index(outcome))
+        i = np.searchsorted(self.outcomes, key)
+        if i < len(self.outcomes) and self.outcomes[i] == key:
+            return int(self.counts[i])
+        return default
+
+    def probability(self, outcome):
+        return self.get(outcome) / self.shots
+
+    # ---------- 向量化分析 ----------
+    def bits(self, qubits=None):
+        """(len(outcomes), len(qubits)) 的 0/1 矩阵，列顺序同 qubits (Qiskit 比特序，0 = 最右)。"""
+        qubits = np.arange(self.num_bits) if qubits is None else np.asarray(qubits)
+        return ((self.outcomes[:, None] >> qubits.astype(np.uint64)[None, :]) & np.uint64(1)).astype(np.int64)
+
+    def excitation_counts(self, qubits=None):
+        """每个比特测到 1 的次数 (整数)，一次矩阵-向量乘。"""
+        return self.counts @ self.bits(qubits)
+
+    def excitation_rates(self, qubits=None):
+        """每个比特的 P(1)。"""
+        return self.excitation_counts(qubits) / self.shots
+
+    def marginal(self, qubits):
+        """只保留 qubits (新比特 i = 原比特 qubits[i])，等价于 marginal_counts。"""
+        qubits = list(qubits)
+        shifts = np.arange(len(qubits), dtype=np.uint64)
+        new = (self.bits(qubits).astype(np.uint64) << shifts[None, :]).sum(axis=1, dtype=np.uint64)
+        return PackedCounts(new, self.counts, len(qubits))
+
+    def dense(self):
+        """长度 2^num_bits 的计数数组 (小寄存器专用，例如 3 比特直方图)。"""
+        if self.num_bits > DENSE_MAX_BITS:
+            raise ValueError(f"Dense histogram of {self.num_bits} bits is too large")
+        hist = np.zeros(2 ** self.num_bits, dtype=np.int64)
+        hist[self.outcomes.astype(np.int64)] = self.counts
+        return hist
+
+    def to_dict(self):
+        return {format(k, f"0{self.num_bits}b"): v for k, v in zip(self.outcomes.tolist(), self.counts.tolist())}
+
+
+def as_packed(register, loc=None):
+    """BitArray (SamplerV2 结果) 或 StoredCounts (本地结果库) -> PackedCounts。"""
+    if hasattr(register, "packed"):
+        return register.packed(loc)
+    return PackedCounts.from_bit_array(register, loc)
+
+
+class CountsAccumulator:
+    """跨 job 流式累加：先攒批，再一次 np.unique 归并，从不展开成 bitstring 字典。"""
+
+    def __init__(self, num_bits=None, flush_every=64):
+        self.num_bits = num_bits
+        self.flush_every = flush_every
+        self._outcomes = []
+        self._counts = []
+        self._merged = None
+
+    def add(self, counts):
+        if isinstance(counts, dict):
+            counts = PackedCounts.from_dict(counts, self.num_bits)
+        if self.num_bits is None:
+            self.num_bits = counts.num_bits
+        elif counts.num_bits != self.num_bits:
+            raise ValueError(f"Cannot accumulate {counts.num_bits}-bit counts into {self.num_bits}-bit counts")
+
+        self._outcomes.append(counts.outcomes)
+        self._counts.append(counts.counts)
+        if len(self._outcomes) >= self.flush_every:
+            self._flush()
+        return self
+
+    def add_shots(self, shots):
+        return self.add(PackedCounts.from_shots(shots, self.num_bits))
+
+    def _flush(self):
+        if not self._outcomes:
+            return
+        if self._merged is not None:
+            self._outcomes.insert(0, self._merged.outcomes)
+            self._counts.insert(0, self._merged.counts)
+        self._merged = PackedCounts(np.concatenate(self._outcomes), np.concatenate(self._counts), self.num_bits)
+        self._outcomes, self._counts = [], []
+
+    def result(self):
+        self._flush()
+        if self._merged is None:
+            return PackedCounts([], [], self.num_bits or 0, reduced=True)
+        return self._merged
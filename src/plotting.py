@@ -0,0 +1,30 @@
+import os
+
+# ==========================================
+# 🖼️ 0.25 Protocol: Headless Plotting
+#    分析脚本只在真正画图时才 import matplotlib，默认 Agg (只写文件，不开窗口、不连显示器)
+#    QRP_SHOW_PLOTS=1 才用交互 backend 并弹窗
+# ==========================================
+
+SHOW_PLOTS_ENV = "QRP_SHOW_PLOTS"
+
+
+def interactive():
+    return os.environ.get(SHOW_PLOTS_ENV, "0") == "1"
+
+
+def get_pyplot():
+    import matplotlib
+    if not interactive() and not os.environ.get("MPLBACKEND"):
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def show():
+    """代替 plt.show()：无头模式下只关闭图 (文件已经 savefig 过)。"""
+    plt = get_pyplot()
+    if interactive():
+        plt.show()
+    else:
+        plt.close("all")
@@ -2,8 +2,9 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
-from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+from qiskit_ibm_runtime import SamplerV2 as Sampler
+from backend_provider import get_backend, describe
+from layout_search import transpile_on_chain
 
 # ==========================================
 # 1. 寻找战场 (IBM Torino)
@@ -11,13 +12,8 @@ from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
 print(f"🔥 [全息提纯协议] 启动 0.25 宇宙底层代码...")
 print(f"   目标: 从重度噪声中提取纯净态")
 
-try:
-    service = QiskitRuntimeService()
-except:
-    service = QiskitRuntimeService(channel="ibm_quantum")
-
-backend = service.least_busy(operational=True, simulator=False, min_num_qubits=7)
-print(f"⚔️ 决战平台: {backend.name}")
+backend = get_backend(min_num_qubits=7)
+print(f"⚔️ 决战平台: {describe(backend)}")
 
 # ==========================================
 # 2. 实验参数
@@ -89,8 +85,7 @@ circuits = [qc_dirty, qc_cleaned, qc_ideal]
 labels = ["Dirty (No 0.25)", "Cleaned (With 0.25)", "Ideal (Baseline)"]
 
 print(f"⚡ 提交 3 组实验: [脏泥] vs [提纯] vs [理想]")
-pm = generate_preset_pass_manager(backend=backend, optimization_level=1)
-isa_circuits = pm.run(circuits)
+isa_circuits = transpile_on_chain(circuits, backend, optimization_level=1, preferred=PHYSICAL_QUBITS)
 
 sampler = Sampler(mode=backend)
 job = sampler.run([(c, None, SHOTS) for c in isa_circuits])
@@ -106,39 +101,39 @@ try:
     result = job.result()
     
     print("\n[对账单]")
-    fidelities = []
-    
+    # 每个保真度都带 95% 误差棒：Wilson (解析) + 多项分布 bootstrap
+    from survival_stats import Ratio, outcome_mask, ratio_summary, bootstrap, as_count_matrix
+    all_counts = []
+    for i in range(len(labels)):
+        try: all_counts.append(result[i].data.c.get_counts())
+        except: all_counts.append(result[i].data.meas.get_counts())
+    matrix = as_count_matrix(all_counts, num_bits=2)
+
+    # Qiskit key: "Q1 Q0"
+    # 魔法组：只看 Q1=0 (垃圾桶没亮) 的"幸存者"，保真度 = 00 / (00 + 01)
+    # 普通组：直接看 Q0=0 的比例 ("00" 或 "10")
+    post_selected = Ratio(outcome_mask("00", 2), outcome_mask(["00", "01"], 2))
+    plain = Ratio(outcome_mask(["00", "10"], 2))
+
+    fidelities, errors = [], []
     for i, label in enumerate(labels):
-        try: counts = result[i].data.c.get_counts()
-        except: counts = result[i].data.meas.get_counts()
-        
-        total = sum(counts.values())
-        
+        ratio = post_selected if "With 0.25" in label else plain
+        summary = ratio_summary(matrix[i], ratio)
+        boot = bootstrap(matrix[i], ratio, seed=i)
+        fidelity = float(np.nan_to_num(summary["p"]))
+        lo, hi = summary["ci"]
+        blo, bhi = boot["ci"]
+
         if "With 0.25" in label:
-            # === 魔法组的特殊算账方式 ===
-            # 我们只看 Q1=0 (垃圾桶没亮) 的情况，这叫"幸存者"
-            # Qiskit key: "Q1 Q0"
-            n_survived_correct = counts.get('00', 0) # Q1=0, Q0=0 (正确)
-            n_survived_wrong   = counts.get('01', 0) # Q1=0, Q0=1 (错误)
-            
-            sub_total = n_survived_correct + n_survived_wrong
-            if sub_total == 0: fidelity = 0
-            else: fidelity = n_survived_correct / sub_total
-            
-            survival_rate = sub_total / total
             print(f"👉 {label}:")
-            print(f"   - 存活率: {survival_rate:.2%}")
+            print(f"   - 存活率: {float(summary['survival']):.2%} ({int(summary['kept'])}/{int(matrix[i].sum())})")
             print(f"   - 提纯后保真度: {fidelity:.2%} (这是金子的纯度)")
-            
         else:
-            # === 普通组的算账方式 ===
-            # 直接看 Q0=0 的比例
-            # counts key: "00" or "10" means Q0=0
-            n_correct = counts.get('00', 0) + counts.get('10', 0)
-            fidelity = n_correct / total
             print(f"👉 {label}: 保真度 = {fidelity:.2%}")
-            
+        print(f"   - 95% 区间: Wilson [{lo:.2%}, {hi:.2%}] | Bootstrap [{blo:.2%}, {bhi:.2%}]")
+
         fidelities.append(fidelity)
+        errors.append([max(fidelity - lo, 0), max(hi - fidelity, 0)])
 
     # 绘图
     filename_pdf = f"Holographic_Refiner_{job_id}.pdf"
@@ -146,7 +141,7 @@ try:
         plt.figure(figsize=(10, 6))
         
         # 柱状图对比
-        bars = plt.bar(labels, fidelities, color=['gray', '#FFD700', 'blue'])
+        bars = plt.bar(labels, fidelities, yerr=np.array(errors).T, capsize=8, color=['gray', '#FFD700', 'blue'])
         
         # 标注数值
         for bar in bars:
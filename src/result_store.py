@@ -0,0 +1,256 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+from packed_counts import MAX_BITS, PackedCounts, bit_array_to_ints
+
+# ==========================================
+# 📦 0.25 Protocol: Local Result Store
+#    已完成的 job 是不可变的 -> 下载一次，永久存到本地
+#    并发抓取 (有界线程池)；counts 以整数数组存储 (outcome int -> count)
+# ==========================================
+
+STORE_DIR_ENV = "QRP_RESULT_DIR"
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "qrp", "results")
+MAX_WORKERS = 8
+FINAL_OK = "DONE"
+
+
+def status_name(raw_status):
+    # 兼容处理：如果是字符串直接用，如果是对象取.name
+    return raw_status if isinstance(raw_status, str) else raw_status.name
+
+
+class StoredCounts:
+    """
+    一个经典寄存器的计数，接口对齐 SamplerV2 的 BitArray (get_counts / get_int_counts)。
+    shape 是参数化 PUB 的扫描形状；每个位置存一对 (outcomes, counts) 数组。
+    """
+
+    def __init__(self, num_bits, shape, outcomes, counts, offsets):
+        self.num_bits = int(num_bits)
+        self.shape = tuple(shape)
+        self.outcomes = np.asarray(outcomes, dtype=np.uint64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_bit_array(cls, bit_array):
+        if bit_array.num_bits > MAX_BITS:
+            raise ValueError(f"Registers wider than {MAX_BITS} bits are not supported ({bit_array.num_bits})")
+        shape = bit_array.shape
+        n_locs = int(np.prod(shape)) if shape else 1
+        ints = bit_array_to_ints(bit_array.array.reshape(n_locs, bit_array.num_shots, -1))
+
+        outcomes, counts, offsets = [], [], [0]
+        for row in ints:
+            values, n = np.unique(row, return_counts=True)
+            outcomes.append(values)
+            counts.append(n)
+            offsets.append(offsets[-1] + len(values))
+        return cls(bit_array.num_bits, shape, np.concatenate(outcomes), np.concatenate(counts), offsets)
+
+    @property
+    def num_shots(self):
+        return int(self.counts[self.offsets[0]:self.offsets[1]].sum())
+
+    def _slice(self, loc):
+        if loc is None:
+            return self.outcomes, self.counts
+        flat = np.ravel_multi_index(loc if isinstance(loc, tuple) else (loc,), self.shape) if self.shape else 0
+        a, b = self.offsets[flat], self.offsets[flat + 1]
+        return self.outcomes[a:b], self.counts[a:b]
+
+    def get_int_counts(self, loc=None):
+        outcomes, counts = self._slice(loc)
+        merged = {}
+        for k, v in zip(outcomes.tolist(), counts.tolist()):
+            merged[k] = merged.get(k, 0) + v
+        return merged
+
+    def get_counts(self, loc=None):
+        return {format(k, f"0{self.num_bits}b"): v for k, v in self.get_int_counts(loc).items()}
+
+    def packed(self, loc=None):
+        return PackedCounts.from_stored(self, loc)
+
+
+class StoredPubResult:
+    def __init__(self, registers):
+        self.registers = registers
+        self.data = SimpleNamespace(**registers)
+
+
+class StoredResult:
+    """和 PrimitiveResult 一样可以 result[i].data.meas.get_counts()；未完成的 job 只有 status。"""
+
+    def __init__(self, job_id, status, pubs=(), metadata=None, error=None):
+        self.job_id = job_id
+        self.status = status
+        self.pubs = list(pubs)
+        self.metadata = metadata or {}
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.status == FINAL_OK and self.error is None
+
+    def __getitem__(self, idx):
+        return self.pubs[idx]
+
+    def __len__(self):
+        return len(self.pubs)
+
+    def __iter__(self):
+        return iter(self.pubs)
+
+
+def _pack_result(job_id, result, backend_name=None):
+    pubs = []
+    for pub_result in result:
+        registers = {}
+        for name in pub_result.data.keys():
+            registers[name] = StoredCounts.from_bit_array(getattr(pub_result.data, name))
+        pubs.append(StoredPubResult(registers))
+    return StoredResult(job_id, FINAL_OK, pubs, {"backend": backend_name})
+
+
+class ResultStore:
+    def __init__(self, store_dir=None, max_workers=MAX_WORKERS, archive=None):
+        self.store_dir = store_dir or os.environ.get(STORE_DIR_ENV) or DEFAULT_STORE_DIR
+        self.max_workers = max_workers
+        self.archive = archive  # 可选 ShotArchive：下载时顺便保留逐 shot 原始数据
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.store_dir, f"{job_id}.npz")
+
+    def has(self, job_id):
+        return os.path.exists(self._path(job_id))
+
+    def save(self, stored):
+        arrays = {}
+        layout = []
+        for i, pub in enumerate(stored.pubs):
+            regs = {}
+            for name, c in pub.registers.items():
+                prefix = f"p{i}_{name}"
+                arrays[f"{prefix}_outcomes"] = c.outcomes
+                arrays[f"{prefix}_counts"] = c.counts
+                arrays[f"{prefix}_offsets"] = c.offsets
+                regs[name] = {"num_bits": c.num_bits, "shape": list(c.shape)}
+            layout.append(regs)
+        meta = {"job_id": stored.job_id, "status": stored.status, "metadata": stored.metadata, "pubs": layout}
+        arrays["__meta__"] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+
+        path = self._path(stored.job_id)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+
+    def load(self, job_id):
+        with np.load(self._path(job_id)) as z:
+            meta = json.loads(z["__meta__"].tobytes().decode())
+            pubs = []
+            for i, regs in enumerate(meta["pubs"]):
+                registers = {}
+                for name, info in regs.items():
+                    prefix = f"p{i}_{name}"
+                    registers[name] = StoredCounts(info["num_bits"], info["shape"], z[f"{prefix}_outcomes"],
+                                                   z[f"{prefix}_counts"], z[f"{prefix}_offsets"])
+                pubs.append(StoredPubResult(registers))
+        return StoredResult(meta["job_id"], meta["status"], pubs, meta.get("metadata"))
+
+    def _download(self, service, job_id):
+        from instrumentation import record_job, span
+        with span("job.download", **{"job.id": job_id}) as s:
+            try:
+                job = service.job(job_id)
+                status = status_name(job.status())
+                s.set(**{"job.status": status})
+                if status != FINAL_OK:
+                    return StoredResult(job_id, status)
+                backend = job.backend()
+                result = job.result()
+                record_job(s, job, result)
+                stored = self.save_result(job_id, result, getattr(backend, "name", backend))
+            except Exception as e:
+                s.set(error=repr(e))
+                return StoredResult(job_id, "ERROR", error=e)
+        return stored
+
+    def save_result(self, job_id, result, backend_name=None):
+        """SamplerV2 结果 -> 压缩 counts 落盘 (+ 逐 shot 归档，如果挂了 archive)。"""
+        stored = _pack_result(job_id, result, backend_name)
+        self.save(stored)
+        if self.archive is not None:
+            self.archive.append_result(job_id, result, backend_name)
+        return stored
+
+    def fetch(self, job_ids, service=None, refresh=False):
+        """
+        返回 {job_id: StoredResult}，顺序与 job_ids 一致。
+        本地已有的直接读盘；其余的用线程池并发下载 (只在需要时才连接 IBM)。
+        refresh=True 即使本地已有也重新下载：.npz 只存合并后的计数，补逐 shot 归档时要用原始结果。
+        """
+        results = {}
+        missing = []
+        for jid in job_ids:
+            if self.has(jid) and not refresh:
+                results[jid] = self.load(jid)
+            else:
+                missing.append(jid)
+
+        if missing:
+            if service is None:
+                from backend_provider import get_service
+                service = get_service()
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as pool:
+                for jid, stored in zip(missing, pool.map(lambda j: self._download(service, j), missing)):
+                    results[jid] = stored
+
+        return {jid: results[jid] for jid in job_ids}
+
+
+# ==========================================
+# 🧪 本地替身 (离线测试用，代替 QiskitRuntimeService)
+# ==========================================
+class StubJob:
+    def __init__(self, job_id, result=None, status=FINAL_OK, backend_name="stub_backend"):
+        self._job_id = job_id
+        self._result = result
+        self._status = status
+        self._backend = SimpleNamespace(name=backend_name)
+
+    def job_id(self):
+        return self._job_id
+
+    def status(self):
+        return self._status
+
+    def backend(self):
+        return self._backend
+
+    def result(self):
+        if self._status != FINAL_OK:
+            raise RuntimeError(f"Job {self._job_id} is {self._status}")
+        return self._result
+
+
+class StubService:
+    """service.job(jid) 的本地实现；可以直接登记 fake backend 跑出来的 job。"""
+
+    def __init__(self, jobs=None):
+        self.jobs = dict(jobs or {})
+
+    def add(self, job):
+        if not isinstance(job, StubJob):
+            job = StubJob(job.job_id(), job.result(), FINAL_OK, getattr(job.backend(), "name", "local"))
+        self.jobs[job.job_id()] = job
+        return job.job_id()
+
+    def job(self, job_id):
+        if job_id not in self.jobs:
+            raise KeyError(f"Unknown job {job_id}")
+        return self.jobs[job_id]
@@ -2,7 +2,8 @@ import numpy as np
 import datetime
 import time
 from qiskit import QuantumCircuit, transpile
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2, SamplerOptions
+from qiskit_ibm_runtime import SamplerV2, SamplerOptions
+from backend_provider import get_backend, describe
 
 # ==========================================
 # ⚔️ 0.25 协议：标度律终极验证 (Scaling Law Verdict)
@@ -10,11 +11,8 @@ from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2, SamplerOptions
 # ==========================================
 
 print(f"🚀 [00:00] 正在连接 IBM Quantum (Mode: Scaling Scan)...")
-try:
-    service = QiskitRuntimeService()
-except:
-    service = QiskitRuntimeService(channel="ibm_quantum")
-backend = service.backend("ibm_torino")
+backend = get_backend("ibm_torino")
+print(f"✅ 锁定目标: {describe(backend)}")
 
 # 1. 核心电路构建器 (带 Gamma 参数)
 def build_scaling_circuit(n_layers, gamma):
@@ -0,0 +1,65 @@
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.circuit import Parameter
+
+# ==========================================
+# 🧪 Project Sediment: 共享电路构建
+#    finite_size_scaling / cosmological_constant_scan / holographic_dark_matter
+#    共用同一条沉积链；cooling_factor 可以是数值，也可以是 Parameter
+# ==========================================
+
+COOLING_PARAM_NAME = "cf"
+
+
+def sediment_step(cooling_factor):
+    """沉积通道的一步 (作用在相邻两比特 i, i+1 上的模板)。"""
+    theta = cooling_factor * np.pi
+    step = QuantumCircuit(2)
+    step.cx(0, 1)
+    step.h(0)
+    step.cx(1, 0)
+
+    # 冷却/几何相互作用 (Fixed Ratio 0.5 as per Paper 1)
+    step.rz(theta, 1)
+    step.rx(theta * 0.5, 1)
+    return step
+
+
+def create_sediment_circuit(length, cooling_factor=0.1, barriers=True):
+    """barriers=False 去掉每一步后的全宽 barrier，让转译器可以跨步合并/重排门。"""
+    from circuit_builder import chain
+    qc = QuantumCircuit(length)
+
+    # --- PHASE I: 混沌源 (Scrambling Source) ---
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.rx(np.pi/1.3, 0)
+    qc.rz(np.pi/2.5, 1)
+    qc.cx(1, 0)
+    qc.barrier()
+
+    # --- PHASE II: 沉积通道 (Sedimentation Channel) ---
+    qc.compose(chain(length, sediment_step(cooling_factor), barriers=barriers), inplace=True)
+
+    # --- PHASE III: 探测 (Detection) ---
+    qc.measure_all()
+    return qc
+
+
+def create_parametric_sediment_circuit(length):
+    """同一条链只建一次：cooling factor 作为 Parameter，扫描值在提交时绑定。"""
+    cf = Parameter(COOLING_PARAM_NAME)
+    return create_sediment_circuit(length, cf), cf
+
+
+def sweep_pub(isa_circuit, cooling_sweep, shots=None):
+    """
+    一个长度的整段扫描 -> 单个 PUB: (circuit, bindings[n_points, 1], shots)。
+    结果里 pub_result.data.meas 的 shape 是 (n_points,)，用 get_counts(loc=j) 取第 j 个点。
+    """
+    if isa_circuit.num_parameters != 1:
+        raise ValueError(f"Expected one cooling-factor parameter, got {isa_circuit.num_parameters}")
+    bindings = np.asarray(cooling_sweep, dtype=float).reshape(-1, 1)
+    if shots is None:
+        return (isa_circuit, bindings)
+    return (isa_circuit, bindings, shots)
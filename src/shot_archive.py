@@ -0,0 +1,288 @@
+import json
+import os
+import threading
+import time
+from math import erf
+import numpy as np
+from packed_counts import PackedCounts, bit_array_to_ints
+
+# ==========================================
+# 🎞️ 0.25 Protocol: Raw Shot Archive
+#    counts 字典丢掉了 shot 的先后顺序 -> 漂移 / 关联 / block bootstrap 都做不了
+#    BitArray 的打包字节原样追加到一个二进制文件 (每 shot ceil(n/8) 字节)，JSONL 索引 (job, PUB, 寄存器)
+#    读取走 np.memmap + 分块，几百万 shot 也不用整块读进内存
+# ==========================================
+
+ARCHIVE_DIR_ENV = "QRP_SHOT_ARCHIVE_DIR"
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "qrp", "shots")
+DATA_FILE = "shots.bin"
+INDEX_FILE = "index.jsonl"
+CHUNK_SHOTS = 1 << 20  # 每次最多解包 ~100 万 shot
+
+
+class ShotEntry:
+    """索引里的一条：一个 job 的一个 PUB 的一个经典寄存器。数据布局 = BitArray.array 的 C 顺序 (*shape, shots, nbytes)。"""
+
+    def __init__(self, job_id, pub, register, num_bits, shape, num_shots, offset, backend=None, timestamp=None):
+        self.job_id = job_id
+        self.pub = int(pub)
+        self.register = register
+        self.num_bits = int(num_bits)
+        self.shape = tuple(shape)
+        self.num_shots = int(num_shots)
+        self.offset = int(offset)
+        self.backend = backend
+        self.timestamp = timestamp
+
+    @property
+    def nbytes_per_shot(self):
+        return (self.num_bits + 7) // 8
+
+    @property
+    def num_locs(self):
+        return int(np.prod(self.shape)) if self.shape else 1
+
+    @property
+    def nbytes(self):
+        return self.num_locs * self.num_shots * self.nbytes_per_shot
+
+    def to_json(self):
+        return {"job_id": self.job_id, "pub": self.pub, "register": self.register, "num_bits": self.num_bits,
+                "shape": list(self.shape), "num_shots": self.num_shots, "offset": self.offset,
+                "backend": self.backend, "timestamp": self.timestamp}
+
+    def __repr__(self):
+        return f"ShotEntry({self.job_id}[{self.pub}].{self.register}, {self.num_locs}x{self.num_shots} shots)"
+
+
+class ShotArchive:
+    def __init__(self, archive_dir=None):
+        self.archive_dir = archive_dir or os.environ.get(ARCHIVE_DIR_ENV) or DEFAULT_ARCHIVE_DIR
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self.data_path = os.path.join(self.archive_dir, DATA_FILE)
+        self.index_path = os.path.join(self.archive_dir, INDEX_FILE)
+        self._lock = threading.Lock()  # ResultStore.fetch 在线程池里下载
+
+    # ---------- 写 (只追加) ----------
+    def append(self, job_id, pub, register, bit_array, backend=None):
+        """先写数据并 fsync，再写索引行：崩溃最多留下一段没人引用的字节，不会有指向半截数据的索引。"""
+        raw = np.ascontiguousarray(bit_array.array, dtype=np.uint8)
+        with self._lock:
+            with open(self.data_path, "ab") as f:
+                offset = f.tell()
+                f.write(raw.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            entry = ShotEntry(job_id, pub, register, bit_array.num_bits, bit_array.shape, bit_array.num_shots, offset,
+                              backend, time.strftime("%Y-%m-%dT%H:%M:%S"))
+            with open(self.index_path, "a") as f:
+                f.write(json.dumps(entry.to_json()) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        return entry
+
+    def append_result(self, job_id, result, backend_name=None):
+        """SamplerV2 的 PrimitiveResult：每个 PUB 的每个寄存器一条。同一个 job 重复追加会被跳过。"""
+        if self.has(job_id):
+            return self.entries(job_id)
+        return [self.append(job_id, i, name, getattr(pub.data, name), backend_name)
+                for i, pub in enumerate(result) for name in pub.data.keys()]
+
+    # ---------- 索引 ----------
+    def entries(self, job_id=None, pub=None, register=None):
+        if not os.path.exists(self.index_path):
+            return []
+        job_ids = None if job_id is None else ({job_id} if isinstance(job_id, str) else set(job_id))
+        out = []
+        with open(self.index_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                e = ShotEntry(**json.loads(line))
+                if (job_ids is None or e.job_id in job_ids) and (pub is None or e.pub == pub) \
+                        and (register is None or e.register == register):
+                    out.append(e)
+        if job_ids is not None and not isinstance(job_id, str):
+            order = {jid: i for i, jid in enumerate(job_id)}
+            out.sort(key=lambda e: (order[e.job_id], e.pub))  # 按调用方给的 job 顺序 (= 时间顺序)
+        return out
+
+    def has(self, job_id):
+        return bool(self.entries(job_id))
+
+    def ensure(self, job_ids, service=None):
+        """
+        把 job_ids 里还没归档的 job 补进来，返回按 job_ids 顺序的 entries。
+        结果库里已有 .npz 的 job 也得重新下载 (计数里没有 shot 顺序)；补不上的 job 直接报错。
+        """
+        missing = [jid for jid in job_ids if not self.has(jid)]
+        if missing:
+            from result_store import ResultStore
+            results = ResultStore(archive=self).fetch(missing, service=service, refresh=True)
+            failed = {jid: r.error or r.status for jid, r in results.items() if not self.has(jid)}
+            if failed:
+                raise RuntimeError(f"No per-shot data for {len(failed)} job(s): {failed}")
+        return self.entries(job_ids)
+
+    # ---------- 读 ----------
+    def raw(self, entry, loc=None):
+        """(shots, nbytes) 的 memmap 视图；loc 是参数化 PUB 的扫描位置 (整数或元组)。"""
+        mm = np.memmap(self.data_path, dtype=np.uint8, mode="r", offset=entry.offset,
+                       shape=(entry.num_locs, entry.num_shots, entry.nbytes_per_shot))
+        if loc is None and entry.num_locs == 1:
+            return mm[0]
+        if loc is None:
+            raise ValueError(f"{entry} has a sweep of shape {entry.shape}; pass loc")
+        flat = np.ravel_multi_index(loc if isinstance(loc, tuple) else (loc,), entry.shape)
+        return mm[flat]
+
+    def iter_outcomes(self, entry, loc=None, chunk=CHUNK_SHOTS):
+        """按 shot 顺序分块产出 uint64 outcome (Qiskit 比特序)，内存占用只跟 chunk 有关。"""
+        raw = self.raw(entry, loc)
+        for start in range(0, entry.num_shots, chunk):
+            yield bit_array_to_ints(raw[start:start + chunk])
+
+    def outcomes(self, entry, loc=None):
+        return bit_array_to_ints(self.raw(entry, loc))
+
+    def packed(self, entries, loc=None):
+        """若干条目的合并 counts (和 counts 字典等价，用来核对)。"""
+        from packed_counts import CountsAccumulator
+        acc = CountsAccumulator()
+        for e in entries:
+            for chunk in self.iter_outcomes(e, loc):
+                acc.add(PackedCounts.from_shots(chunk, e.num_bits))
+        return acc.result()
+
+
+# ==========================================
+# 📈 逐 shot 分析 (全部流式)
+# ==========================================
+def _indicator(target):
+    """target: outcome 整数 / bitstring，或 outcomes -> bool 数组 的函数。"""
+    if callable(target):
+        return target
+    key = np.uint64(int(target, 2) if isinstance(target, str) else int(target))
+    return lambda outcomes: outcomes == key
+
+
+def block_hits(archive, entries, target, block=1000, loc=None):
+    """
+    每 block 个连续 shot 一个桶：返回 (hits, sizes, job_index)。
+    桶不跨 job；job 的最后一个桶可能不满。
+    """
+    hit = _indicator(target)
+    hits, sizes, owner = [], [], []
+    for j, e in enumerate(entries):
+        chunk = max(block, CHUNK_SHOTS // block * block)  # chunk 取 block 的整数倍，桶不会被切开
+        for outcomes in archive.iter_outcomes(e, loc, chunk):
+            flags = hit(outcomes).astype(np.int64)
+            starts = np.arange(0, len(flags), block)
+            hits.append(np.add.reduceat(flags, starts))
+            sizes.append(np.minimum(block, len(flags) - starts))
+            owner.append(np.full(len(starts), j))
+    return np.concatenate(hits), np.concatenate(sizes), np.concatenate(owner)
+
+
+def block_bootstrap(hits, sizes, n_resamples=2000, z=1.959963984540054, seed=None):
+    """
+    按桶重采样 (保留桶内的时间关联)；block=1 就是普通的逐 shot bootstrap。
+    返回 p, bootstrap stderr, 百分位区间, 以及和独立二项误差的比值 (>1 说明 shot 之间不独立)。
+    """
+    rng = np.random.default_rng(seed)
+    hits, sizes = np.asarray(hits), np.asarray(sizes)
+    n = len(hits)
+    p = hits.sum() / sizes.sum()
+    samples = np.empty(n_resamples)
+    for i in range(n_resamples):
+        # 每次重采样只要每个桶被抽中几次 (多项分布)：内存 O(n)，不是 O(n_resamples * n)
+        w = np.bincount(rng.integers(0, n, n), minlength=n)
+        samples[i] = (hits @ w) / (sizes @ w)
+    alpha = 1 - erf(z / np.sqrt(2))  # 双侧尾部概率
+    lo, hi = np.quantile(samples, [alpha / 2, 1 - alpha / 2])
+    stderr = float(samples.std(ddof=1))
+    binomial = float(np.sqrt(p * (1 - p) / sizes.sum()))
+    return {"p": float(p), "stderr": stderr, "ci": (float(lo), float(hi)),
+            "dispersion": stderr / binomial if binomial > 0 else float("nan"), "n_blocks": n}
+
+
+def drift(archive, entries, target, window=1000, loc=None):
+    """
+    时间漂移：每个 job 内按 window 个 shot 分窗的 p(t)，加两个卡方齐性检验
+    (所有窗口同一个 p？各 job 同一个 p？)。p 值很小 = 机器在跑的过程中变了。
+    """
+    from scipy.stats import chi2
+    hits, sizes, owner = block_hits(archive, entries, target, window, loc)
+    p_all = hits.sum() / sizes.sum()
+
+    def homogeneity(k, n):
+        expected = n * p_all
+        stat = float(np.sum((k - expected) ** 2 / np.maximum(expected * (1 - p_all), 1e-12)))
+        dof = len(k) - 1
+        return {"chi2": stat, "dof": dof, "p_value": float(chi2.sf(stat, dof)) if dof > 0 else 1.0}
+
+    job_hits = np.bincount(owner, weights=hits, minlength=len(entries))
+    job_sizes = np.bincount(owner, weights=sizes, minlength=len(entries))
+    jobs = [{"job_id": e.job_id, "shots": int(n), "p": k / n, "stderr": float(np.sqrt(k / n * (1 - k / n) / n))}
+            for e, k, n in zip(entries, job_hits, job_sizes)]
+    return {"p": float(p_all), "windows": {"p": hits / sizes, "shots": sizes, "job": owner},
+            "jobs": jobs, "between_windows": homogeneity(hits, sizes), "between_jobs": homogeneity(job_hits, job_sizes)}
+
+
+def bit_correlations(archive, entries, qubits=None, loc=None):
+    """连通关联矩阵 <z_i z_j> - <z_i><z_j> (z = 0/1)，逐块累加一阶、二阶矩。"""
+    num_bits = entries[0].num_bits
+    qubits = np.arange(num_bits) if qubits is None else np.asarray(qubits)
+    first = np.zeros(len(qubits))
+    second = np.zeros((len(qubits), len(qubits)))
+    total = 0
+    for e in entries:
+        for outcomes in archive.iter_outcomes(e, loc):
+            bits = ((outcomes[:, None] >> qubits.astype(np.uint64)[None, :]) & np.uint64(1)).astype(np.float64)
+            first += bits.sum(axis=0)
+            second += bits.T @ bits
+            total += len(outcomes)
+    mean = first / total
+    return second / total - np.outer(mean, mean)
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    if len(sys.argv) > 1 and sys.argv[1] != "--demo":
+        # 真实数据：python shot_archive.py <job_id> ...  (final_48k_verdict 的 4 个 job 也可以直接用)
+        job_ids = sys.argv[1:]
+        archive = ShotArchive()
+        archive.ensure(job_ids)
+        entries = archive.entries(job_ids, pub=0, register="meas")
+    else:
+        # 离线演示：4 个 25 万 shot 的 "job"，第 3 个中途漂移
+        from qiskit.primitives import BitArray
+        rng = np.random.default_rng(0)
+        archive = ShotArchive(tempfile.mkdtemp(prefix="qrp_shots_"))
+        job_ids = [f"demo_job_{i}" for i in range(4)]
+        for i, jid in enumerate(job_ids):
+            p0 = np.full(250_000, 0.16)
+            if i == 2:
+                p0[125_000:] = 0.15
+            shots = np.where(rng.random(len(p0)) < p0, 0, rng.integers(1, 8, len(p0))).astype(np.uint8)
+            archive.append(jid, 0, "meas", BitArray(shots[:, None], 3), backend="demo")
+        entries = archive.entries(job_ids)
+
+    t0 = time.perf_counter()
+    d = drift(archive, entries, 0, window=5000)
+    boot = block_bootstrap(*block_hits(archive, entries, 0, block=1000)[:2], seed=1)
+    corr = bit_correlations(archive, entries)
+    dt = time.perf_counter() - t0
+    total = sum(e.num_shots for e in entries)
+    print(f"🎞️ {total} shots from {len(entries)} jobs analysed in {dt:.2f}s ({archive.archive_dir})")
+    for j in d["jobs"]:
+        print(f"   {j['job_id']:<22} P_000 = {j['p']:.4f} ± {j['stderr']:.4f} ({j['shots']} shots)")
+    print(f"   drift between jobs:    chi2={d['between_jobs']['chi2']:.1f}/{d['between_jobs']['dof']} "
+          f"p={d['between_jobs']['p_value']:.3g}")
+    print(f"   drift between windows: chi2={d['between_windows']['chi2']:.1f}/{d['between_windows']['dof']} "
+          f"p={d['between_windows']['p_value']:.3g}")
+    print(f"   block bootstrap: P_000 = {boot['p']:.4f} ± {boot['stderr']:.4f} "
+          f"(dispersion {boot['dispersion']:.2f}x binomial)")
+    print(f"   max |bit correlation| = {np.abs(corr - np.diag(np.diag(corr))).max():.4f}")
@@ -1,13 +1,13 @@
 import numpy as np
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, transpile
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
+from qiskit_ibm_runtime import SamplerV2 as Sampler
+from backend_provider import get_backend, describe
 
 # ==========================================
 # 1. 启动引擎
 # ==========================================
-service = QiskitRuntimeService()
-backend = service.least_busy(operational=True, simulator=False, dynamic_circuits=True)
-print(f"🔑 钥匙已插入，正在连接目标: {backend.name}")
+backend = get_backend(dynamic_circuits=True)
+print(f"🔑 钥匙已插入，正在连接目标: {describe(backend)}")
 
 # ==========================================
 # 2. 构建几何共振电路
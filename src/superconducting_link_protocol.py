@@ -1,6 +1,7 @@
 import numpy as np
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, transpile
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
+from qiskit_ibm_runtime import SamplerV2 as Sampler
+from backend_provider import get_backend, describe
 
 # ============================================================
 # 🌌 Project: Room Temperature Superconducting Link (Simulation)
@@ -10,9 +11,8 @@ from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
 
 print(f"🔥 [SYSTEM START] Initializing Superconducting Link Protocol...")
 
-service = QiskitRuntimeService()
-backend = service.least_busy(operational=True, simulator=False, dynamic_circuits=True)
-print(f"⚡ Target Lattice: {backend.name}")
+backend = get_backend(dynamic_circuits=True)
+print(f"⚡ Target Lattice: {describe(backend)}")
 
 # 构建双晶电路 (两个 3-qubit 晶粒)
 qr = QuantumRegister(6, 'q')  # Q0-2 (Source), Q3-5 (Drain)
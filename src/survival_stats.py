@@ -0,0 +1,197 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from adaptive_shots import Z_95, wilson_interval
+
+# ==========================================
+# 📐 0.25 Protocol: Survival Statistics
+#    Wilson 区间 / 多项分布 bootstrap / 后选择比值 (00/(00+01)) 的误差棒
+#    所有 PUB 和所有重采样一次性向量化：counts 形状 (..., K)，重采样 (R, ..., K)
+# ==========================================
+
+DEFAULT_RESAMPLES = 10000
+RESAMPLE_CHUNK = 1000  # 每块 R×PUB×K 个整数，控制内存
+
+
+def as_count_matrix(counts, num_bits=None):
+    """PackedCounts / bitstring 字典 / dense 数组 (或它们的列表) -> (..., 2^n) int64 矩阵。"""
+    from packed_counts import PackedCounts
+    if isinstance(counts, (list, tuple)) and counts and not np.isscalar(counts[0]):
+        return np.stack([as_count_matrix(c, num_bits) for c in counts])
+    if isinstance(counts, dict):
+        counts = PackedCounts.from_dict(counts, num_bits)
+    if isinstance(counts, PackedCounts):
+        return counts.dense()
+    return np.asarray(counts, dtype=np.int64)
+
+
+def outcome_mask(states, num_bits):
+    """bitstring / 整数 / 谓词 (int -> bool) -> 长度 2^n 的 0/1 掩码。"""
+    size = 2 ** num_bits
+    if callable(states):
+        return np.array([bool(states(i)) for i in range(size)], dtype=np.int64)
+    mask = np.zeros(size, dtype=np.int64)
+    for s in ([states] if isinstance(states, (str, int, np.integer)) else states):
+        mask[int(s, 2) if isinstance(s, str) else int(s)] = 1
+    return mask
+
+
+class Ratio:
+    """
+    统计量 = counts·num / counts·den，例如
+      P(000)                   : Ratio(outcome_mask("000", 3))
+      后选择保真度 00/(00+01)  : Ratio(outcome_mask("00", 2), outcome_mask(["00", "01"], 2))
+    用类而不是 lambda，多进程 bootstrap 时可以 pickle。
+    """
+
+    def __init__(self, numerator, denominator=None):
+        self.numerator = np.asarray(numerator, dtype=np.int64)
+        self.denominator = None if denominator is None else np.asarray(denominator, dtype=np.int64)
+
+    def parts(self, counts):
+        k = counts @ self.numerator
+        n = counts.sum(axis=-1) if self.denominator is None else counts @ self.denominator
+        return k, n
+
+    def __call__(self, counts):
+        k, n = self.parts(counts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > 0, k / np.maximum(n, 1), np.nan)
+
+
+# ==========================================
+# 1. 解析区间
+# ==========================================
+def binomial_summary(successes, shots, floor=None, z=Z_95):
+    """向量化：p, 二项 stderr, Wilson 区间；给 floor 的话再加 (p - floor)/stderr。"""
+    k = np.asarray(successes, dtype=float)
+    n = np.asarray(shots, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = np.where(n > 0, k / np.maximum(n, 1), np.nan)
+        stderr = np.sqrt(p * (1 - p) / n)
+        out = {"p": p, "stderr": stderr, "ci": np.stack(wilson_interval(k, n, z), axis=-1)}
+        if floor is not None:
+            out["sigma"] = (p - floor) / stderr
+    return out
+
+
+def ratio_summary(counts, ratio, z=Z_95):
+    """后选择比值的解析误差：以 den 为条件，分子是二项分布 -> Wilson(k, n)。survival = n / 总 shots。"""
+    counts = as_count_matrix(counts)
+    k, n = ratio.parts(counts)
+    out = binomial_summary(k, n, z=z)
+    out["kept"] = n
+    out["survival"] = n / counts.sum(axis=-1)
+    return out
+
+
+# ==========================================
+# 2. 多项分布 bootstrap
+# ==========================================
+def _resample(counts, stat, n_resamples, seed):
+    rng = np.random.default_rng(seed)
+    shots = counts.sum(axis=-1)
+    probs = counts / np.maximum(shots, 1)[..., None]
+    out = []
+    for start in range(0, n_resamples, RESAMPLE_CHUNK):
+        r = min(RESAMPLE_CHUNK, n_resamples - start)
+        draws = rng.multinomial(shots, probs, size=(r,) + shots.shape)  # (r, ..., K)
+        out.append(stat(draws))
+    return np.concatenate(out)
+
+
+def bootstrap(counts, stat, n_resamples=DEFAULT_RESAMPLES, z=Z_95, seed=None, processes=None):
+    """
+    counts: (..., K) 计数矩阵 (一行一个 PUB / 扫描点)；stat: (R, ..., K) -> (R, ...)。
+    返回 estimate, stderr, 百分位区间 ci[..., 2] 和原始样本 samples[R, ...]。
+    processes>1 时按重采样次数切块分给多个进程 (各自独立的随机流)。
+    """
+    counts = as_count_matrix(counts)
+    if processes is None or processes <= 1:
+        samples = _resample(counts, stat, n_resamples, seed)
+    else:
+        seeds = np.random.SeedSequence(seed).spawn(processes)
+        sizes = np.diff(np.linspace(0, n_resamples, processes + 1).astype(int))
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            samples = np.concatenate(list(pool.map(_resample, [counts] * processes, [stat] * processes,
+                                                   sizes, seeds)))
+    alpha = 2 * (1 - _normal_cdf(z))
+    lo, hi = np.nanquantile(samples, [alpha / 2, 1 - alpha / 2], axis=0)
+    return {"estimate": stat(counts), "stderr": np.nanstd(samples, axis=0, ddof=1),
+            "ci": np.stack([lo, hi], axis=-1), "samples": samples}
+
+
+def _normal_cdf(z):
+    from math import erf, sqrt
+    return 0.5 * (1 + erf(z / sqrt(2)))
+
+
+def survival_report(counts, target=0, floor=None, n_resamples=DEFAULT_RESAMPLES, z=Z_95, seed=None, processes=None):
+    """P(target) 的全套误差：二项 stderr / sigma、Wilson、bootstrap (可以一次给很多个 PUB)。"""
+    counts = as_count_matrix(counts)
+    num_bits = int(np.log2(counts.shape[-1]))
+    ratio = Ratio(outcome_mask(target, num_bits))
+    k, n = ratio.parts(counts)
+    out = binomial_summary(k, n, floor, z)
+    boot = bootstrap(counts, ratio, n_resamples, z, seed, processes)
+    out["bootstrap_stderr"], out["bootstrap_ci"] = boot["stderr"], boot["ci"]
+    return out
+
+
+def difference_ci(counts_a, stat_a, counts_b, stat_b, n_resamples=DEFAULT_RESAMPLES, z=Z_95, seed=None):
+    """两组独立实验的统计量之差 (例如提纯后 - 提纯前的保真度) 的 bootstrap 区间。"""
+    seeds = np.random.SeedSequence(seed).spawn(2)
+    a = bootstrap(counts_a, stat_a, n_resamples, z, seeds[0])
+    b = bootstrap(counts_b, stat_b, n_resamples, z, seeds[1])
+    diff = a["samples"] - b["samples"]
+    alpha = 2 * (1 - _normal_cdf(z))
+    lo, hi = np.nanquantile(diff, [alpha / 2, 1 - alpha / 2], axis=0)
+    return {"estimate": a["estimate"] - b["estimate"], "stderr": np.nanstd(diff, axis=0, ddof=1),
+            "ci": np.stack([lo, hi], axis=-1)}
+
+
+# ==========================================
+# 3. evidence/ 里的每个数都带上误差棒
+# ==========================================
+def evidence_intervals(table, z=Z_95):
+    """
+    evidence_store 查询结果 (pyarrow Table) -> 每行 value 的二项 stderr 和 Wilson 区间 (一次向量化)。
+    value 不是概率或没有 shots 的行给 NaN。
+    """
+    value = np.asarray(table.column("value").to_numpy(zero_copy_only=False), dtype=float)
+    shots = np.asarray(table.column("shots").to_numpy(zero_copy_only=False), dtype=float)
+    valid = np.isfinite(value) & np.isfinite(shots) & (shots > 0) & (value >= 0) & (value <= 1)
+    k = np.where(valid, value * np.where(valid, shots, 0), 0)
+    out = binomial_summary(np.rint(k), np.where(valid, shots, 0), z=z)
+    out["stderr"] = np.where(valid, out["stderr"], np.nan)
+    out["ci"] = np.where(valid[:, None], out["ci"], np.nan)
+    return table.append_column("stderr", [out["stderr"]]) \
+                .append_column("ci_low", [out["ci"][:, 0]]).append_column("ci_high", [out["ci"][:, 1]])
+
+
+if __name__ == "__main__":
+    import time
+
+    # 48k 裁决规模：4 个 job × 12k shots，同时算 4 个单 job 和合并后的 P(000)
+    rng = np.random.default_rng(0)
+    probs = np.array([0.16] + [0.12] * 7)
+    jobs = rng.multinomial(12000, probs, size=4)
+    counts = np.vstack([jobs, jobs.sum(axis=0)])
+    for processes in (None, max(2, os.cpu_count() or 1)):
+        t0 = time.perf_counter()
+        rep = survival_report(counts, target=0, floor=0.125, seed=1, processes=processes)
+        dt = time.perf_counter() - t0
+        print(f"⚙️ {DEFAULT_RESAMPLES} resamples x {len(counts)} PUBs, processes={processes}: {dt:.2f}s")
+    for i, tag in enumerate(["job 1", "job 2", "job 3", "job 4", "merged"]):
+        lo, hi = rep["ci"][i]
+        blo, bhi = rep["bootstrap_ci"][i]
+        print(f"   {tag:<7} P_000 = {rep['p'][i]:.4f} ± {rep['stderr'][i]:.4f} ({rep['sigma'][i]:.1f} σ) | "
+              f"Wilson [{lo:.4f}, {hi:.4f}] | bootstrap [{blo:.4f}, {bhi:.4f}]")
+
+    # 后选择保真度 00/(00+01)
+    cleaned = {"00": 1900, "01": 150, "10": 1500, "11": 546}
+    ratio = Ratio(outcome_mask("00", 2), outcome_mask(["00", "01"], 2))
+    r = ratio_summary(cleaned, ratio)
+    b = bootstrap(cleaned, ratio, seed=2)
+    print(f"🧪 Cleaned fidelity = {r['p']:.4f} Wilson [{r['ci'][0]:.4f}, {r['ci'][1]:.4f}] | "
+          f"bootstrap [{b['ci'][0]:.4f}, {b['ci'][1]:.4f}] | survival {r['survival']:.2%}")
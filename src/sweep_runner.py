@@ -0,0 +1,155 @@
+import contextlib
+import functools
+import json
+import os
+import time
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# ==========================================
+# 🏭 Project Sediment: Parallel Sweep Runner
+#    LENGTHS × COOLING_SWEEP 每个网格点互相独立 -> 分给进程池
+#    结果按完成顺序流式返回，并逐行写入 JSONL 检查点；中断后重跑只补缺失的点
+# ==========================================
+
+CHECKPOINT_DIR = "sweep_checkpoints"
+# 每个 worker 只用一个 BLAS 线程，否则 N 个进程 × N 个线程互相抢核，无法线性加速
+SINGLE_THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def grid(lengths, cooling_factors):
+    return [(int(L), float(cf)) for L in lengths for cf in cooling_factors]
+
+
+def point_key(L, cf):
+    return (int(L), round(float(cf), 12))
+
+
+def worker_name(worker):
+    """检查点里记下是哪个 worker (连同 partial 绑定的参数) 算的，换了 worker 不会误用旧结果。"""
+    if isinstance(worker, functools.partial):
+        args = [repr(a) for a in worker.args] + [f"{k}={v!r}" for k, v in sorted(worker.keywords.items())]
+        return f"{worker_name(worker.func)}({', '.join(args)})"
+    return f"{worker.__module__}.{worker.__qualname__}"
+
+
+@contextlib.contextmanager
+def single_thread_children():
+    """
+    只在启动子进程期间设置线程数环境变量 (spawn 的子进程继承这一刻的环境)，
+    退出时恢复父进程原来的 os.environ。进程池必须在 with 里面 submit 完 (子进程在 submit 时启动)。
+    """
+    saved = {var: os.environ.get(var) for var in SINGLE_THREAD_ENV}
+    for var in SINGLE_THREAD_ENV:
+        os.environ.setdefault(var, "1")
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+# ==========================================
+# 🧵 Workers (必须是模块级函数，spawn 子进程才能 pickle)
+# ==========================================
+def mps_point(L, cf):
+    """本地 MPS 模拟一个网格点：末端激发率 + 真空概率。"""
+    from mps_simulator import sediment_marginals
+    return sediment_marginals(L, cf)
+
+
+def transpile_point(L, cf, backend_name="ibm_torino"):
+    """在 fake backend 上转译一个网格点 (走磁盘缓存)，返回 ISA 电路的规模。"""
+    from backend_provider import get_fake_backend
+    from sediment_circuits import create_sediment_circuit
+    from transpile_cache import cached_transpile
+    isa = cached_transpile(create_sediment_circuit(L, cf), get_fake_backend(backend_name), optimization_level=3)
+    return {"depth": isa.depth(), "size": isa.size(), "two_qubit": isa.num_nonlocal_gates()}
+
+
+def _call(worker, L, cf):
+    t0 = time.perf_counter()
+    value = worker(L, cf)
+    return {"L": L, "cf": cf, "value": value, "seconds": time.perf_counter() - t0, "pid": os.getpid()}
+
+
+class SweepRunner:
+    def __init__(self, worker=mps_point, checkpoint=None, max_workers=None):
+        self.worker = worker
+        self.worker_id = worker_name(worker)
+        self.checkpoint = checkpoint
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def load_checkpoint(self):
+        done = {}
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return done
+        with open(self.checkpoint) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 被中断时写了半行，丢掉重算
+                done[(rec.get("worker"),) + point_key(rec["L"], rec["cf"])] = rec
+        return done
+
+    def _append(self, rec):
+        if not self.checkpoint:
+            return
+        folder = os.path.dirname(self.checkpoint)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.checkpoint, "a") as f:
+            f.write(json.dumps(rec) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def run(self, points):
+        """
+        生成器：先吐出检查点里已完成的点，再按完成顺序吐出新算的点。
+        每个新结果写盘后才 yield，所以随时 Ctrl-C 都不丢已完成的工作。
+        """
+        done = self.load_checkpoint()
+        pending = []
+        for L, cf in points:
+            key = (self.worker_id,) + point_key(L, cf)
+            if key in done:
+                yield dict(done[key], cached=True)
+            else:
+                pending.append((L, cf))
+        if not pending:
+            return
+
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(pending)), mp_context=ctx) as pool:
+            with single_thread_children():
+                futures = [pool.submit(_call, self.worker, L, cf) for L, cf in pending]
+            try:
+                for fut in as_completed(futures):
+                    rec = dict(fut.result(), worker=self.worker_id)
+                    self._append(rec)
+                    yield dict(rec, cached=False)
+            finally:
+                for fut in futures:
+                    fut.cancel()
+
+    def collect(self, points):
+        """阻塞版：{(L, cf): value}。"""
+        return {point_key(r["L"], r["cf"]): r["value"] for r in self.run(points)}
+
+
+if __name__ == "__main__":
+    from finite_size_scaling import LENGTHS, COOLING_SWEEP
+
+    points = grid(LENGTHS, COOLING_SWEEP)
+    runner = SweepRunner(mps_point, checkpoint=os.path.join(CHECKPOINT_DIR, "fss_mps.jsonl"))
+    print(f"🏭 {len(points)} grid points on {runner.max_workers} workers...")
+    t0 = time.perf_counter()
+    for n, rec in enumerate(runner.run(points), 1):
+        tag = "ckpt" if rec["cached"] else f"{rec['seconds']:.2f}s"
+        print(f"[{n:>3}/{len(points)}] L={rec['L']:<3} cf={rec['cf']:.3f} | "
+              f"P_horizon={rec['value']['p_horizon']:.4f} | {tag}")
+    print(f"✅ Done in {time.perf_counter() - t0:.1f}s")
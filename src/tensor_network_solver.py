@@ -1,11 +1,11 @@
 import numpy as np
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister, transpile
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
+from qiskit_ibm_runtime import SamplerV2 as Sampler
+from backend_provider import get_backend, describe
 
 # 1. 连接机器 (不做筛选，直接连最快的)
-service = QiskitRuntimeService()
-backend = service.least_busy(operational=True, simulator=False, dynamic_circuits=True)
-print(f"⚡ 缝合实验就位: {backend.name}")
+backend = get_backend(dynamic_circuits=True)
+print(f"⚡ 缝合实验就位: {describe(backend)}")
 
 # 2. 构建双晶电路 (两个 3比特 单元)
 qr = QuantumRegister(6, 'q') # Q0-2 (A), Q3-5 (B)
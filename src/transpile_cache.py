@@ -0,0 +1,216 @@
+import hashlib
+import json
+import numbers
+import os
+import weakref
+from qiskit import QuantumCircuit, qpy
+from qiskit.circuit import ParameterExpression
+from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+from instrumentation import circuit_stats, get_tracer, span
+
+# ==========================================
+# 🗄️ 0.25 Protocol: Transpilation Cache
+#    Level-3 转译结果按 QPY 存到硬盘
+#    key = 电路结构哈希 + backend 名 + 校准/target 指纹 + pass manager 设置
+#    超过容量按 LRU (文件 mtime) 淘汰
+# ==========================================
+
+CACHE_DIR_ENV = "QRP_CACHE_DIR"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "qrp", "transpile")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def _param_token(param):
+    if isinstance(param, QuantumCircuit):
+        return circuit_fingerprint(param)
+    if isinstance(param, ParameterExpression):
+        return f"expr:{param}"
+    if isinstance(param, numbers.Number):
+        return repr(complex(param))  # float / np.float64 / int 统一表示
+    return repr(param)
+
+
+def _feed_circuit(h, circuit):
+    h.update(f"q{circuit.num_qubits}c{circuit.num_clbits}|".encode())
+    for reg in circuit.qregs + circuit.cregs:
+        h.update(f"{type(reg).__name__}:{reg.name}:{reg.size}|".encode())
+
+    for inst in circuit.data:
+        op = inst.operation
+        qubits = [circuit.find_bit(q).index for q in inst.qubits]
+        clbits = [circuit.find_bit(c).index for c in inst.clbits]
+        params = [_param_token(p) for p in op.params]
+        condition = getattr(op, "condition", None)
+        if isinstance(condition, tuple):
+            target, value = condition
+            target = target.name if hasattr(target, "size") else circuit.find_bit(target).index
+            condition = (target, value)
+        elif condition is not None:
+            condition = repr(condition)
+        h.update(repr((op.name, op.num_qubits, params, qubits, clbits, condition)).encode())
+
+
+def circuit_fingerprint(circuit):
+    """Structural hash: gate names, parameters (数值或表达式名), qubit/clbit 索引, 寄存器布局。"""
+    h = hashlib.sha256()
+    _feed_circuit(h, circuit)
+    return h.hexdigest()
+
+
+def target_fingerprint(backend):
+    """Backend 名 + 版本 + target 中每条指令的误差/时长 (校准一变 key 就变)。"""
+    h = hashlib.sha256()
+    h.update(f"{backend.name}|{getattr(backend, 'backend_version', '')}|{backend.num_qubits}|".encode())
+    target = backend.target
+    for name in sorted(target.operation_names):
+        entries = []
+        for qargs, props in target[name].items():
+            error = getattr(props, "error", None) if props is not None else None
+            duration = getattr(props, "duration", None) if props is not None else None
+            entries.append((qargs or (), error, duration))
+        entries.sort(key=lambda e: e[0])
+        h.update(repr((name, entries)).encode())
+    return h.hexdigest()
+
+
+class TranspileCache:
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._target_keys = weakref.WeakKeyDictionary()  # backend -> (target, 指纹)；不用 id()，回收后 id 会被复用
+
+    def key(self, circuit, backend, optimization_level, **pm_kwargs):
+        memo = self._target_keys.get(backend)
+        if memo is None or memo[0] is not backend.target:
+            memo = self._target_keys[backend] = (backend.target, target_fingerprint(backend))
+        settings = json.dumps({"optimization_level": optimization_level, **pm_kwargs}, sort_keys=True, default=repr)
+
+        h = hashlib.sha256()
+        h.update(circuit_fingerprint(circuit).encode())
+        h.update(backend.name.encode())
+        h.update(memo[1].encode())
+        h.update(settings.encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.qpy")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                circuit = qpy.load(f)[0]
+        except (OSError, ValueError, qpy.QpyError):
+            return None
+        os.utime(path)  # LRU: 命中就刷新 mtime
+        return circuit
+
+    def put(self, key, circuit):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            qpy.dump(circuit, f)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".qpy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".qpy"):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def run(self, circuits, backend, optimization_level=3, layouts=None, **pm_kwargs):
+        """
+        和 pm.run 一样的用法 (单个电路或列表)，命中缓存的电路完全跳过转译器。
+        layouts: 每个电路各自的 initial_layout (和 circuits 等长)；未命中的电路仍然一次并行转译完。
+        """
+        single = isinstance(circuits, QuantumCircuit)
+        circuits = [circuits] if single else list(circuits)
+        if layouts is not None:
+            layouts = [layouts] if single else list(layouts)
+            if len(layouts) != len(circuits):
+                raise ValueError(f"Got {len(layouts)} layouts for {len(circuits)} circuits")
+
+        with span("transpile", backend=backend.name, optimization_level=optimization_level, circuits=len(circuits)) as s:
+            if layouts is None:
+                keys = [self.key(qc, backend, optimization_level, **pm_kwargs) for qc in circuits]
+            else:
+                keys = [self.key(qc, backend, optimization_level, initial_layout=layout, **pm_kwargs)
+                        for qc, layout in zip(circuits, layouts)]
+            results = [self.get(k) for k in keys]
+            missing = [i for i, r in enumerate(results) if r is None]
+            self.hits += len(circuits) - len(missing)
+            self.misses += len(missing)
+
+            s.set(cache_hits=len(circuits) - len(missing), cache_misses=len(missing))
+            if missing:
+                # depth() 要遍历整条电路：只在 trace 打开时、只对真正转译的电路统计
+                tracing = get_tracer().enabled
+                if tracing:
+                    s.set(**circuit_stats([circuits[i] for i in missing], "before."))
+                transpiled = self._transpile([circuits[i] for i in missing], backend, optimization_level,
+                                             None if layouts is None else [layouts[i] for i in missing], **pm_kwargs)
+                for i, isa in zip(missing, transpiled):
+                    self.put(keys[i], isa)
+                    results[i] = isa
+                if tracing:
+                    s.set(**circuit_stats(transpiled, "after."))
+
+        return results[0] if single else results
+
+    @staticmethod
+    def _transpile(circuits, backend, optimization_level, layouts=None, **pm_kwargs):
+        if layouts is None:
+            pm = generate_preset_pass_manager(backend=backend, optimization_level=optimization_level, **pm_kwargs)
+            return pm.run(circuits)
+        # 每条链一个 pass manager；所有 (pm, 电路) 一起交给 parallel_map，和 pm.run(list) 一样多进程
+        from qiskit.utils import parallel_map
+        managers = {}
+        for layout in layouts:
+            if tuple(layout) not in managers:
+                managers[tuple(layout)] = generate_preset_pass_manager(
+                    backend=backend, optimization_level=optimization_level, initial_layout=list(layout), **pm_kwargs)
+        return parallel_map(_run_pass_manager, [(managers[tuple(layout)], qc) for layout, qc in zip(layouts, circuits)])
+
+
+def _run_pass_manager(job):
+    pm, circuit = job
+    return pm.run(circuit)
+
+
+_default_cache = None
+
+
+def get_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = TranspileCache()
+    return _default_cache
+
+
+def cached_transpile(circuits, backend, optimization_level=3, layouts=None, **pm_kwargs):
+    return get_cache().run(circuits, backend, optimization_level=optimization_level, layouts=layouts, **pm_kwargs)
@@ -1,42 +1,23 @@
-from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2, SamplerOptions
-from qiskit import QuantumCircuit, transpile
-import numpy as np
+from qiskit_ibm_runtime import SamplerV2, SamplerOptions
+from backend_provider import get_backend, describe
+from butterfly_engine import build_butterfly_circuit
+from qiskit import transpile
 
 # ============================================================
 # 1. 初始化服务 (自动读取本地已保存的账户)
 # ============================================================
-# 不用填 channel 和 token，让它自己去硬盘里找
-try:
-    service = QiskitRuntimeService() 
-    print(f"成功加载本地账户! 当前使用的 Channel: {service.channel}")
-except Exception as e:
-    print("⚠️ 自动加载失败，尝试指定 Channel...")
-    # 如果你有多个账户或者旧版保存的，可能需要显式指定一下
-    # 通常是 "ibm_quantum" 或者报错里提到的 "ibm_quantum_platform"
-    try:
-        service = QiskitRuntimeService(channel="ibm_quantum")
-    except:
-        service = QiskitRuntimeService(channel="ibm_quantum_platform")
-
-backend = service.backend("ibm_torino")
+# 账户/Channel 回退逻辑在 backend_provider 里；
+# QRP_BACKEND_MODE=fake 时直接用本地 Torino 噪声模型
+backend = get_backend("ibm_torino")
+print(f"后端已就绪: {describe(backend)}")
 
 # ============================================================
 # 2. 定义 150 层 Butterfly 逻辑 (gamma=0.25 锁定点)
 # ============================================================
 def build_optimized_butterfly(layers=150, gamma=0.25):
-    qc = QuantumCircuit(3)
-    # 正向演化：模拟全息沉积过程
-    for _ in range(layers):
-        qc.rx(gamma * np.pi, [0, 1, 2])
-        qc.cz(0, 1)
-        qc.cz(1, 2)
-        qc.rz(0.25 * np.pi, [0, 1, 2])
-    
-    # 因果逆转：回溯几何路径
-    qc.barrier()
-    qc.append(qc.inverse(), [0, 1, 2])
-    qc.measure_all()
-    return qc
+    # 正向演化 (模拟全息沉积过程) + 因果逆转 (回溯几何路径)
+    # 单层模板铺设 + 结构逆，定义在 butterfly_engine，和本地模拟共用
+    return build_butterfly_circuit(layers, gamma)
 
 # ============================================================
 # 3. 极致省时提交策略
@@ -1,8 +1,8 @@
-import matplotlib.pyplot as plt
-from qiskit_ibm_runtime import QiskitRuntimeService
-import numpy as np
 import json
 from datetime import datetime
+from result_store import ResultStore
+from packed_counts import CountsAccumulator
+from evidence_store import record_run
 
 # ==========================================
 # 1. 配置区域 (填入你的 Job IDs)
@@ -15,59 +15,65 @@ JOB_IDS = [
 # 理论随机底噪 (3比特系统，随机概率 = 1/8 = 0.125)
 RANDOM_BASELINE = 1 / 8 
 
-def fetch_and_visualize():
-    # 自动加载本地账户
-    try:
-        service = QiskitRuntimeService()
-    except:
-        service = QiskitRuntimeService(channel="ibm_quantum_platform")
-        
-    print(f"🔗 已连接 IBM Quantum, 正在从视界边缘提取数据...")
+def job_mitigator(jid):
+    # 读出误差修正：用 job 提交当天的校准 (backend.properties 历史记录)，测量比特从提交的 ISA 电路里读
+    from backend_provider import get_service
+    from readout_mitigation import ReadoutMitigator
+    job = get_service().job(jid)
+    pub = job.inputs["pubs"][0]
+    circuit = getattr(pub, "circuit", None) or pub[0]
+    return ReadoutMitigator.for_circuit(job.backend(), circuit, source="properties", when=job.creation_date)
+
+def fetch_and_visualize(mitigate=False):
+    # 本地结果库优先，缺的 job 才会连接 IBM Quantum (并发抓取)
+    print(f"🔗 正在从视界边缘提取数据...")
+    fetched = ResultStore().fetch(JOB_IDS)
     
-    combined_data = {"000": 0}
+    accumulator = CountsAccumulator()
     total_shots_all = 0
     job_results = []
 
     # --- 步骤 A: 抓取并合并数据 ---
     for jid in JOB_IDS:
         try:
-            job = service.job(jid)
+            result = fetched[jid]
+            if result.error is not None:
+                raise result.error
             
-            # === 关键修复点 ===
-            # 获取原始状态
-            raw_status = job.status()
-            # 兼容处理：如果是字符串直接用，如果是对象取.name
-            status_str = raw_status if isinstance(raw_status, str) else raw_status.name
+            # 状态名已经在结果库里统一成字符串
+            status_str = result.status
             
             print(f"   >> Job {jid}: [{status_str}]")
             
             if status_str == 'DONE':
                 # SamplerV2 结果提取逻辑
-                result = job.result()
                 # 提取第一个 pub 的结果
                 pub_result = result[0] 
                 # 获取测量数据 (兼容 c 和 meas 寄存器名)
-                if hasattr(pub_result.data, 'meas'):
-                    counts = pub_result.data.meas.get_counts()
-                else:
-                    # 有时候默认寄存器叫 c
-                    counts = pub_result.data.c.get_counts()
+                register = 'meas' if hasattr(pub_result.data, 'meas') else 'c'  # 有时候默认寄存器叫 c
+                counts = getattr(pub_result.data, register).packed()
+                record_run("vacuum_geometric_lock", jid, result, backend=result.metadata.get("backend"), register=register)
                 
-                total_shots = sum(counts.values())
+                total_shots = counts.shots
                 total_shots_all += total_shots
                 
                 # 记录关键指标
-                p0 = counts.get('000', 0) / total_shots
+                p0 = counts.probability(0)
                 job_results.append({
                     "id": jid, 
                     "p0": p0, 
                     "shots": total_shots,
-                    "counts": counts
+                    "counts": counts.to_dict()
                 })
+                if mitigate:
+                    try:
+                        job_results[-1]["p0_mitigated"] = job_mitigator(jid).probability(counts, 0)
+                        print(f"      🩹 读出修正后 P(0): {job_results[-1]['p0_mitigated']:.4f}")
+                    except Exception as e:
+                        print(f"      ⚠️ 读出修正失败: {e}")
                 
-                # 合并计数
-                for k, v in counts.items():
-                    combined_data[k] = combined_data.get(k, 0) + v
+                # 合并计数 (整数数组，不展开字符串)
+                accumulator.add(counts)
                     
                 print(f"      ✅ 成功打捞! 单次 P(0) 恢复率: {p0:.4f} (基准: {RANDOM_BASELINE})")
             elif status_str in ['QUEUED', 'RUNNING', 'VALIDATING']:
@@ -83,7 +89,9 @@ def fetch_and_visualize():
         return
 
     # --- 步骤 B: 计算最终统计量 ---
-    final_p0 = combined_data.get('000', 0) / total_shots_all
+    merged = accumulator.result()
+    combined_data = {"000": 0, **merged.to_dict()}
+    final_p0 = merged.probability(0)
     enhancement = (final_p0 - RANDOM_BASELINE) / RANDOM_BASELINE * 100
     
     print("\n" + "="*40)
@@ -91,6 +99,12 @@ def fetch_and_visualize():
     print(f"🌌 随机混沌基准: {RANDOM_BASELINE:.4f}")
     print(f"🌌 几何逆转结果: {final_p0:.4f}")
     print(f"🔥 因果信号增强: +{enhancement:.2f}%")
+    mitigated = [r for r in job_results if "p0_mitigated" in r]
+    final_p0_mitigated = None
+    if mitigated:
+        # 按 shots 加权 (修正是线性的，等价于对合并后的计数做修正)
+        final_p0_mitigated = sum(r["p0_mitigated"] * r["shots"] for r in mitigated) / sum(r["shots"] for r in mitigated)
+        print(f"🩹 读出修正后: {final_p0_mitigated:.4f} ({len(mitigated)}/{len(job_results)} jobs)")
     print("="*40)
 
     # --- 步骤 C: 保存原始数据 (JSON) ---
@@ -100,7 +114,8 @@ def fetch_and_visualize():
         "final_stats": {
             "total_shots": total_shots_all,
             "final_p0": final_p0,
-            "enhancement_percentage": enhancement
+            "enhancement_percentage": enhancement,
+            "final_p0_mitigated": final_p0_mitigated
         },
         "merged_counts": combined_data,
         "individual_jobs": job_results
@@ -113,6 +128,8 @@ def fetch_and_visualize():
     generate_plot(combined_data, total_shots_all, final_p0, enhancement)
 
 def generate_plot(counts, total, p0, boost):
+    from plotting import get_pyplot, show
+    plt = get_pyplot()
     sorted_keys = sorted(counts.keys())
     # 确保 000 在最前
     if '000' in sorted_keys:
@@ -143,7 +160,8 @@ def generate_plot(counts, total, p0, boost):
     filename = "Causal_Reversal_Verdict.pdf"
     plt.savefig(filename)
     print(f"📄 判决报告已生成: {filename}")
-    plt.show()
+    show()
 
 if __name__ == "__main__":
-    fetch_and_visualize()
+    import sys
+    fetch_and_visualize(mitigate="--mitigate" in sys.argv)
@@ -0,0 +1,237 @@
+import json
+import os
+import numpy as np
+
+# ==========================================
+# 🧯 0.25 Protocol: Zero-Noise Extrapolation
+#    蝴蝶电路做全局折叠 C (C† C)^k (+ 尾部部分折叠) -> 噪声放大 λ 倍
+#    所有 (depth, λ) 变体一个 job 提交 (γ 走参数绑定)，整张 γ×depth 网格一次向量化外推到 λ=0
+# ==========================================
+
+DEFAULT_SCALES = (1.0, 3.0, 5.0)
+CHAOS_FLOOR = 1 / 8  # 完全退相干后 P(000) 的极限，指数外推的渐近线
+DEFAULT_SHOTS = 8192
+DEFAULT_RESAMPLES = 4000
+OUTPUT_FILE = "zne_stress_test.json"
+
+
+# ==========================================
+# 1. 折叠
+# ==========================================
+def fold_global(circuit, scale):
+    """
+    全局折叠：C -> C (C† C)^k，再对最后 r 个门做一次部分折叠 L† L，使门数 ≈ scale × 原门数。
+    每段之间插 barrier，否则转译器会把 C† C 直接消掉。返回 (折叠后电路, 实际 scale)。
+    """
+    if scale < 1:
+        raise ValueError(f"Noise scale factors must be >= 1 (got {scale})")
+    base = circuit.remove_final_measurements(inplace=False)
+    ops = [inst for inst in base.data if inst.operation.name != "barrier"]
+    n = len(ops)
+    extra = int(round((scale - 1) / 2 * n))  # 需要额外 "来回" 的门数
+    full, partial = divmod(extra, n)
+
+    folded = base.copy_empty_like()
+    folded.compose(base, inplace=True)
+    inverse = base.inverse()
+    for _ in range(full):
+        folded.barrier()
+        folded.compose(inverse, inplace=True)
+        folded.barrier()
+        folded.compose(base, inplace=True)
+    if partial:
+        tail = base.copy_empty_like()
+        for inst in ops[-partial:]:
+            tail.append(inst)
+        folded.barrier()
+        folded.compose(tail.inverse(), inplace=True)
+        folded.barrier()
+        folded.compose(tail, inplace=True)
+    folded.measure_all()
+    return folded, 1 + 2 * extra / n
+
+
+def zne_circuits(depths, scales):
+    """每个 (depth, λ) 一条参数化电路 (γ 是参数)；返回 circuits[d][s]、实际 scale 数组 (D, S) 和参数。"""
+    from qiskit.circuit import Parameter
+    from butterfly_engine import build_butterfly_circuit
+    gamma = Parameter("γ")
+    circuits, realized = [], np.zeros((len(depths), len(scales)))
+    for d, depth in enumerate(depths):
+        base = build_butterfly_circuit(layers=int(depth), gamma=gamma)
+        row = []
+        for s, scale in enumerate(scales):
+            qc, realized[d, s] = fold_global(base, scale)
+            row.append(qc)
+        circuits.append(row)
+    return circuits, realized, gamma
+
+
+# ==========================================
+# 2. 外推 (最后一维是 λ，前面的维度任意)
+# ==========================================
+def _wls_intercept(x, y, sigma):
+    """逐行加权最小二乘 y = a + b x，返回 (a, σ_a)；σ 全 0 时退化为普通最小二乘。"""
+    w = 1 / np.maximum(sigma, 1e-12) ** 2  # σ = inf -> 权重 0
+    S, Sx, Sxx = w.sum(-1), (w * x).sum(-1), (w * x * x).sum(-1)
+    Sy, Sxy = (w * y).sum(-1), (w * x * y).sum(-1)
+    delta = S * Sxx - Sx ** 2
+    return (Sxx * Sy - Sx * Sxy) / delta, np.sqrt(Sxx / delta)
+
+
+def richardson_weights(scales):
+    """Lagrange 外推到 0 的权重 w_i = Π_{j≠i} x_j / (x_j - x_i)，shape 同 scales。"""
+    x = np.asarray(scales, dtype=float)
+    diff = x[..., None, :] - x[..., :, None]  # [i, j] = x_j - x_i
+    eye = np.eye(x.shape[-1], dtype=bool)
+    ratio = np.where(eye, 1.0, x[..., None, :] / np.where(eye, 1.0, diff))
+    return ratio.prod(axis=-1)
+
+
+def richardson(scales, values, stderrs):
+    w = richardson_weights(np.broadcast_to(scales, values.shape))
+    return (w * values).sum(-1), np.sqrt((w ** 2 * stderrs ** 2).sum(-1))
+
+
+def linear(scales, values, stderrs):
+    return _wls_intercept(np.broadcast_to(scales, values.shape), values, stderrs)
+
+
+def exponential(scales, values, stderrs, floor=CHAOS_FLOOR):
+    """
+    y(λ) = floor + A e^{-cλ}：对 log(y - floor) 做加权线性拟合。
+    已经掉到 floor 附近 (< 2σ) 的点不参与拟合 (权重 0)；剩不到 2 个点给 NaN。
+    """
+    scales = np.broadcast_to(scales, values.shape)
+    excess = values - floor
+    usable = excess > 2 * stderrs
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = np.where(usable, np.log(np.where(usable, excess, 1.0)), 0.0)
+        sz = np.where(usable, stderrs / np.where(usable, excess, 1.0), np.inf)
+        a, sa = _wls_intercept(scales, z, sz)
+    enough = usable.sum(-1) >= 2
+    return np.where(enough, floor + np.exp(a), np.nan), np.where(enough, np.exp(a) * sa, np.nan)
+
+
+EXTRAPOLATORS = {"richardson": richardson, "linear": linear, "exponential": exponential}
+
+
+def extrapolate(successes, shots, scales, methods=tuple(EXTRAPOLATORS), n_resamples=DEFAULT_RESAMPLES, seed=None):
+    """
+    successes / shots: (..., S) 计数；scales: 可广播到 (..., S) 的实际 λ。
+    每种方法给出 λ=0 的估计、解析误差 (误差传播) 和二项重采样 bootstrap 的 95% 区间，全部一次向量化。
+    """
+    successes = np.asarray(successes, dtype=float)
+    shots = np.broadcast_to(np.asarray(shots, dtype=float), successes.shape)
+    p = successes / shots
+    stderr = np.sqrt(np.maximum(p * (1 - p), 1 / shots) / shots)
+
+    rng = np.random.default_rng(seed)
+    resampled = rng.binomial(shots.astype(np.int64), p, size=(n_resamples,) + p.shape) / shots
+    resampled_err = np.broadcast_to(stderr, resampled.shape)
+
+    out = {"raw": p, "raw_stderr": stderr}
+    for name in methods:
+        fn = EXTRAPOLATORS[name]
+        value, err = fn(scales, p, stderr)
+        samples, _ = fn(scales, resampled, resampled_err)
+        lo, hi = np.nanquantile(samples, [0.025, 0.975], axis=0)
+        out[name] = {"value": value, "stderr": err, "ci": np.stack([lo, hi], axis=-1)}
+    return out
+
+
+# ==========================================
+# 3. 运行
+# ==========================================
+def run_zne(sampler, backend, gammas, depths, scales=DEFAULT_SCALES, shots=DEFAULT_SHOTS, optimization_level=1):
+    """全部 (depth, λ) 变体转译后作为一个 job 提交；返回 successes (G, D, S) 和实际 scale (D, S)。"""
+    from transpile_cache import cached_transpile
+    from packed_counts import as_packed
+    from instrumentation import span, submit, wait
+    with span("build", depths=list(depths), scales=list(scales)):
+        circuits, realized, gamma = zne_circuits(depths, scales)
+    flat = [qc for row in circuits for qc in row]
+    isa = cached_transpile(flat, backend, optimization_level=optimization_level)
+    bindings = np.asarray(gammas, dtype=float).reshape(-1, 1)
+    job = submit(sampler, [(c, bindings, shots) for c in isa])
+    print(f"🛫 ZNE job {job.job_id()}: {len(flat)} PUBs × {len(gammas)} γ × {shots} shots")
+    result = wait(job)
+
+    successes = np.zeros((len(gammas), len(depths), len(scales)), dtype=np.int64)
+    for k, pub in enumerate(result):
+        d, s = divmod(k, len(scales))
+        for g in range(len(gammas)):
+            successes[g, d, s] = as_packed(pub.data.meas, loc=g).get(0)
+    return successes, realized, job.job_id()
+
+
+def engine_zne(gammas, depths, scales=DEFAULT_SCALES, depolarizing=None, shots=DEFAULT_SHOTS, seed=None):
+    """
+    离线替身：butterfly_engine 的去极化模型，λ 倍折叠近似为每层噪声 ×λ，再加二项 shot 噪声。
+    depolarizing 不给就用 stress_test_data.json 拟合出来的值。
+    """
+    from butterfly_engine import STRESS_TEST_FILE, fit_depolarizing, outcome_probabilities
+    if depolarizing is None:
+        with open(STRESS_TEST_FILE) as f:
+            depolarizing, _ = fit_depolarizing(json.load(f))
+    G, D, S = np.meshgrid(np.asarray(gammas, dtype=float), np.asarray(depths), np.asarray(scales), indexing="ij")
+    p = outcome_probabilities(G, D, depolarizing=depolarizing * S)[..., 0]
+    successes = np.random.default_rng(seed).binomial(shots, p)
+    return successes, np.broadcast_to(np.asarray(scales, dtype=float), (len(depths), len(scales))), depolarizing
+
+
+def stress_grid():
+    """stress_test_data.json + final_sedimentation_data.json 里出现过的 γ 和 depth (30/55/80)。"""
+    from butterfly_engine import STRESS_TEST_FILE
+    records = []
+    for name in ("stress_test_data.json", "final_sedimentation_data.json"):
+        path = os.path.join(os.path.dirname(STRESS_TEST_FILE), name)
+        if os.path.exists(path):
+            with open(path) as f:
+                records += json.load(f)
+    return sorted({r["gamma"] for r in records}), sorted({r["depth"] for r in records})
+
+
+def report(gammas, depths, scales, realized, successes, shots, source, job_id=None):
+    est = extrapolate(successes, shots, realized[None, :, :], seed=0)
+    print(f"\n🧯 Zero-noise extrapolation ({source}) | λ = {', '.join(f'{x:g}' for x in scales)} | ideal P000 = 1")
+    print(f"{'γ':>6} {'depth':>5} | {'raw (λ=1)':>15} | {'richardson':>15} | {'linear':>15} | {'exponential':>15}")
+    rows = []
+    for g, gamma in enumerate(gammas):
+        for d, depth in enumerate(depths):
+            cells = [f"{est['raw'][g, d, 0]:.4f}±{est['raw_stderr'][g, d, 0]:.4f}"]
+            row = {"gamma": gamma, "depth": depth, "raw_survival": est["raw"][g, d].tolist(),
+                   "scales": realized[d].tolist(), "shots": shots}
+            for name in EXTRAPOLATORS:
+                v, e, ci = est[name]["value"][g, d], est[name]["stderr"][g, d], est[name]["ci"][g, d]
+                cells.append(f"{v:.4f}±{e:.4f}")
+                row[name] = {"value": float(v), "stderr": float(e), "ci95": ci.tolist()}
+            rows.append(row)
+            print(f"{gamma:>6} {depth:>5} | " + " | ".join(f"{c:>15}" for c in cells))
+
+    with open(OUTPUT_FILE, "w") as f:
+        json.dump({"source": source, "job_id": job_id, "chaos_floor": CHAOS_FLOOR, "results": rows}, f, indent=2)
+    print(f"💾 {OUTPUT_FILE}")
+    return est
+
+
+if __name__ == "__main__":
+    import sys
+    gammas, depths = stress_grid()
+    scales = DEFAULT_SCALES
+    if "--scales" in sys.argv:
+        # 例: --scales 1,2,3 (深电路噪声已经很重时，λ 取小一点外推更稳)
+        scales = tuple(float(x) for x in sys.argv[sys.argv.index("--scales") + 1].split(","))
+    if "--local" in sys.argv:
+        successes, realized, p = engine_zne(gammas, depths, scales, seed=1)
+        report(gammas, depths, scales, realized, successes, DEFAULT_SHOTS, f"engine model, p={p:.4f}/layer/qubit")
+    else:
+        from qiskit_ibm_runtime import SamplerV2
+        from backend_provider import get_backend, describe
+        backend = get_backend("ibm_torino")
+        print(f"⚔️ {describe(backend)}")
+        sampler = SamplerV2(mode=backend)
+        sampler.options.dynamical_decoupling.enable = True
+        sampler.options.dynamical_decoupling.sequence_type = 'XY4'
+        successes, realized, job_id = run_zne(sampler, backend, gammas, depths, scales)
+        report(gammas, depths, scales, realized, successes, DEFAULT_SHOTS, backend.name, job_id)